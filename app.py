@@ -1,62 +1,35 @@
 # app.py
+# 通过 create_app() 创建应用；pandas、openai、dashscope 等较重的依赖在首次用到时才导入
+# （检索时导入 pandas/openai，首次生成图片时导入 dashscope），导入本模块本身不创建目录、线程或数据库。
+# 启动方式：python app.py，或 gunicorn 'app:create_app()'
 
-import pandas as pd
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, Response, request, jsonify
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
 import os
-import logging
 from datetime import datetime
 import json
-import sys
-import time
-import shutil
+import math
 import re
+import time
 
-# 假设这些模块存在于你的项目中
-from paper_api import PubMedSearcher
-from compare_IF import PaperRankerByIF
-from get_data_xhs import QuestionAnswerer
-from translate import baidu_translate_if_chinese
-from create_photo import Create_photo
-from get_photo import get_screenshot_local
-
-def extract_pmid_from_paper_url(url):
-    """从论文URL中提取PMID"""
-    if not url:
-        return None
-    try:
-        pattern = r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)'
-        match = re.search(pattern, url, re.IGNORECASE)
-        return match.group(1) if match else None
-    except Exception as e:
-        app.logger.error(f"提取PMID失败 URL={url}: {e}")
-        return None
-
-
-def setup_logging():
-    """设置应用日志"""
-    if not os.path.exists('log'):
-        os.makedirs('log')
-
-    logger = logging.getLogger('paper_search_app')
-    logger.setLevel(logging.INFO)
-    logger.handlers.clear()
-
-    formatter = logging.Formatter('%(asctime)s.%(msecs)03d - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-
-    file_handler = logging.FileHandler('log/paper_search_app.log', encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    return logger
-
-
-# 初始化Flask应用和日志
-app_logger = setup_logging()
-app = Flask(__name__, static_folder='static', static_url_path='/static')
+from translate import baidu_translate_batch, is_translation_failure, translation_cache
+from llm_stats import llm_stats
+from job_queue import JobManager, JobQueueFull, STATUS_QUEUED, STATUS_COMPLETED, STATUS_FAILED
+from image_store import ImageStore
+from single_flight import SingleFlight
+from paper_store import PaperStore, SearchSessionStore
+from http_cache import conditional_json, fingerprint_cache, no_store, set_payload_etag
+from static_assets import asset_cache, send_binary_file, cache_control_for, IMMUTABLE_CACHE_CONTROL, DEFAULT_CACHE_CONTROL
+from log_config import get_logger, begin_request, end_request, dropped_records
+from metrics import metrics, cache_samples, HTTP_REQUESTS_TOTAL, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT
+from profiler import RequestProfiler, should_profile
+from deadline import deadline_scope, expired, SEARCH_DEADLINE, SUMMARY_DEADLINE
+
+# 日志由 log_config 的后台线程写入 log/paper_search_app.log
+app_logger = get_logger('paper_search_app', 'paper_search_app.log')
+STATIC_FOLDER = 'static'
+bp = Blueprint('paper_search', __name__)
 
 
 def ensure_directories():
@@ -68,7 +41,66 @@ def ensure_directories():
             app_logger.info(f"创建目录: {directory}")
 
 
-ensure_directories()
+# 以下服务对象在 init_services() 中创建：
+# 图片生成后台任务队列
+image_job_manager = None
+# 论文图片存储（内容去重、缩略图、磁盘配额）
+image_store = None
+# 同一论文图片的并发生成合并（跨线程与 worker 进程）
+image_single_flight = None
+# 检索结果的服务端缓存，总结与图片接口按 PMID 取论文数据
+paper_store = None
+# 排序后的完整结果按会话保存，/api/search/next 凭游标翻页
+search_sessions = None
+# 相同检索条件的并发请求只执行一次（进程内）
+search_single_flight = None
+
+# 检索执行模式：'pipelined' 按依赖图并发执行各阶段；'sequential' 逐阶段顺序执行
+SEARCH_MODE = os.environ.get('SEARCH_MODE', 'pipelined')
+# 每次检索从 PubMed 获取并参与排序的论文数，以及分页的默认/最大每页条数
+SEARCH_RETMAX = int(os.environ.get('SEARCH_RETMAX', 20))
+SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 10))
+SEARCH_MAX_PAGE_SIZE = 50
+# 检索结果与论文总结的 ETag 指纹有效期（秒），期间客户端携带 If-None-Match 可直接得到 304
+SEARCH_ETAG_TTL = 600
+SUMMARY_ETAG_TTL = 3600
+# 不记录请求日志、不参与抽样分析的接口（静态文件、图片与指标抓取）
+UNLOGGED_ENDPOINTS = {'paper_search.custom_static', 'paper_search.serve_dynamic_image',
+                      'paper_search.metrics_endpoint'}
+
+
+def init_services():
+    """创建目录、预加载首页并初始化任务队列、图片存储等服务对象（重复调用时只执行一次）"""
+    global image_job_manager, image_store, image_single_flight, paper_store, search_sessions, search_single_flight
+    if paper_store is not None:
+        return
+    ensure_directories()
+    # 首页预先加载到内存并压缩
+    asset_cache.preload(['index.html'])
+    image_job_manager = JobManager()
+    image_store = ImageStore()
+    image_single_flight = SingleFlight()
+    search_sessions = SearchSessionStore()
+    search_single_flight = SingleFlight(lock_dir=None)
+    paper_store = PaperStore()
+    metrics.register_collector(collect_runtime_metrics)
+
+
+def create_app():
+    """创建 Flask 应用"""
+    init_services()
+    # 内置的 static 路由会抢先匹配 /static/，这里关闭它，由 custom_static 通过内存资源缓存提供静态文件
+    app = Flask(__name__, static_folder=None)
+    app.register_blueprint(bp)
+    return app
+
+
+def __getattr__(name):
+    # 兼容 `gunicorn app:app` 与 `from app import app`：首次访问 app 属性时才创建应用
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def safe_get_value(obj, key, default=''):
@@ -83,7 +115,7 @@ def safe_get_value(obj, key, default=''):
         else:
             value = default
 
-        if pd.isna(value) or value is None:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
             return default
         return str(value).strip()
     except Exception as e:
@@ -91,7 +123,152 @@ def safe_get_value(obj, key, default=''):
         return default
 
 
-@app.route('/api/search', methods=['POST'])
+def translate_search_terms(fields):
+    """
+    一次请求批量翻译所有检索词；某个字段翻译失败时回退为原文，避免失败标记进入 PubMed 查询。
+    """
+    translated = baidu_translate_batch(fields, target_lang="en")
+    for name, value in translated.items():
+        if is_translation_failure(value):
+            app_logger.warning(f"检索词翻译失败，使用原文: {name}='{fields[name]}'")
+            translated[name] = fields[name]
+    return translated
+
+
+def search_sequential(fields, year_start, year_end, paper_key, api_key, top_n=10, retmax=20):
+    """
+    顺序执行模式：翻译 → PubMed 检索 → 期刊IF查询 → 排序，逐阶段完成。
+    返回 (前 top_n 篇论文 DataFrame, 各阶段耗时)，未找到论文时返回空 DataFrame。
+    """
+    import pandas as pd
+    from paper_api import PubMedSearcher
+    from compare_IF import PaperRankerByIF
+    from search_pipeline import StageTimer, build_pubmed_query
+
+    timer = StageTimer()
+
+    # 构建查询（中文检索词合并为一次翻译请求）
+    timer.start('translate')
+    translated = translate_search_terms(fields)
+    timer.end('translate')
+    query = build_pubmed_query(translated['theme'], translated['key1'], translated['key2'])
+    app_logger.info(f'检索内容为:{query}')
+
+    # PubMed搜索
+    app_logger.info("开始PubMed搜索...")
+    timer.start('pubmed')
+    searcher = PubMedSearcher(query, paper_key, retmax=retmax, year_start=year_start, year_end=year_end)
+    papers = searcher.run()
+    timer.end('pubmed')
+    app_logger.info(f"PubMed搜索完成，找到 {len(papers)} 篇论文")
+
+    if len(papers) == 0:
+        if expired():
+            # esearch/efetch 因截止时间被截断，空结果不代表没有相关文献
+            timer.mark_partial('pubmed')
+        return pd.DataFrame(), timer.report()
+
+    # 论文排名 (按影响因子排序)
+    app_logger.info("开始论文排名...")
+    timer.start('rank')
+    ranker = PaperRankerByIF(pd.DataFrame(papers), journal_column_name='journal', api_key=api_key, use_async=True)
+    top_papers_df = ranker.get_top_papers(top_n=top_n)
+    timer.end('rank')
+    if expired():
+        # 截止时间内未查完的期刊IF为空，排在已知IF的论文之后
+        timer.mark_partial('rank')
+    return top_papers_df, timer.report()
+
+
+def search_coalesce_key(fields, start_year, end_year):
+    """检索参数规范化后的合并键：去除首尾及多余空白、忽略大小写"""
+    normalized = [' '.join(str(fields.get(name) or '').split()).lower() for name in ('theme', 'key1', 'key2')]
+    return json.dumps([*normalized, str(start_year).strip(), str(end_year).strip()], ensure_ascii=False)
+
+
+def run_search(fields, year_start, year_end, paper_key, api_key):
+    """按 SEARCH_MODE 执行检索，返回 (按IF排序的全部论文 DataFrame, 各阶段耗时)"""
+    if SEARCH_MODE == 'pipelined':
+        from search_pipeline import SearchPipeline
+        # 流水线模式：翻译、PubMed 分块获取、解析与期刊IF查询按依赖关系并发执行
+        pipeline = SearchPipeline(paper_key, api_key, translate_terms=translate_search_terms, retmax=SEARCH_RETMAX)
+        return pipeline.run(fields, year_start, year_end, top_n=SEARCH_RETMAX)
+    return search_sequential(fields, year_start, year_end, paper_key, api_key, top_n=SEARCH_RETMAX,
+                             retmax=SEARCH_RETMAX)
+
+
+def parse_page_size(value):
+    """解析请求中的每页条数，缺省或无效时使用 SEARCH_PAGE_SIZE，并限制在 1~SEARCH_MAX_PAGE_SIZE"""
+    try:
+        page_size = int(value) if value not in (None, '') else SEARCH_PAGE_SIZE
+    except (TypeError, ValueError):
+        page_size = SEARCH_PAGE_SIZE
+    return max(1, min(page_size, SEARCH_MAX_PAGE_SIZE))
+
+
+def parse_year_range(start_year, end_year):
+    """解析请求中的起止年份，必须都是四位数字年份且起始不晚于结束，否则返回 None"""
+    years = []
+    for value in (start_year, end_year):
+        text = str(value).strip() if isinstance(value, (int, str)) else ''
+        if not re.fullmatch(r'[0-9]{4}', text):
+            return None
+        years.append(int(text))
+    return tuple(years) if years[0] <= years[1] else None
+
+
+def build_result_rows(ranked_papers_df):
+    """
+    把排序后的论文转换为表格行；完整论文记录保存在服务端（paper_store），前端只拿到展示所需字段。
+    """
+    import pandas as pd
+
+    rows = []
+    records = []
+    for i, (_, paper) in enumerate(ranked_papers_df.iterrows()):
+        pmid = safe_get_value(paper, 'pmid')
+        title = safe_get_value(paper, 'title', '无标题')
+        journal = safe_get_value(paper, 'journal', '无期刊信息')
+        pub_date = safe_get_value(paper, 'year', '无日期')
+        url = safe_get_value(paper, 'url', '#')
+        abstract = safe_get_value(paper, 'abstract', '')
+
+        # 获取影响因子并格式化
+        impact_factor = paper.get('影响因子', 'N/A')
+        if impact_factor is None or impact_factor == 'N/A' or pd.isna(impact_factor):
+            impact_factor_str = 'N/A'
+        else:
+            try:
+                impact_factor_str = f"{float(impact_factor):.2f}"
+            except (ValueError, TypeError):
+                impact_factor_str = 'N/A'
+
+        records.append({
+            'pmid': pmid,
+            'title': title,
+            'journal': journal,
+            'pub_date': pub_date,
+            'url': url,
+            'abstract': abstract,
+            'authors': safe_get_value(paper, 'authors'),
+            'impact_factor': impact_factor_str
+        })
+        rows.append({
+            'id': i,
+            'pmid': pmid,
+            'title': title[:100] + '...' if len(title) > 100 else title,
+            'journal': journal,
+            'pub_date': pub_date,
+            'url': url,
+            'impact_factor': impact_factor_str
+        })
+    # 一次事务写入本次检索的全部论文
+    paper_store.put_many(records)
+    return rows
+
+
+@bp.route('/api/search', methods=['POST'])
+@conditional_json(ttl=SEARCH_ETAG_TTL)
 def api_search():
     """处理论文搜索请求"""
     start_time = time.time()
@@ -122,84 +299,73 @@ def api_search():
             }
         }
 
-        app_logger.info(f"收到检索请求: {json.dumps(search_info, ensure_ascii=False)}")
+        app_logger.debug(f"收到检索请求: {json.dumps(search_info, ensure_ascii=False)}")
         # 截图KEY
         PAPER_KEY = 'PAPER_KEY'
         # 阿里云KEY
         API_KEY = 'API_KEY'
 
-        # 构建查询
-        query_parts = []
-        if theme and theme.strip():
-            theme = baidu_translate_if_chinese(theme, target_lang="en")
-            query_parts.append(f'("{theme.strip()}"[Title]')
-        if key1 and key1.strip():
-            key1 = baidu_translate_if_chinese(key1, target_lang="en")
-            query_parts.append(f'AND "{key1.strip()}"[Title/Abstract])')
-        if key2 and key2.strip():
-            key2 = baidu_translate_if_chinese(key2, target_lang="en")
-            query_parts.append(f'AND "{key2.strip()}"[Journal]')
-        query = " ".join(query_parts)
-        app_logger.info(f'检索内容为:{query}')
-
-        # PubMed搜索
-        app_logger.info("开始PubMed搜索...")
-        searcher = PubMedSearcher(query, PAPER_KEY, year_start=int(start_year), year_end=int(end_year))
-        papers = searcher.run()
-        app_logger.info(f"PubMed搜索完成，找到 {len(papers)} 篇论文")
-
-        if len(papers) == 0:
+        year_range = parse_year_range(start_year, end_year)
+        if year_range is None:
+            app_logger.warning(f"无效的年份范围: {start_year!r} - {end_year!r}")
+            return jsonify({'result': '无效的年份范围，请选择有效的起止年份'}), 400
+
+        fields = {'theme': theme, 'key1': key1, 'key2': key2}
+        year_start, year_end = year_range
+        page_size = parse_page_size(data.get('page_size'))
+        # 相同条件的并发检索共享一次执行结果；各阶段只使用 SEARCH_DEADLINE 内剩余的时间，到期返回部分结果
+        coalesce_key = search_coalesce_key(fields, year_start, year_end)
+        with deadline_scope(SEARCH_DEADLINE):
+            (ranked_papers_df, timings), coalesced = search_single_flight.do(
+                coalesce_key,
+                lambda: run_search(fields, year_start, year_end, PAPER_KEY, API_KEY)
+            )
+        if coalesced:
+            app_logger.info("检索条件与进行中的请求相同，已复用其结果")
+        else:
+            # 合并的请求共享同一次执行，只记录一次各阶段耗时
+            metrics.observe_timings(timings)
+
+        if ranked_papers_df.empty:
             app_logger.info(f'抱歉未找到相关文献，请重新选择检索标准')
             elapsed_time = (time.time() - start_time) * 1000
             app_logger.info(f"API搜索请求处理完成 - 响应时间: {elapsed_time:.2f}ms")
-            return jsonify({
+            response = jsonify({
                 'result': '(｡•́︿•̀｡) 抱歉\n未找到相关文献，请重新选择检索标准'
             })
+            # 空结果可能来自截止时间截断或 NCBI 临时故障（search_pubmed 出错时返回空列表），不记录指纹，重试时重新检索
+            return no_store(response)
+        app_logger.info(f"论文排名完成，共 {len(ranked_papers_df)} 篇论文, 各阶段耗时: {timings}")
+        if timings.get('partial'):
+            app_logger.warning(f"检索已到截止时间 {SEARCH_DEADLINE:g} 秒，返回部分结果: {timings['partial']}")
 
-        # 论文排名 (按影响因子排序)
-        app_logger.info("开始论文排名...")
-        ranker = PaperRankerByIF(pd.DataFrame(papers), journal_column_name='journal', api_key=API_KEY)
-
-        # 获取按IF排序的前10篇论文
-        top_papers_df = ranker.get_top_papers(top_n=10)
-        app_logger.info(f"论文排名完成，获取到 {len(top_papers_df)} 篇论文 (最多10篇)")
-
-        # 准备表格数据
-        table_data = []
-        for i, (_, paper) in enumerate(top_papers_df.iterrows()):
-            title = safe_get_value(paper, 'title', '无标题')
-            journal = safe_get_value(paper, 'journal', '无期刊信息')
-            pub_date = safe_get_value(paper, 'year', '无日期')
-            url = safe_get_value(paper, 'url', '#')
-            abstract = safe_get_value(paper, 'abstract', '')
-
-            # 获取影响因子并格式化
-            impact_factor = paper.get('影响因子', 'N/A')
-            if pd.isna(impact_factor) or impact_factor is None or impact_factor == 'N/A':
-                impact_factor_str = 'N/A'
-            else:
-                try:
-                    impact_factor_str = f"{float(impact_factor):.2f}"
-                except (ValueError, TypeError):
-                    impact_factor_str = 'N/A'
-
-            table_data.append({
-                'id': i,
-                'title': title[:100] + '...' if len(title) > 100 else title,
-                'journal': journal,
-                'pub_date': pub_date,
-                'url': url,
-                'abstract': abstract,
-                'impact_factor': impact_factor_str
-            })
+        # 完整排序结果保存为检索会话，本次只返回第一页
+        rows = build_result_rows(ranked_papers_df)
+        session_id = search_sessions.create(rows)
+        table_data, next_cursor, total = search_sessions.page(session_id, 0, page_size)
 
         elapsed_time = (time.time() - start_time) * 1000
         app_logger.info(f"API搜索请求处理完成 - 响应时间: {elapsed_time:.2f}ms")
 
-        return jsonify({
+        response = jsonify({
             'papers': table_data,
+            'next_cursor': next_cursor,
+            'total': total,
+            'timings': timings,
+            'partial': bool(timings.get('partial')),
+            'coalesced': coalesced,
             'status': 'success'
         })
+        # 部分结果不记录指纹，重试时重新检索而不是在有效期内一直返回 304
+        if timings.get('partial'):
+            return no_store(response)
+        # ETag 只按检索条件与结果计算，timings、coalesced 每次执行都不同
+        return set_payload_etag(response, {
+            'query': coalesce_key,
+            'papers': table_data,
+            'next_cursor': next_cursor,
+            'total': total
+        })
 
     except Exception as e:
         error_msg = f"检索处理出错: {str(e)}"
@@ -209,7 +375,30 @@ def api_search():
         return jsonify({'result': f'检索出错：{str(e)}'}), 500
 
 
-@app.route('/api/get_paper_summary', methods=['POST'])
+@bp.route('/api/search/next', methods=['POST'])
+def api_search_next():
+    """按游标返回检索结果的下一页，不重新访问 NCBI 或大模型"""
+    data = request.get_json(silent=True) or {}
+    parsed = SearchSessionStore.parse_cursor(data.get('cursor'))
+    if parsed is None:
+        return jsonify({'result': '无效的分页游标'}), 400
+
+    session_id, offset = parsed
+    page = search_sessions.page(session_id, offset, parse_page_size(data.get('page_size')))
+    if page is None:
+        return jsonify({'result': '检索结果已过期，请重新检索'}), 404
+
+    table_data, next_cursor, total = page
+    return jsonify({
+        'papers': table_data,
+        'next_cursor': next_cursor,
+        'total': total,
+        'status': 'success'
+    })
+
+
+@bp.route('/api/get_paper_summary', methods=['POST'])
+@conditional_json(ttl=SUMMARY_ETAG_TTL)
 def get_paper_summary():
     """获取单篇论文的总结"""
     start_time = time.time()
@@ -218,39 +407,47 @@ def get_paper_summary():
         if not data:
             return jsonify({'error': '无效的请求数据'}), 400
 
-        paper_id = data.get('paper_id')
-        paper_data = data.get('paper_data')
+        pmid = str(data.get('pmid') or '').strip()
+        if not pmid:
+            return jsonify({'error': '缺少论文PMID'}), 400
 
-        if paper_id is None or not paper_data:
-            return jsonify({'error': '缺少论文ID或数据'}), 400
+        paper = paper_store.get(pmid)
+        if paper is None:
+            return jsonify({'error': '论文信息已过期，请重新检索'}), 404
 
         API_KEY = 'your_key'
 
-        # 使用前端传来的论文数据
-        title = safe_get_value(paper_data, 'title')
-        url = safe_get_value(paper_data, 'url')
-        abstract = safe_get_value(paper_data, 'abstract')
+        # 使用检索时保存在服务端的论文数据
+        title = paper['title']
+        url = paper['url']
+        abstract = paper['abstract']
 
         paper_data_str = f"title:{title}\nurl:{url}\nabstract:{abstract}"
 
         summary = "无法生成总结"
+        failed = False
         if paper_data_str:
             try:
-                app_logger.info(f"开始生成论文{paper_id}的总结...")
+                app_logger.info(f"开始生成论文{pmid}的总结...")
+                from get_data_xhs import QuestionAnswerer
                 qa_agent_v3 = QuestionAnswerer(api_key=API_KEY, model_name="deepseek-v3")
-                summary = qa_agent_v3.ask(paper_data_str)
-                app_logger.info(f"论文{paper_id}总结生成完成")
+                with metrics.time_stage('summary'), deadline_scope(SUMMARY_DEADLINE):
+                    summary = qa_agent_v3.ask(paper_data_str)
+                app_logger.info(f"论文{pmid}总结生成完成")
             except Exception as e:
-                app_logger.error(f"生成论文{paper_id}总结失败: {e}", exc_info=True)
+                app_logger.error(f"生成论文{pmid}总结失败: {e}", exc_info=True)
                 summary = "总结生成失败"
+                failed = True
 
         elapsed_time = (time.time() - start_time) * 1000
         app_logger.info(f"论文总结请求处理完成 - 响应时间: {elapsed_time:.2f}ms")
 
-        return jsonify({
+        response = jsonify({
             'summary': summary,
             'status': 'completed'
         })
+        # 生成失败的结果不能被条件请求复用，否则重试会在指纹有效期内一直拿到 304
+        return no_store(response) if failed else response
 
     except Exception as e:
         app_logger.error(f"论文总结处理出错: {str(e)}", exc_info=True)
@@ -259,99 +456,167 @@ def get_paper_summary():
         return jsonify({'error': f'处理出错：{str(e)}'}), 500
 
 
-@app.route('/api/generate_images', methods=['POST'])
-def generate_images():
-    """为指定论文生成图片"""
-    start_time = time.time()
+def _store_generated_image(temp_filepath, alias):
+    """把生成好的临时图片移入图片存储，返回 {'url', 'thumb_url', ...}；文件缺失或为空时返回 None"""
+    if temp_filepath and os.path.exists(temp_filepath) and os.path.getsize(temp_filepath) > 0:
+        return image_store.put_file(temp_filepath, alias)
+    return None
+
+
+def _coalesced_generate(alias, generate):
+    """
+    同一图片的并发生成请求只执行一次（跨线程与 worker 进程），其余请求等待并复用结果。
+    返回图片存储结果，失败时返回 None。
+    """
     try:
-        data = request.get_json()
-        paper_id = data.get('paper_id')
-        paper_data = data.get('paper_data')
+        stored, shared = image_single_flight.do(alias, generate, recheck=lambda: image_store.lookup(alias))
+        if shared:
+            app_logger.info(f"复用并发请求的生成结果: {alias}")
+        return stored
+    except Exception as e:
+        app_logger.error(f"图片生成失败 {alias}: {e}", exc_info=True)
+        return None
 
-        if paper_id is None or not paper_data:
-            return jsonify({'error': '缺少论文ID或数据'}), 400
 
-        API_KEY = 'your_key'
+def _generate_screenshot(url, alias):
+    from get_photo import get_screenshot_local
+    temp_filepath = image_store.temp_path('.png')
+    try:
+        app_logger.info(f"开始进行截图: {alias}")
+        with metrics.time_stage('screenshot'):
+            result = get_screenshot_local(url, "01989db5-12f7-772d-8a32-6e3bb031c3b3", temp_filepath)
+
+        stored = _store_generated_image(temp_filepath, alias) if result == temp_filepath else None
+        if stored:
+            app_logger.info(f"截图完成: {stored['url']}")
+            return stored
+        app_logger.warning(f"截图文件未生成或为空: {result}")
+    except Exception as e:
+        app_logger.error(f"截图失败: {e}", exc_info=True)
+    finally:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+    return None
+
 
-        app_logger.info(f"开始为论文{paper_id}生成图片...")
-
-        # 获取论文数据
-        title = safe_get_value(paper_data, 'title')
-        url = safe_get_value(paper_data, 'url')
-        abstract = safe_get_value(paper_data, 'abstract')
-
-        # 提取PMID用于文件命名
-        path = extract_pmid_from_paper_url(url) if url else f"paper_{paper_id}_{int(time.time())}"
-
-        image2_url = None
-        ai_image_url = None
-
-        # 截图处理
-        if url:
-            screenshot_filename = f'screenshot_{path}.jpg'
-            screenshot_filepath = os.path.join('dynamic_images', screenshot_filename)
-
-            # 检查截图文件是否已存在
-            if os.path.exists(screenshot_filepath) and os.path.getsize(screenshot_filepath) > 0:
-                image2_url = f"dynamic_images/{screenshot_filename}"
-                app_logger.info(f"使用已存在的截图: {screenshot_filepath}")
-            else:
-                try:
-                    app_logger.info(f"开始进行截图到: {screenshot_filepath}")
-                    get_screenshot_local(url, "01989db5-12f7-772d-8a32-6e3bb031c3b3", screenshot_filepath)
-
-                    if os.path.exists(screenshot_filepath) and os.path.getsize(screenshot_filepath) > 0:
-                        image2_url = f"dynamic_images/{screenshot_filename}"
-                        app_logger.info(f"截图完成: {screenshot_filepath}")
-                    else:
-                        app_logger.warning(f"截图文件未生成或为空: {screenshot_filepath}")
-                except Exception as e:
-                    app_logger.error(f"截图失败: {e}", exc_info=True)
-
-        # AI图片生成
-        paper_data_str = f"title:{title}\nabstract:{abstract}" if title else "无论文数据"
-
-        if paper_data_str and paper_data_str != "无论文数据":
-            ai_filename = f'Ai_{path}.jpg'
-            ai_filepath = os.path.join('dynamic_images', ai_filename)
-
-            # 检查AI图片文件是否已存在
-            if os.path.exists(ai_filepath) and os.path.getsize(ai_filepath) > 0:
-                ai_image_url = f"dynamic_images/{ai_filename}"
-                app_logger.info(f"使用已存在的AI图片: {ai_filepath}")
-            else:
-                try:
-                    app_logger.info(f"开始生成AI图片到: {ai_filepath}")
-                    photo_creator = Create_photo(api_key=API_KEY, file_name=ai_filepath)
-                    file_path = photo_creator.create(paper_data_str)
-
-                    if file_path and os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                        if not os.path.exists(ai_filepath):
-                            shutil.copy2(file_path, ai_filepath)
-                        ai_image_url = f"dynamic_images/{ai_filename}"
-                        app_logger.info(f"AI图片生成完成: {ai_filepath}")
-                    else:
-                        app_logger.warning(f"AI图片未生成或为空: {file_path}")
-                except Exception as e:
-                    app_logger.error(f"创建AI图片失败: {e}", exc_info=True)
-
-        # 返回图片URL
-        images_result = [
-            f'主页截图链接:{str(image2_url or "暂无")}',
-            f'AI插图链接:{str(ai_image_url or "暂无")}'
-        ]
-        images_result = '\n\n'.join(images_result)
-
-        app_logger.info(f'图片地址: {images_result}')
+def capture_screenshot(url, path):
+    """为论文主页截图，返回图片存储结果 {'url', 'thumb_url', ...}，失败时返回 None"""
+    alias = f'screenshot:{path}'
+
+    # 检查截图是否已存在
+    stored = image_store.lookup(alias)
+    if stored:
+        app_logger.info(f"使用已存在的截图: {stored['url']}")
+        return stored
+
+    return _coalesced_generate(alias, lambda: _generate_screenshot(url, alias))
+
+
+def _generate_ai_image(paper_data_str, alias):
+    # dashscope 只在首次生成AI图片时导入
+    from create_photo import Create_photo
+    API_KEY = 'your_key'
+
+    temp_filepath = image_store.temp_path('.jpg')
+    try:
+        app_logger.info(f"开始生成AI图片: {alias}")
+        photo_creator = Create_photo(api_key=API_KEY, file_name=temp_filepath)
+        with metrics.time_stage('image_synthesis'):
+            file_path = photo_creator.create(paper_data_str)
+
+        stored = _store_generated_image(file_path, alias)
+        if stored:
+            app_logger.info(f"AI图片生成完成: {stored['url']}")
+            return stored
+        app_logger.warning(f"AI图片未生成或为空: {file_path}")
+    except Exception as e:
+        app_logger.error(f"创建AI图片失败: {e}", exc_info=True)
+    finally:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+    return None
+
+
+def create_ai_image(paper_data_str, path):
+    """生成论文AI插图，返回图片存储结果 {'url', 'thumb_url', ...}，失败时返回 None"""
+    alias = f'ai:{path}'
+
+    # 检查AI图片是否已存在
+    stored = image_store.lookup(alias)
+    if stored:
+        app_logger.info(f"使用已存在的AI图片: {stored['url']}")
+        return stored
+
+    return _coalesced_generate(alias, lambda: _generate_ai_image(paper_data_str, alias))
+
+
+def generate_images_job(pmid, title, url, abstract):
+    """后台任务：并行完成主页截图与AI插图生成，返回图片地址文本"""
+    start_time = time.time()
+    app_logger.info(f"开始为论文{pmid}生成图片...")
+
+    # PMID 作为图片别名
+    path = pmid
+
+    # AI图片生成所需的论文数据
+    paper_data_str = f"title:{title}\nabstract:{abstract}" if title else "无论文数据"
+
+    tasks = [
+        (lambda: capture_screenshot(url, path)) if url else (lambda: None),
+        (lambda: create_ai_image(paper_data_str, path)) if paper_data_str != "无论文数据" else (lambda: None)
+    ]
+    screenshot, ai_image = image_job_manager.run_parallel(*tasks)
+
+    # 返回图片URL（原图链接与结果页使用的缩略图）
+    images_result = [
+        f'主页截图链接:{screenshot["url"] if screenshot else "暂无"}',
+        f'AI插图链接:{ai_image["url"] if ai_image else "暂无"}'
+    ]
+    if screenshot and screenshot['thumb_url']:
+        images_result.append(f'主页截图缩略图:{screenshot["thumb_url"]}')
+    if ai_image and ai_image['thumb_url']:
+        images_result.append(f'AI插图缩略图:{ai_image["thumb_url"]}')
+    images_result = '\n\n'.join(images_result)
+
+    app_logger.info(f'图片地址: {images_result}')
+    elapsed_time = (time.time() - start_time) * 1000
+    app_logger.info(f"论文{pmid}图片生成任务完成 - 耗时: {elapsed_time:.2f}ms")
+    return images_result
+
+
+@bp.route('/api/generate_images', methods=['POST'])
+def generate_images():
+    """为指定论文提交图片生成任务，立即返回任务ID，结果通过 /api/jobs/<job_id> 查询"""
+    start_time = time.time()
+    try:
+        data = request.get_json() or {}
+        pmid = str(data.get('pmid') or '').strip()
+        if not pmid:
+            return jsonify({'error': '缺少论文PMID'}), 400
+
+        paper = paper_store.get(pmid)
+        if paper is None:
+            return jsonify({'error': '论文信息已过期，请重新检索'}), 404
+
+        params = {
+            'pmid': pmid,
+            'title': paper['title'],
+            'url': paper['url'],
+            'abstract': paper['abstract']
+        }
+        job_id = image_job_manager.submit('generate_images', generate_images_job, params)
 
         elapsed_time = (time.time() - start_time) * 1000
-        app_logger.info(f"图片生成请求处理完成 - 响应时间: {elapsed_time:.2f}ms")
+        app_logger.info(f"图片生成任务已提交 - 论文: {pmid}, 任务ID: {job_id}, 响应时间: {elapsed_time:.2f}ms")
 
         return jsonify({
-            'result': images_result,
-            'status': 'completed'
-        })
+            'job_id': job_id,
+            'status': STATUS_QUEUED
+        }), 202
 
+    except JobQueueFull as e:
+        app_logger.warning(f"图片生成任务提交失败: {e}")
+        return jsonify({'error': '当前图片生成任务过多，请稍后再试'}), 503
     except Exception as e:
         app_logger.error(f"图片生成处理出错: {str(e)}", exc_info=True)
         elapsed_time = (time.time() - start_time) * 1000
@@ -359,83 +624,144 @@ def generate_images():
         return jsonify({'error': f'图片生成出错：{str(e)}'}), 500
 
 
-# 提供动态生成的图片文件
-@app.route('/dynamic_images/<path:filename>')
-def serve_dynamic_image(filename):
-    """提供动态生成的图片文件"""
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """查询后台任务状态；任务完成时返回结果，失败时返回错误信息"""
     try:
-        if '..' in filename or filename.startswith('/'):
-            app_logger.warning(f"尝试访问非法文件路径: {filename}")
-            return "无效的文件名", 400
+        job = image_job_manager.get(job_id)
+        if job is None:
+            return jsonify({'error': '任务不存在或已过期'}), 404
 
-        file_path = os.path.join('dynamic_images', filename)
-        app_logger.info(f"请求动态图片: {file_path}")
+        response = {
+            'job_id': job['job_id'],
+            'status': job['status']
+        }
+        if job['status'] == STATUS_COMPLETED:
+            response['result'] = job['result']
+        elif job['status'] == STATUS_FAILED:
+            response['error'] = job['error'] or '任务执行失败'
+        return jsonify(response)
 
-        if os.path.exists(file_path):
-            return send_from_directory('dynamic_images', filename)
-        else:
-            app_logger.warning(f"动态图片未找到: {file_path}")
-            return "图片未找到", 404
+    except Exception as e:
+        app_logger.error(f"查询任务状态出错 {job_id}: {e}", exc_info=True)
+        return jsonify({'error': f'查询任务出错：{str(e)}'}), 500
+
+
+def collect_runtime_metrics():
+    """抓取 /metrics 时读取各缓存命中数、进行中的合并任务与后台任务数"""
+    samples = []
+    samples += cache_samples('translation', translation_cache.hits, translation_cache.misses)
+    samples += cache_samples('paper_store', paper_store.hits, paper_store.misses)
+    samples += cache_samples('http_fingerprint', fingerprint_cache.hits, fingerprint_cache.misses)
+    samples += [
+        ('single_flight_in_flight', 'gauge', '正在执行的合并任务数', {'group': 'search'},
+         search_single_flight.in_flight()),
+        ('single_flight_in_flight', 'gauge', '正在执行的合并任务数', {'group': 'image'},
+         image_single_flight.in_flight()),
+        ('image_jobs_pending', 'gauge', '排队中与执行中的图片生成任务数', {}, image_job_manager.pending()),
+        ('search_sessions', 'gauge', '保存中的检索会话数', {}, len(search_sessions)),
+        ('log_records_dropped_total', 'counter', '因日志队列已满而丢弃的日志记录数', {}, dropped_records()),
+    ]
+    return samples
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 文本格式的指标"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@bp.route('/api/llm_stats', methods=['GET'])
+def llm_stats_api():
+    """返回进程内大模型调用统计（按模型的耗时直方图、token 用量、重试与错误类型）"""
+    try:
+        return jsonify({
+            'models': llm_stats.snapshot(),
+            'status': 'success'
+        })
+    except Exception as e:
+        app_logger.error(f"获取大模型调用统计失败: {e}", exc_info=True)
+        return jsonify({'error': f'获取统计出错：{str(e)}'}), 500
 
+
+# 提供动态生成的图片文件
+@bp.route('/dynamic_images/<path:filename>')
+def serve_dynamic_image(filename):
+    """提供动态生成的图片文件（不读入内存，支持条件请求）"""
+    file_path = safe_join('dynamic_images', filename)
+    if file_path is None:
+        app_logger.warning(f"尝试访问非法文件路径: {filename}")
+        return "无效的文件名", 400
+
+    # 图片存储中的文件按内容哈希命名，内容不会变化
+    if filename.startswith(('objects/', 'thumbs/')):
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = DEFAULT_CACHE_CONTROL
+    try:
+        return send_binary_file(file_path, cache_control)
+    except (FileNotFoundError, NotFound):
+        app_logger.warning(f"动态图片未找到: {file_path}")
+        return "图片未找到", 404
     except Exception as e:
         app_logger.error(f"提供动态图片失败 {filename}: {e}")
         return "服务器错误", 500
 
 
 # 提供主页
-@app.route('/')
+@bp.route('/')
 def index():
-    """提供主页HTML文件"""
-    start_time = time.time()
-    app_logger.info(f"用户访问首页 - IP: {request.remote_addr}, User-Agent: {request.user_agent}")
+    """提供主页HTML文件（内存缓存、预压缩，客户端通过 ETag 重新验证）"""
     try:
-        with open('index.html', 'r', encoding='utf-8') as f:
-            app_logger.info("成功加载首页HTML文件")
-            response_content = f.read()
-            elapsed_time = (time.time() - start_time) * 1000
-            app_logger.info(f"首页请求处理完成 - 响应时间: {elapsed_time:.2f}ms")
-            return response_content
+        return asset_cache.serve('index.html', cache_control='no-cache')
     except FileNotFoundError:
-        error_msg = "错误：找不到 index.html 文件"
-        app_logger.error(error_msg)
-        elapsed_time = (time.time() - start_time) * 1000
-        app_logger.info(f"首页请求处理完成(错误) - 响应时间: {elapsed_time:.2f}ms")
+        app_logger.error("错误：找不到 index.html 文件")
         return '<h1>错误：找不到 index.html 文件</h1><p>请确保 index.html 文件与 app.py 在同一目录下</p>'
 
 
 # 提供静态文件
-@app.route('/static/<path:filename>')
+@bp.route('/static/<path:filename>')
 def custom_static(filename):
-    """提供静态文件"""
-    start_time = time.time()
+    """提供静态文件：文本类资源从内存返回预压缩版本，其余文件直接发送"""
+    file_path = safe_join(STATIC_FOLDER, filename)
+    if file_path is None:
+        app_logger.warning(f"尝试访问非法文件路径: {filename}")
+        return jsonify({'error': 'File not found'}), 404
+
+    cache_control = cache_control_for(filename)
     try:
-        app_logger.debug(f"提供静态文件: {filename}")
-        response = send_from_directory(app.static_folder, filename)
-        response.headers['Cache-Control'] = 'public, max-age=3600'
-        elapsed_time = (time.time() - start_time) * 1000
-        app_logger.info(f"静态文件请求处理完成 - 文件: {filename}, 响应时间: {elapsed_time:.2f}ms")
-        return response
+        if asset_cache.is_cacheable(file_path):
+            return asset_cache.serve(file_path, cache_control=cache_control)
+        return send_binary_file(file_path, cache_control)
+    except (FileNotFoundError, IsADirectoryError, NotFound):
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         app_logger.error(f"提供静态文件失败 {filename}: {e}")
-        elapsed_time = (time.time() - start_time) * 1000
-        app_logger.info(f"静态文件请求处理完成(错误) - 文件: {filename}, 响应时间: {elapsed_time:.2f}ms")
         return jsonify({'error': 'File not found'}), 404
 
 
 # 请求前钩子
-@app.before_request
+@bp.before_app_request
 def log_request_info():
     """记录请求信息"""
     request.start_time = time.time()
-    if request.endpoint and request.endpoint not in ['static', 'custom_static', 'serve_dynamic_image']:
+    request.metrics_endpoint = request.endpoint or 'unmatched'
+    metrics.gauge_add(HTTP_REQUESTS_IN_FLIGHT, {'endpoint': request.metrics_endpoint}, 1)
+    # 请求ID写入本次请求的所有日志；LOG_LEVEL=DEBUG 时客户端可用 X-Debug-Log: 1 强制记录 DEBUG 明细
+    request.request_id = begin_request(request.headers.get('X-Request-ID', '')[:64] or None,
+                                       sample_debug=True if request.headers.get('X-Debug-Log') == '1' else None)
+    if request.endpoint and request.endpoint not in UNLOGGED_ENDPOINTS:
         app_logger.info(f"收到请求 - 方法: {request.method}, 路径: {request.path}, IP: {request.remote_addr}")
+        # 按需采样分析：X-Profile 请求头或 profile 查询参数携带口令，或按 PROFILE_SAMPLE_EVERY 抽样
+        if should_profile(request.headers.get('X-Profile') or request.args.get('profile')):
+            request.profiler = RequestProfiler(f"{request.endpoint}_{request.request_id}").start()
 
 
 # 响应后钩子
-@app.after_request
+@bp.after_app_request
 def log_response_info(response):
     """记录响应信息"""
-    if request.endpoint and request.endpoint not in ['static', 'custom_static', 'serve_dynamic_image']:
+    if request.endpoint and request.endpoint not in UNLOGGED_ENDPOINTS:
         if hasattr(request, 'start_time'):
             elapsed_time = (time.time() - request.start_time) * 1000
             app_logger.info(
@@ -443,9 +769,49 @@ def log_response_info(response):
         else:
             app_logger.info(
                 f"响应完成 - 状态码: {response.status_code}, 路径: {request.path}, 内容长度: {response.content_length or 0}")
+    if hasattr(request, 'request_id'):
+        response.headers['X-Request-ID'] = request.request_id
+    profile_path = finish_profiler()
+    # 没有采到样本时不会写出文件，也就不返回文件名
+    if profile_path and os.path.exists(profile_path):
+        response.headers['X-Profile-File'] = os.path.basename(profile_path)
+    record_request_metrics(response.status_code)
     return response
 
 
+def finish_profiler():
+    """停止本次请求的采样分析并写出文件，返回文件路径（未开启分析、已停止或没有样本时返回 None）"""
+    profiler = getattr(request, 'profiler', None)
+    if profiler is None:
+        return None
+    request.profiler = None
+    elapsed_ms = profiler.elapsed_ms
+    path = profiler.stop()
+    app_logger.info(f"请求分析完成 - 路径: {request.path}, 耗时: {elapsed_ms:.2f}ms, "
+                    f"样本数: {profiler.sample_count}, 文件: {path}")
+    return path
+
+
+def record_request_metrics(status_code):
+    """记录请求计数与耗时，并减少进行中的请求数（每个请求只记录一次）"""
+    endpoint = getattr(request, 'metrics_endpoint', None)
+    if endpoint is None or getattr(request, 'metrics_recorded', False):
+        return
+    request.metrics_recorded = True
+    metrics.gauge_add(HTTP_REQUESTS_IN_FLIGHT, {'endpoint': endpoint}, -1)
+    metrics.inc(HTTP_REQUESTS_TOTAL, {'endpoint': endpoint, 'method': request.method, 'status': str(status_code)})
+    metrics.observe(HTTP_REQUEST_DURATION, {'endpoint': endpoint}, time.time() - request.start_time)
+
+
+@bp.teardown_app_request
+def clear_request_context(exc):
+    # 未处理的异常不会经过 after_request，这里补记为 500
+    record_request_metrics(500)
+    # 正常响应已在 after_request 中停止分析，这里处理未处理异常的请求
+    finish_profiler()
+    end_request()
+
+
 # 应用入口
 if __name__ == '__main__':
     print("正在启动论文检索系统...")
@@ -458,4 +824,4 @@ if __name__ == '__main__':
         app_logger.warning("✗ 警告：未找到 index.html 文件")
         print("✗ 警告：未找到 index.html 文件")
 
-    app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
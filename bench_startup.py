@@ -0,0 +1,145 @@
+# bench_startup.py
+# 启动开销基准：每轮在一个全新的 Python 进程中依次测量
+#   import app → create_app() → 首次检索需要的模块（pandas/openai）→ 首次生成图片需要的模块（dashscope）
+# 各阶段的耗时与进程常驻内存（RSS），取多轮中位数，并列出 import app 之后已加载的重依赖。
+# 可设置阈值，超出时以非零状态码退出，便于在 CI 中发现启动回归。
+#
+# 用法：
+#   python bench_startup.py --runs 5
+#   python bench_startup.py --runs 5 --max-import-ms 500 --max-rss-mb 120 --top 10
+#   python bench_startup.py --json
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# 不应在 import app 时加载的重依赖（按导入名），对应 requirements.txt 与 requirements-optional.txt 中的较重的包；
+# brotli 体积很小且由 http_cache 在启动时导入，不计入
+HEAVY_MODULES = ('pandas', 'numpy', 'openai', 'dashscope', 'openpyxl', 'playwright', 'PIL', 'tiktoken')
+
+# 子进程中执行的测量脚本，结果以一行 JSON 输出
+_CHILD_SCRIPT = r'''
+import json, sys, time
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+stages = []
+def measure(name, func):
+    start = time.perf_counter()
+    func()
+    stages.append({'stage': name, 'ms': (time.perf_counter() - start) * 1000, 'rss_mb': rss_mb()})
+
+stages.append({'stage': 'interpreter', 'ms': 0.0, 'rss_mb': rss_mb()})
+measure('import_app', lambda: __import__('app'))
+loaded = [name for name in HEAVY if name in sys.modules]
+app_module = sys.modules['app']
+measure('create_app', app_module.create_app)
+measure('first_search_imports', lambda: [__import__(m) for m in ('search_pipeline', 'paper_api', 'compare_IF', 'get_data_xhs')])
+measure('first_image_imports', lambda: [__import__(m) for m in ('create_photo', 'get_photo')])
+print(json.dumps({'stages': stages, 'heavy_after_import': loaded}))
+'''
+
+
+def _child_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = APP_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    env['LOG_CONSOLE'] = '0'
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def run_once(workdir):
+    """在新进程中测量一轮，返回子进程输出的结果字典"""
+    script = f"HEAVY = {HEAVY_MODULES!r}\n" + _CHILD_SCRIPT
+    result = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=_child_env(),
+                            capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"测量进程失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def top_imports(workdir, top_n):
+    """用 -X importtime 找出 import app 时累计耗时最多的直接依赖，返回 [(模块, 毫秒), ...]"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir,
+                            env=_child_env(), capture_output=True, text=True, timeout=300)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)', line)
+        # 比顶层的 app 多缩进两个空格的是 app 直接导入的模块
+        if match and len(match.group(2)) == 2:
+            entries.append((match.group(3), int(match.group(1)) / 1000))
+    return sorted(entries, key=lambda item: item[1], reverse=True)[:top_n]
+
+
+def summarize(runs):
+    """按阶段取各轮的中位数"""
+    summary = []
+    for idx, stage in enumerate(runs[0]['stages']):
+        summary.append({
+            'stage': stage['stage'],
+            'ms': round(statistics.median(run['stages'][idx]['ms'] for run in runs), 1),
+            'rss_mb': round(statistics.median(run['stages'][idx]['rss_mb'] for run in runs), 1),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量 app.py 的导入耗时与内存占用')
+    parser.add_argument('--runs', type=int, default=5, help='测量轮数，结果取中位数')
+    parser.add_argument('--top', type=int, default=0, help='列出 import app 时耗时最多的 N 个直接依赖')
+    parser.add_argument('--max-import-ms', type=float, default=None, help='import app 耗时上限（毫秒）')
+    parser.add_argument('--max-rss-mb', type=float, default=None, help='create_app() 之后的 RSS 上限（MB）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    # 在临时目录中运行，create_app() 创建的 log/、cache/ 等目录不会留在项目中
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as workdir:
+        runs = [run_once(workdir) for _ in range(args.runs)]
+        imports = top_imports(workdir, args.top) if args.top else []
+
+    summary = summarize(runs)
+    stages = {entry['stage']: entry for entry in summary}
+    heavy = runs[-1]['heavy_after_import']
+    failures = []
+    if args.max_import_ms is not None and stages['import_app']['ms'] > args.max_import_ms:
+        failures.append(f"import app 耗时 {stages['import_app']['ms']}ms 超过上限 {args.max_import_ms}ms")
+    if args.max_rss_mb is not None and stages['create_app']['rss_mb'] > args.max_rss_mb:
+        failures.append(f"create_app() 后 RSS {stages['create_app']['rss_mb']}MB 超过上限 {args.max_rss_mb}MB")
+
+    if args.json:
+        print(json.dumps({'runs': args.runs, 'stages': summary, 'heavy_after_import': heavy,
+                          'top_imports': imports, 'failures': failures}, ensure_ascii=False, indent=2))
+    else:
+        print(f"启动开销（{args.runs} 轮中位数）")
+        print(f"{'阶段':<24}{'耗时(ms)':>12}{'RSS(MB)':>12}")
+        for entry in summary:
+            print(f"{entry['stage']:<24}{entry['ms']:>12.1f}{entry['rss_mb']:>12.1f}")
+        print(f"import app 后已加载的重依赖: {', '.join(heavy) if heavy else '无'}")
+        if imports:
+            print("import app 耗时最多的直接依赖:")
+            for name, ms in imports:
+                print(f"  {name:<30}{ms:>10.1f}ms")
+        for failure in failures:
+            print(f"✗ {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+# browser_pool.py
+# 本地截图后端：在后台线程的事件循环中常驻一个无头 Chromium，预先创建若干浏览器上下文并在请求间复用，
+# 每个上下文可同时打开多个页面，总的并发页面数由信号量限制。截图耗时只取决于页面加载时间，而不依赖第三方扫描队列。
+#
+# 依赖 playwright（可选）：pip install playwright && playwright install chromium
+
+import asyncio
+import os
+import threading
+
+from log_config import get_logger
+
+logger = get_logger('get_photo', 'get_photo.log')
+
+# 常驻上下文数量、最大并发页面数（分摊到各上下文）、默认视口与超时（秒）
+BROWSER_POOL_SIZE = 2
+BROWSER_MAX_PAGES = 4
+DEFAULT_VIEWPORT = {'width': 1280, 'height': 800}
+DEFAULT_TIMEOUT = 30
+# 启动浏览器并创建上下文的超时（秒）
+BROWSER_START_TIMEOUT = 60
+
+
+class BrowserPool:
+    """
+    可复用的无头浏览器池。
+
+    Playwright 的对象只能在创建它的事件循环中使用，因此浏览器运行在独立线程的事件循环里，
+    screenshot() 供任意线程同步调用。
+    """
+
+    def __init__(self, pool_size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES, viewport=None):
+        """
+        Args:
+            pool_size (int): 常驻浏览器上下文数量，新页面开在当前页面最少的上下文中
+            max_pages (int): 所有上下文合计同时打开的最大页面数
+            viewport (dict): 默认视口大小，如 {'width': 1280, 'height': 800}
+        """
+        self.pool_size = pool_size
+        self.max_pages = max_pages
+        self.viewport = viewport or dict(DEFAULT_VIEWPORT)
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._contexts = None
+        self._context_pages = None
+        self._page_semaphore = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def started(self):
+        return self._loop is not None and self._browser is not None
+
+    def start(self):
+        """
+        启动事件循环线程与浏览器（重复调用无副作用）。
+        浏览器崩溃或断开后再次调用会在同一个事件循环中重新启动浏览器。
+        """
+        with self._start_lock:
+            if self.started:
+                return
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='browser_pool', daemon=True)
+                self._thread.start()
+            future = asyncio.run_coroutine_threadsafe(self._start(), self._loop)
+            try:
+                future.result(timeout=BROWSER_START_TIMEOUT)
+            except Exception:
+                # 启动失败或超时：关闭已创建的对象并停止线程，下次调用重新完整启动
+                future.cancel()
+                self._stop_loop()
+                raise
+            logger.info(f"浏览器池已启动: {self.pool_size} 个上下文, 最大并发页面 {self.max_pages}")
+
+    async def _launch(self):
+        """启动 Playwright（首次）并返回新的 Chromium 浏览器"""
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=True)
+
+    async def _start(self):
+        browser = None
+        try:
+            browser = await self._launch()
+            browser.on('disconnected', self._on_disconnected)
+            contexts = [await browser.new_context(viewport=self.viewport) for _ in range(self.pool_size)]
+        except BaseException:
+            await self._shutdown(browser)
+            raise
+        self._contexts = contexts
+        self._context_pages = [0] * self.pool_size
+        self._page_semaphore = asyncio.Semaphore(self.max_pages)
+        # 最后设置 _browser：started 为 True 时上下文一定已经可用
+        self._browser = browser
+
+    def _on_disconnected(self, browser):
+        """浏览器进程崩溃或被关闭时调用（浏览器线程中），清空状态，下一次截图时重新启动浏览器"""
+        if browser is not self._browser:
+            return
+        logger.warning("浏览器连接已断开，下次截图时重新启动")
+        self._browser = None
+        self._contexts = None
+        self._context_pages = None
+
+    def screenshot(self, url, output_file, viewport=None, clip=None, full_page=False,
+                   timeout=DEFAULT_TIMEOUT, wait_until='load'):
+        """
+        打开 url 并截图保存到 output_file（按扩展名选择 PNG 或 JPEG），返回 output_file。
+
+        Args:
+            viewport (dict): 本次截图使用的视口，默认使用浏览器池的视口
+            clip (dict): 截取区域 {'x', 'y', 'width', 'height'}
+            full_page (bool): 是否截取整个页面
+            timeout (float): 页面加载与截图的超时时间（秒）
+            wait_until (str): 页面加载完成的判定条件：'load' / 'domcontentloaded' / 'networkidle'
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(
+            self._screenshot(url, output_file, viewport, clip, full_page, timeout, wait_until), self._loop
+        )
+        try:
+            return future.result(timeout=timeout + 5)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def _screenshot(self, url, output_file, viewport, clip, full_page, timeout, wait_until):
+        async with self._page_semaphore:
+            # 页面状态只在浏览器线程的事件循环中修改，不需要加锁；浏览器断开后状态会被替换，这里持有本次使用的引用
+            browser, contexts, context_pages = self._browser, self._contexts, self._context_pages
+            if browser is None:
+                raise RuntimeError("浏览器连接已断开")
+            index = min(range(len(contexts)), key=context_pages.__getitem__)
+            context = contexts[index]
+            context_pages[index] += 1
+            page = None
+            temp_file = f"{output_file}.part"
+            try:
+                page = await context.new_page()
+                if viewport:
+                    await page.set_viewport_size(viewport)
+                await page.goto(url, wait_until=wait_until, timeout=timeout * 1000)
+
+                image_type = 'jpeg' if output_file.lower().endswith(('.jpg', '.jpeg')) else 'png'
+                await page.screenshot(path=temp_file, type=image_type, clip=clip, full_page=full_page,
+                                      timeout=timeout * 1000)
+                os.replace(temp_file, output_file)
+                return output_file
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+                context_pages[index] -= 1
+                if browser.is_connected():
+                    if page is not None:
+                        await page.close()
+                    # 上下文中没有其他页面时清除 cookie，下一个请求不会带上之前页面的登录状态
+                    if context_pages[index] == 0:
+                        await context.clear_cookies()
+
+    def close(self):
+        """关闭浏览器与事件循环线程"""
+        with self._start_lock:
+            if self._loop is None:
+                return
+            self._stop_loop()
+            logger.info("浏览器池已关闭")
+
+    def _stop_loop(self):
+        """在浏览器线程中关闭浏览器与 Playwright，然后停止事件循环并等待线程退出"""
+        loop = self._loop
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(self._browser), loop).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"关闭浏览器时出错: {e}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+            self._browser = None
+            self._contexts = None
+            self._context_pages = None
+            self._playwright = None
+
+    async def _shutdown(self, browser):
+        """关闭上下文、浏览器与 Playwright（忽略已断开对象的错误），并清空状态"""
+        self._browser = None
+        contexts, self._contexts, self._context_pages = self._contexts, None, None
+        playwright, self._playwright = self._playwright, None
+        for closable in [*(contexts or []), browser, playwright]:
+            if closable is None:
+                continue
+            try:
+                await (closable.stop() if closable is playwright else closable.close())
+            except Exception as e:
+                logger.warning(f"关闭浏览器对象失败: {e}")
+
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """返回进程内共享的浏览器池（首次截图时才启动浏览器）"""
+    global _browser_pool
+    if _browser_pool is None:
+        with _browser_pool_lock:
+            if _browser_pool is None:
+                _browser_pool = BrowserPool()
+    return _browser_pool
+
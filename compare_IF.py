@@ -1,35 +1,25 @@
 # compare_IF.py
 
 import pandas as pd
-import logging
-from for_answer import AnswerAPI
+from for_answer import AnswerAPI, AsyncAnswerAPI
+import asyncio
 import time
 
-logger = logging.getLogger('log/paper_ranker')
-logger.setLevel(logging.INFO)
+from log_config import get_logger
+from deadline import expired
 
-if not logger.handlers:
-    file_handler = logging.FileHandler('log/paper_ranker.log', encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+logger = get_logger('paper_ranker', 'paper_ranker.log')
 
 
 class PaperRankerByIF:
 
-    def __init__(self, df, journal_column_name='期刊', api_key=None):
+    def __init__(self, df, journal_column_name='期刊', api_key=None, use_async=False,
+                 max_concurrency=AsyncAnswerAPI.DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            use_async (bool): 为 True 时通过 AsyncAnswerAPI 在一个事件循环中并发查询所有期刊的IF
+            max_concurrency (int): 异步模式下的最大并发请求数
+        """
         logger.info("初始化 PaperRankerByIF 实例")
         if not isinstance(df, pd.DataFrame):
             error_msg = "输入必须是一个 pandas DataFrame 对象。"
@@ -41,6 +31,8 @@ class PaperRankerByIF:
         self.journal_col = journal_column_name
         self.if_col = '影响因子'
         self.api_key = api_key
+        self.use_async = use_async
+        self.max_concurrency = max_concurrency
 
         if self.journal_col not in self.df_with_if.columns:
             error_msg = f"DataFrame 中未找到名为 '{self.journal_col}' 的列。"
@@ -49,55 +41,92 @@ class PaperRankerByIF:
 
         # 初始化影响因子列为 None
         self.df_with_if[self.if_col] = None
+        self.if_fetched = False
         logger.info(f"PaperRankerByIF 实例初始化完成。数据集包含 {len(self.df_with_if)} 行。")
 
-    def get_impact_factor(self, journal_name):
-        logger.info(f"开始获取期刊 '{journal_name}' 的影响因子")
+    @staticmethod
+    def _clean_journal_name(journal_name):
+        """校验并清理期刊名称，无效时返回 None"""
         if not journal_name or not isinstance(journal_name, str):
-            warning_msg = f"无效的期刊名称: {journal_name}"
-            logger.warning(warning_msg)
+            logger.warning(f"无效的期刊名称: {journal_name}")
             return None
 
         journal_name_clean = journal_name.strip()
         if not journal_name_clean:
-            warning_msg = "期刊名称为空"
-            logger.warning(warning_msg)
+            logger.warning("期刊名称为空")
             return None
+        return journal_name_clean
 
-        try:
-            prompt_one = f'''
+    @staticmethod
+    def _build_if_prompt(journal_name_clean):
+        return f'''
             期刊‘{journal_name_clean}’的影响因子为多少？
             要求只输出影响因子，不要有任何额外的输出，只需要一个准确的数字
             '''
-            logger.debug(f"API 请求 Prompt: {prompt_one}")
-
-            ask = AnswerAPI(self.api_key)
-            response_text = ask.for_answer_two(prompt_one)
-            logger.debug(f"API 响应原始文本: '{response_text}'")
 
-            if response_text and "无法获取" not in response_text:
-                response_text = response_text.strip()
+    @staticmethod
+    def _parse_if_response(journal_name_clean, response_text):
+        """把API返回的文本解析为影响因子，无法解析时返回 None"""
+        logger.debug(f"API 响应原始文本: '{response_text}'")
+        if response_text and "无法获取" not in response_text:
+            response_text = response_text.strip()
+            try:
                 # 尝试转换为浮点数
                 impact_factor = float(response_text)
-                success_msg = f"成功获取 '{journal_name_clean}' 的IF: {impact_factor}"
-                logger.info(success_msg)
-                return impact_factor
-            else:
-                warning_msg = f"API未能返回有效IF for '{journal_name_clean}', 返回: '{response_text}'"
-                logger.warning(warning_msg)
+            except ValueError as e:
+                # 如果转换失败，记录日志并返回 None
+                logger.error(f"转换API返回值 '{response_text}' 为数字时出错 for '{journal_name_clean}': {e}")
                 return None
+            logger.debug(f"成功获取 '{journal_name_clean}' 的IF: {impact_factor}")
+            return impact_factor
 
-        except ValueError as e:
-            # 如果转换失败，记录日志并返回 None
-            error_msg = f"转换API返回值 '{response_text}' 为数字时出错 for '{journal_name_clean}': {e}"
-            logger.error(error_msg)
+        logger.warning(f"API未能返回有效IF for '{journal_name_clean}', 返回: '{response_text}'")
+        return None
+
+    def get_impact_factor(self, journal_name):
+        logger.debug(f"开始获取期刊 '{journal_name}' 的影响因子")
+        journal_name_clean = self._clean_journal_name(journal_name)
+        if journal_name_clean is None:
             return None
+
+        try:
+            prompt_one = self._build_if_prompt(journal_name_clean)
+            logger.debug(f"API 请求 Prompt: {prompt_one}")
+
+            ask = AnswerAPI(self.api_key)
+            response_text = ask.for_answer_two(prompt_one)
+            return self._parse_if_response(journal_name_clean, response_text)
+
         except Exception as e:
             # 捕获API调用过程中可能出现的其他异常
             error_msg = f"调用API获取 '{journal_name_clean}' 的IF时发生未知错误: {e}"
             logger.error(error_msg)
             return None
 
+    @classmethod
+    async def get_impact_factor_async(cls, journal_name, async_api):
+        """
+        get_impact_factor 的异步版本，使用传入的 AsyncAnswerAPI 实例（受其并发限制与超时约束）。
+        不依赖 DataFrame，检索流水线可以在论文尚未全部解析时直接调用。
+        """
+        logger.debug(f"开始异步获取期刊 '{journal_name}' 的影响因子")
+        journal_name_clean = cls._clean_journal_name(journal_name)
+        if journal_name_clean is None:
+            return None
+
+        try:
+            response_text = await async_api.for_answer_two(cls._build_if_prompt(journal_name_clean))
+            return cls._parse_if_response(journal_name_clean, response_text)
+        except asyncio.CancelledError:
+            logger.warning(f"获取 '{journal_name_clean}' 的IF被取消")
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"获取 '{journal_name_clean}' 的IF超时")
+            return None
+        except Exception as e:
+            logger.error(f"调用API获取 '{journal_name_clean}' 的IF时发生未知错误: {e}")
+            return None
+
     def fetch_all_if(self):
         """
         遍历DataFrame中的所有唯一期刊名，调用API获取IF，并填充到DataFrame中。
@@ -110,26 +139,65 @@ class PaperRankerByIF:
         unique_journals = [j for j in unique_journals if j.lower() != 'nan']
         logger.info(f"需要查询 {len(unique_journals)} 个唯一期刊的IF: {unique_journals}")
 
-        journal_if_map = {}
-        for journal_name in unique_journals:
-            journal_name_clean = journal_name.strip()
-            if journal_name_clean:  # 确保名称非空
-                logger.info(f"正在处理期刊: {journal_name_clean}")
-                if_value = self.get_impact_factor(journal_name_clean)
-                journal_if_map[journal_name_clean] = if_value
-                logger.info(f"期刊 '{journal_name_clean}' 的IF已记录: {if_value}")
-                # 在API调用间添加延迟，避免请求过于频繁
-                time.sleep(0.5)
+        if self.use_async:
+            journal_if_map = asyncio.run(self.fetch_if_map_async(unique_journals))
+        else:
+            journal_if_map = {}
+            for journal_name in unique_journals:
+                journal_name_clean = journal_name.strip()
+                if expired():
+                    # 请求截止时间已到：其余期刊不再查询，按已知的IF排序
+                    logger.warning(f"已到截止时间，剩余期刊不再查询IF: {journal_name_clean}")
+                    break
+                if journal_name_clean:  # 确保名称非空
+                    logger.debug(f"正在处理期刊: {journal_name_clean}")
+                    if_value = self.get_impact_factor(journal_name_clean)
+                    journal_if_map[journal_name_clean] = if_value
+                    logger.debug(f"期刊 '{journal_name_clean}' 的IF已记录: {if_value}")
+                    # 在API调用间添加延迟，避免请求过于频繁
+                    time.sleep(0.5)
 
         logger.info("API调用阶段完成，开始将IF映射到DataFrame...")
+        self.apply_if_map(journal_if_map)
+        logger.info("所有期刊影响因子获取并映射完成。")
+
+    def apply_if_map(self, journal_if_map):
+        """
+        把 {期刊名: IF} 映射填充到DataFrame中（IF已在别处获取时直接调用，之后排序不会再次查询）。
+        """
         # 将映射应用到DataFrame
         # 注意：这里假设期刊名列中的值与journal_if_map的键格式一致
         self.df_with_if[self.if_col] = self.df_with_if[self.journal_col].astype(str).map(journal_if_map)
         # 将无法匹配或原始为NaN的IF值设回NaN
         self.df_with_if.loc[self.df_with_if[self.journal_col].isna() | (
                     self.df_with_if[self.journal_col].astype(str).str.lower() == 'nan'), self.if_col] = None
+        self.if_fetched = True
 
-        logger.info("所有期刊影响因子获取并映射完成。")
+    async def fetch_if_map_async(self, journal_names, async_api=None):
+        """
+        在同一个事件循环中并发获取多个期刊的IF，返回 {期刊名: IF} 字典。
+        未传入 async_api 时会临时创建一个，并在结束时关闭。
+        """
+        names = []
+        for journal_name in journal_names:
+            journal_name_clean = journal_name.strip()
+            if journal_name_clean and journal_name_clean not in names:
+                names.append(journal_name_clean)
+
+        owns_api = async_api is None
+        if owns_api:
+            async_api = AsyncAnswerAPI(self.api_key, max_concurrency=self.max_concurrency)
+        try:
+            logger.info(f"并发获取 {len(names)} 个期刊的IF")
+            values = await asyncio.gather(*(self.get_impact_factor_async(name, async_api) for name in names))
+        finally:
+            if owns_api:
+                await async_api.aclose()
+
+        journal_if_map = dict(zip(names, values))
+        for name, if_value in journal_if_map.items():
+            logger.debug(f"期刊 '{name}' 的IF已记录: {if_value}")
+        return journal_if_map
 
     def get_top_papers(self, top_n=10):
         """
@@ -138,22 +206,22 @@ class PaperRankerByIF:
         logger.info(f"开始查找IF最高的前 {top_n} 篇论文...")
 
         # 检查是否需要获取IF
-        # 如果影响因子列不存在或全为NaN，则需要获取
-        if self.if_col not in self.df_with_if.columns or self.df_with_if[self.if_col].isna().all():
+        # 如果尚未获取过，且影响因子列不存在或全为NaN，则需要获取
+        if not self.if_fetched and (self.if_col not in self.df_with_if.columns or self.df_with_if[self.if_col].isna().all()):
             logger.info("检测到影响因子未获取或全为空，正在获取...")
             self.fetch_all_if()
         else:
             logger.info("影响因子已存在，跳过获取步骤。")
 
-        logger.info("开始处理IF数据类型...")
+        logger.debug("开始处理IF数据类型...")
         # 确保IF列是数值类型，以便正确排序
         self.df_with_if[self.if_col] = pd.to_numeric(self.df_with_if[self.if_col], errors='coerce')
-        logger.info("IF数据类型处理完成。")
+        logger.debug("IF数据类型处理完成。")
 
-        logger.info("开始按IF排序...")
+        logger.debug("开始按IF排序...")
         # 按IF降序排序，将NaN值排在最后
         df_sorted = self.df_with_if.sort_values(by=self.if_col, ascending=False, na_position='last', ignore_index=True)
-        logger.info("排序完成。")
+        logger.debug("排序完成。")
 
         # 检查排序后的DataFrame
         if df_sorted.empty:
@@ -189,7 +257,7 @@ class PaperRankerByIF:
         """
         logger.info(f"开始获取完整排序列表 (升序: {ascending})...")
         # 确保IF已获取
-        if self.if_col not in self.df_with_if.columns or self.df_with_if[self.if_col].isna().all():
+        if not self.if_fetched and (self.if_col not in self.df_with_if.columns or self.df_with_if[self.if_col].isna().all()):
             logger.info("排序前需要获取IF...")
             self.fetch_all_if()
 
@@ -206,16 +274,7 @@ class PaperRankerByIF:
 # --- 使用示例 ---
 if __name__ == '__main__':
     # 配置主模块的日志
-    main_logger = logging.getLogger('main')
-    if not main_logger.handlers:
-        main_fh = logging.FileHandler('main.log', encoding='utf-8')
-        main_ch = logging.StreamHandler()
-        main_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        main_fh.setFormatter(main_formatter)
-        main_ch.setFormatter(main_formatter)
-        main_logger.addHandler(main_fh)
-        main_logger.addHandler(main_ch)
-        main_logger.setLevel(logging.INFO)
+    main_logger = get_logger('main', 'main.log')
 
     main_logger.info("=== 程序启动 ===")
 
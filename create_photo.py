@@ -4,72 +4,138 @@ from http import HTTPStatus
 import requests
 from dashscope import ImageSynthesis
 import os
-import logging
-import sys
+import time
 
+from prompt_builder import PromptBuilder, count_tokens, IMAGE_PROMPT_TOKEN_BUDGET
+from log_config import get_logger
 
-def setup_logging():
-    # 确保log目录存在
-    if not os.path.exists('log'):
-        os.makedirs('log')
+photo_logger = get_logger('image_generation', 'image_generation.log')
 
-    logger = logging.getLogger('image_generation')
-    logger.setLevel(logging.INFO)
+# 生成模式：'async' 提交异步任务后轮询任务状态；'sync' 为旧版阻塞调用 ImageSynthesis.call
+IMAGE_MODE_ASYNC = 'async'
+IMAGE_MODE_SYNC = 'sync'
+# 异步任务轮询：首次间隔、最大间隔（秒）与整体超时（秒）
+TASK_POLL_INTERVAL = 1.0
+TASK_POLL_MAX_INTERVAL = 5.0
+TASK_TIMEOUT = 180
+# 图片下载的分块大小（字节）
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-    logger.handlers.clear()
+# DashScope 异步任务的终止状态
+_TASK_DONE_STATUSES = ('SUCCEEDED', 'FAILED', 'CANCELED', 'UNKNOWN')
 
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-    file_handler = logging.FileHandler('log/image_generation.log', encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-    return logger
-
-
-photo_logger = setup_logging()
 
 class Create_photo:
-    def __init__(self, api_key, file_name='123.jpg'):
+    def __init__(self, api_key, file_name='123.jpg', prompt_token_budget=IMAGE_PROMPT_TOKEN_BUDGET,
+                 mode=IMAGE_MODE_ASYNC, task_timeout=TASK_TIMEOUT):
         """
         初始化Create_photo类
 
         Args:
             api_key (str): DashScope API密钥
             file_name (str): 图片保存文件名，默认为'123.jpg'
+            prompt_token_budget (int): 插画提示词允许占用的最大 token 数
+            mode (str): 'async' 提交异步任务并轮询状态，'sync' 阻塞调用
+            task_timeout (float): 异步任务从提交到完成的最长等待时间（秒）
         """
         self.api_key = api_key
         self.model = "wan2.2-t2i-flash" # 注意：模型名可能需要确认
         self.file_name = file_name
+        self.mode = mode
+        self.task_timeout = task_timeout
+        self.prompt_builder = PromptBuilder(image_token_budget=prompt_token_budget)
+
+    def _submit_and_wait(self, full_prompt):
+        """提交异步生成任务并轮询直到任务结束，返回最后一次查询的响应"""
+        rsp = ImageSynthesis.async_call(
+            api_key=self.api_key,
+            model=self.model,
+            prompt=full_prompt,
+            n=1,
+            size='1440*1080'
+        )
+        if rsp.status_code != HTTPStatus.OK:
+            return rsp
+
+        task_id = rsp.output.task_id
+        photo_logger.info(f"图片生成任务已提交 - Task ID: {task_id}")
+        deadline_at = time.monotonic() + self.task_timeout
+        interval = TASK_POLL_INTERVAL
+        while True:
+            status = getattr(rsp.output, 'task_status', None)
+            if status in _TASK_DONE_STATUSES:
+                photo_logger.info(f"图片生成任务结束 - Task ID: {task_id}, 状态: {status}")
+                return rsp
+
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"图片生成任务超时（{self.task_timeout:g} 秒）- Task ID: {task_id}")
+            time.sleep(min(interval, remaining))
+            interval = min(interval * 1.5, TASK_POLL_MAX_INTERVAL)
+
+            rsp = ImageSynthesis.fetch(task_id, api_key=self.api_key)
+            if rsp.status_code != HTTPStatus.OK:
+                return rsp
+
+    def _download(self, image_url, file_name):
+        """流式下载图片到临时文件，完成后原子替换为目标文件"""
+        output_dir = os.path.dirname(file_name)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        temp_file = f"{file_name}.part"
+        try:
+            with requests.get(image_url, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                with open(temp_file, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+            os.replace(temp_file, file_name)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def create(self, prompt, file_name=None):
+        """
+        根据论文内容生成插图并保存。
+
+        Args:
+            prompt (str): 论文内容
+            file_name (str): 图片保存文件名，默认使用初始化时的 file_name
 
-    def create(self, prompt):
-        # 优化提示词构建
-        full_prompt = f'''
-        以下是一个文章的相关信息，包括题目、链接、期刊、以及摘要，请帮我生成一张相关插画；
-        要求符合伦理，不能出现让人反胃的画面，要符合论文主题，论文具体内容为{prompt}。
-        '''
+        Returns:
+            str: 成功时返回图片文件名，失败时返回 None
+        """
+        file_name = file_name or self.file_name
+        # 固定指令在前，论文内容压缩到 token 预算内
+        full_prompt = self.prompt_builder.build_image_prompt(prompt)
 
-        photo_logger.info(f"开始生成图片，提示词长度: {len(full_prompt)}")
+        photo_logger.info(f"开始生成图片，提示词长度: {len(full_prompt)}, 预估 tokens: {count_tokens(full_prompt)}")
 
         try:
             # 调用图像生成API
-            rsp = ImageSynthesis.call(
-                api_key=self.api_key,
-                model=self.model,
-                prompt=full_prompt,
-                n=1,           # 请求生成1张图片
-                size='1440*1080' # 指定图片尺寸
-            )
+            if self.mode == IMAGE_MODE_ASYNC:
+                rsp = self._submit_and_wait(full_prompt)
+            else:
+                rsp = ImageSynthesis.call(
+                    api_key=self.api_key,
+                    model=self.model,
+                    prompt=full_prompt,
+                    n=1,           # 请求生成1张图片
+                    size='1440*1080' # 指定图片尺寸
+                )
 
             # 打印完整的响应对象用于调试
             photo_logger.debug(f"DashScope API 响应对象: {rsp}")
 
             # 检查API调用的整体状态
             if rsp.status_code == HTTPStatus.OK:
+                task_status = getattr(rsp.output, 'task_status', None) if rsp.output is not None else None
+                if self.mode == IMAGE_MODE_ASYNC and task_status != 'SUCCEEDED':
+                    reason = getattr(rsp.output, 'message', '无具体原因')
+                    photo_logger.error(f"图片生成任务未成功 - 状态: {task_status}, 原因: {reason}")
+                    return None
                 photo_logger.info("API调用成功")
 
                 # *** 关键修改：增加健壮性检查 ***
@@ -106,17 +172,9 @@ class Create_photo:
 
                 # 下载并保存图片
                 try:
-                    response = requests.get(image_url, timeout=30) # 添加超时
-                    response.raise_for_status() # 如果HTTP请求返回了不成功的状态码，抛出异常
-
-                    # 确保 dynamic_images 目录存在 (如果需要的话)
-                    # os.makedirs(os.path.dirname(self.file_name), exist_ok=True)
-
-                    with open(self.file_name, 'wb') as f:
-                        f.write(response.content)
-
-                    photo_logger.info(f"图片已成功保存到: {self.file_name}")
-                    return self.file_name
+                    self._download(image_url, file_name)
+                    photo_logger.info(f"图片已成功保存到: {file_name}")
+                    return file_name
 
                 except requests.exceptions.RequestException as e:
                     photo_logger.error(f"下载图片失败: {e}")
@@ -0,0 +1,62 @@
+# deadline.py
+# 请求级截止时间：接口在请求开始时用 deadline_scope() 设定总预算，截止时刻保存在 contextvars 中，
+# 翻译、PubMed、期刊IF查询与论文总结等下游调用通过 timeout_for() 只使用剩余的时间。
+#   - 嵌套的 deadline_scope 只会收紧截止时间，不会延长；
+#   - 没有设定截止时间时（脚本、后台任务）timeout_for() 直接返回各调用自己的超时上限；
+#   - 截止时间已过时 timeout_for() 抛出 DeadlineExceeded，调用方据此停止后续请求并返回已有的部分结果。
+# 注意：loop.run_in_executor 不会把 contextvars 带到线程池，需用 contextvars.copy_context().run 包装。
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+# /api/search 与 /api/get_paper_summary 的总预算（秒）
+SEARCH_DEADLINE = float(os.environ.get('SEARCH_DEADLINE', 25))
+SUMMARY_DEADLINE = float(os.environ.get('SUMMARY_DEADLINE', 45))
+# 剩余时间少于该值（秒）时视为已到期，不再发起注定超时的外部请求
+MIN_CALL_TIMEOUT = 0.05
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求的截止时间已到"""
+
+
+@contextmanager
+def deadline_scope(seconds):
+    """在代码块内设定 seconds 秒后的截止时间（已有更早的截止时间时保持不变）"""
+    deadline_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline_at if current is None else min(current, deadline_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(reserve=0.0):
+    """返回剩余秒数（扣除 reserve，最小为 0）；没有设定截止时间时返回 None"""
+    deadline_at = _deadline.get()
+    if deadline_at is None:
+        return None
+    return max(0.0, deadline_at - time.monotonic() - reserve)
+
+
+def expired(reserve=0.0):
+    left = remaining(reserve)
+    return left is not None and left < MIN_CALL_TIMEOUT
+
+
+def timeout_for(cap, stage=''):
+    """
+    返回一次外部调用可用的超时秒数：不超过 cap，也不超过剩余预算。
+    预算已用完时抛出 DeadlineExceeded。
+    """
+    left = remaining()
+    if left is None:
+        return cap
+    if left < MIN_CALL_TIMEOUT:
+        raise DeadlineExceeded(f"{stage or '请求'}已超过截止时间")
+    return left if cap is None else min(cap, left)
@@ -0,0 +1,359 @@
+# fake_services.py
+# 本地外部服务替身，用于在不访问任何真实服务的情况下对 app.py 做端到端压测：
+#   - NCBI E-utilities：esearch（JSON 的 PMID 列表）与 efetch（PubmedArticleSet XML）；
+#   - 百度翻译：按行返回 trans_result；
+#   - urlscan.io：提交扫描、轮询结果（就绪前返回 404）、下载截图；
+#   - DashScope 图像生成：提交异步任务、查询任务状态、下载生成的图片；
+#   - 大模型对话接口（期刊IF查询与论文总结）复用 llm_stub_server 的 /v1/chat/completions。
+# 所有替身挂在同一个 Flask 应用上，app.py 通过以下环境变量指向它（见 service_env()）：
+#   NCBI_EUTILS_URL、BAIDU_TRANSLATE_URL、URLSCAN_BASE_URL、DASHSCOPE_HTTP_BASE_URL、LLM_BASE_URL
+# 返回内容是确定性的：同一检索词永远得到同一组 PMID，同一 PMID 永远得到同一篇论文。
+#
+# 用法：
+#   python fake_services.py --port 8002 --ncbi-latency lognormal:5.5,0.4 --image-latency uniform:3000,8000
+
+import argparse
+import hashlib
+import struct
+import threading
+import time
+import uuid
+import zlib
+from xml.sax.saxutils import escape
+
+from flask import request, jsonify, Response, abort
+from werkzeug.serving import make_server
+
+from llm_stub_server import LatencyModel, StubConfig, create_stub_app
+from log_config import get_logger
+
+fake_logger = get_logger('fake_services')
+
+# 压测使用的中文检索词及其译文；不在表中的文本按摘要值生成确定性的英文
+TRANSLATIONS = {
+    '肺癌': 'lung cancer',
+    '乳腺癌': 'breast cancer',
+    '糖尿病': 'diabetes mellitus',
+    '高血压': 'hypertension',
+    '阿尔茨海默病': 'Alzheimer disease',
+    '冠心病': 'coronary heart disease',
+    '肝细胞癌': 'hepatocellular carcinoma',
+    '脓毒症': 'sepsis',
+    '免疫治疗': 'immunotherapy',
+    '靶向治疗': 'targeted therapy',
+    '生物标志物': 'biomarker',
+    '预后': 'prognosis',
+    '肠道菌群': 'gut microbiota',
+    '深度学习': 'deep learning',
+    '单细胞测序': 'single-cell sequencing',
+    '炎症': 'inflammation',
+    '自噬': 'autophagy',
+    '耐药': 'drug resistance',
+    '早期诊断': 'early diagnosis',
+    '随机对照试验': 'randomized controlled trial',
+}
+
+# 论文所属期刊，期刊数决定了IF查询缓存的命中情况
+JOURNALS = (
+    'Nature', 'Science', 'Cell', 'The Lancet', 'The New England journal of medicine', 'JAMA',
+    'BMJ (Clinical research ed.)', 'Nature medicine', 'Nature communications', 'Cancer cell',
+    'Journal of clinical oncology', 'Circulation', 'Gastroenterology', 'Hepatology', 'Diabetes care',
+    'Alzheimer\'s & dementia', 'Clinical cancer research', 'Cancer research', 'Oncogene',
+    'PloS one', 'Scientific reports', 'Frontiers in immunology', 'Frontiers in oncology',
+    'International journal of molecular sciences', 'Medicine', 'BMC cancer', 'Cells',
+    'Journal of hepatology', 'European heart journal', 'Critical care medicine',
+)
+
+_WORDS = ('patients', 'cohort', 'expression', 'survival', 'association', 'treatment', 'risk', 'analysis',
+          'clinical', 'outcomes', 'signaling', 'tumor', 'cells', 'model', 'response', 'significantly',
+          'increased', 'reduced', 'pathway', 'mechanism', 'trial', 'mortality', 'levels', 'factors')
+_LAST_NAMES = ('Wang', 'Li', 'Zhang', 'Liu', 'Chen', 'Smith', 'Johnson', 'Brown', 'Garcia', 'Müller', 'Kim', 'Sato')
+_FIRST_NAMES = ('Wei', 'Jing', 'Min', 'John', 'Anna', 'David', 'Maria', 'Hiroshi', 'Lukas', 'Ji-woo')
+
+
+def _digest(text):
+    return int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
+
+
+def fake_translation(text):
+    """返回确定性的英文译文"""
+    text = text.strip()
+    if text in TRANSLATIONS:
+        return TRANSLATIONS[text]
+    return f"term{_digest(text) % 100000}"
+
+
+def fake_pmids(term, retmax):
+    """根据检索式生成确定性的 PMID 列表，数量在 retmax 的一半到 retmax 之间"""
+    seed = _digest(term)
+    count = max(1, retmax // 2 + seed % (retmax // 2 + 1)) if retmax > 0 else 0
+    base = 20000000 + seed % 15000000
+    return [str(base + i * (7 + seed % 13)) for i in range(count)]
+
+
+def fake_article_xml(pmid):
+    """根据 PMID 生成一篇确定性的 PubmedArticle XML"""
+    seed = _digest(pmid)
+    journal = JOURNALS[seed % len(JOURNALS)]
+    year = 2015 + (seed >> 8) % 10
+    title_words = [_WORDS[(seed >> (i * 5)) % len(_WORDS)] for i in range(8)]
+    title = f"{' '.join(title_words).capitalize()} ({pmid})"
+    sentences = []
+    for s in range(5 + (seed >> 16) % 4):
+        words = [_WORDS[(seed >> ((s * 11 + i) % 200)) % len(_WORDS)] for i in range(18 + (seed >> s) % 12)]
+        sentences.append(' '.join(words).capitalize() + '.')
+    authors = []
+    for a in range(3 + (seed >> 24) % 5):
+        authors.append(
+            f"<Author><LastName>{escape(_LAST_NAMES[(seed >> (a * 4)) % len(_LAST_NAMES)])}</LastName>"
+            f"<ForeName>{escape(_FIRST_NAMES[(seed >> (a * 4 + 2)) % len(_FIRST_NAMES)])}</ForeName></Author>"
+        )
+    return (
+        f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>"
+        f"<Journal><JournalIssue><PubDate><Year>{year}</Year></PubDate></JournalIssue>"
+        f"<Title>{escape(journal)}</Title></Journal>"
+        f"<ArticleTitle>{escape(title)}</ArticleTitle>"
+        f"<Abstract><AbstractText>{escape(' '.join(sentences))}</AbstractText></Abstract>"
+        f"<AuthorList>{''.join(authors)}</AuthorList>"
+        f"</Article></MedlineCitation></PubmedArticle>"
+    )
+
+
+def solid_png(seed_text, width=320, height=240):
+    """生成一张纯色 PNG（颜色由 seed_text 决定），不依赖 Pillow"""
+    seed = _digest(seed_text)
+    pixel = bytes(((seed >> 16) & 0xFF, (seed >> 8) & 0xFF, seed & 0xFF))
+    raw = b''.join(b'\x00' + pixel * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+class FakeServicesConfig:
+    """各替身服务的延迟分布与错误率"""
+
+    def __init__(self, ncbi_latency='fixed:0', translate_latency='fixed:0', llm_latency='fixed:0',
+                 screenshot_latency='fixed:0', image_latency='fixed:0', error_rate=0.0, error_status=500,
+                 seed=None):
+        """
+        Args:
+            ncbi_latency (str): esearch/efetch 每次请求的延迟分布（毫秒，格式见 LatencyModel）
+            translate_latency (str): 翻译请求的延迟分布
+            llm_latency (str): 大模型对话请求的延迟分布
+            screenshot_latency (str): urlscan 从提交到截图就绪的时间分布
+            image_latency (str): DashScope 从提交到图片生成完成的时间分布
+            error_rate (float): NCBI、翻译与大模型请求随机返回错误的比例
+            error_status (int): 注入错误时返回的 HTTP 状态码
+            seed (int): 随机种子
+        """
+        self.ncbi = LatencyModel(ncbi_latency, seed)
+        self.translate = LatencyModel(translate_latency, seed)
+        self.screenshot = LatencyModel(screenshot_latency, seed)
+        self.image = LatencyModel(image_latency, seed)
+        self.llm = StubConfig(llm_latency, error_rate, error_status, seed)
+        self.error_status = error_status
+
+    def should_fail(self):
+        return self.llm.should_fail()
+
+
+def create_fake_services_app(config=None):
+    """创建挂载全部替身接口的 Flask 应用（在 llm_stub_server 的应用上追加路由）"""
+    config = config or FakeServicesConfig()
+    fake_app = create_stub_app(config.llm)
+    # 异步任务（urlscan 扫描、DashScope 图像生成）的就绪时刻
+    tasks = {}
+    tasks_lock = threading.Lock()
+    counters = {'esearch': 0, 'efetch': 0, 'translate': 0, 'scan': 0, 'image_task': 0, 'errors': 0}
+
+    def _count(key):
+        with tasks_lock:
+            counters[key] += 1
+
+    def _delay(model):
+        time.sleep(model.sample_ms() / 1000)
+
+    def _inject_error():
+        if request.headers.get('X-Stub-Error') or config.should_fail():
+            _count('errors')
+            return jsonify({'error': 'injected error'}), config.error_status
+        return None
+
+    def _create_task(kind, model):
+        task_id = uuid.uuid4().hex
+        with tasks_lock:
+            tasks[task_id] = (kind, time.monotonic() + model.sample_ms() / 1000)
+        return task_id
+
+    def _task_ready(task_id, kind):
+        with tasks_lock:
+            task = tasks.get(task_id)
+        if task is None or task[0] != kind:
+            return None
+        return time.monotonic() >= task[1]
+
+    @fake_app.route('/entrez/eutils/esearch.fcgi', methods=['GET'])
+    def esearch():
+        _count('esearch')
+        _delay(config.ncbi)
+        error = _inject_error()
+        if error:
+            return error
+        term = request.args.get('term', '')
+        retmax = int(request.args.get('retmax', 20))
+        idlist = fake_pmids(term, retmax)
+        return jsonify({'esearchresult': {'count': str(len(idlist)), 'retmax': str(len(idlist)), 'idlist': idlist}})
+
+    @fake_app.route('/entrez/eutils/efetch.fcgi', methods=['GET'])
+    def efetch():
+        _count('efetch')
+        _delay(config.ncbi)
+        error = _inject_error()
+        if error:
+            return error
+        pmids = [pmid for pmid in request.args.get('id', '').split(',') if pmid.strip()]
+        body = '<?xml version="1.0" ?><PubmedArticleSet>' + ''.join(fake_article_xml(p.strip()) for p in pmids) + \
+               '</PubmedArticleSet>'
+        return Response(body, mimetype='text/xml')
+
+    @fake_app.route('/api/trans/vip/translate', methods=['GET', 'POST'])
+    def baidu_translate():
+        _count('translate')
+        _delay(config.translate)
+        if config.should_fail():
+            _count('errors')
+            return jsonify({'error_code': '54003', 'error_msg': 'Invalid Access Limit'})
+        lines = request.values.get('q', '').split('\n')
+        return jsonify({
+            'from': request.values.get('from', 'zh'),
+            'to': request.values.get('to', 'en'),
+            'trans_result': [{'src': line, 'dst': fake_translation(line)} for line in lines]
+        })
+
+    @fake_app.route('/api/v1/scan/', methods=['POST'])
+    def urlscan_submit():
+        _count('scan')
+        scan_id = _create_task('scan', config.screenshot)
+        return jsonify({'message': 'Submission successful', 'uuid': scan_id, 'visibility': 'public'})
+
+    @fake_app.route('/api/v1/result/<scan_id>/', methods=['GET'])
+    def urlscan_result(scan_id):
+        if not _task_ready(scan_id, 'scan'):
+            return jsonify({'message': 'Scan is not finished yet or does not exist', 'status': 404}), 404
+        return jsonify({'task': {'uuid': scan_id}, 'page': {'url': ''}})
+
+    @fake_app.route('/screenshots/<scan_id>.png', methods=['GET'])
+    def urlscan_screenshot(scan_id):
+        if not _task_ready(scan_id, 'scan'):
+            abort(404)
+        return Response(solid_png(scan_id), mimetype='image/png')
+
+    @fake_app.route('/api/v1/services/aigc/text2image/image-synthesis', methods=['POST'])
+    def image_synthesis_submit():
+        _count('image_task')
+        task_id = _create_task('image', config.image)
+        return jsonify({'request_id': uuid.uuid4().hex, 'output': {'task_id': task_id, 'task_status': 'PENDING'}})
+
+    @fake_app.route('/api/v1/tasks/<task_id>', methods=['GET'])
+    def image_synthesis_task(task_id):
+        ready = _task_ready(task_id, 'image')
+        if ready is None:
+            return jsonify({'request_id': uuid.uuid4().hex, 'code': 'InvalidParameter',
+                            'message': 'task not found'}), 400
+        output = {'task_id': task_id, 'task_status': 'SUCCEEDED' if ready else 'RUNNING'}
+        usage = {}
+        if ready:
+            output['results'] = [{'url': f"{request.host_url}fake-images/{task_id}.png"}]
+            usage = {'image_count': 1}
+        return jsonify({'request_id': uuid.uuid4().hex, 'output': output, 'usage': usage})
+
+    @fake_app.route('/fake-images/<task_id>.png', methods=['GET'])
+    def image_download(task_id):
+        if not _task_ready(task_id, 'image'):
+            abort(404)
+        return Response(solid_png(task_id, 480, 360), mimetype='image/png')
+
+    @fake_app.route('/fake/stats', methods=['GET'])
+    def fake_stats():
+        with tasks_lock:
+            return jsonify(dict(counters, pending_tasks=len(tasks)))
+
+    return fake_app
+
+
+def service_env(base_url):
+    """返回把 app.py 的外部服务指向替身的环境变量"""
+    base_url = base_url.rstrip('/')
+    return {
+        'NCBI_EUTILS_URL': f"{base_url}/entrez/eutils",
+        'BAIDU_TRANSLATE_URL': f"{base_url}/api/trans/vip/translate",
+        'URLSCAN_BASE_URL': base_url,
+        'SCREENSHOT_BACKEND': 'urlscan',
+        'DASHSCOPE_HTTP_BASE_URL': f"{base_url}/api/v1",
+        'LLM_BASE_URL': f"{base_url}/v1",
+    }
+
+
+class FakeServicesThread(threading.Thread):
+    """在后台线程中运行替身服务，供压测脚本在同一进程内启动/停止"""
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        super().__init__(daemon=True)
+        self.server = make_server(host, port, create_fake_services_app(config), threaded=True)
+        self.host = host
+        self.port = self.server.server_port
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def run_fake_services_in_thread(host='127.0.0.1', port=0, config=None):
+    """启动后台替身服务并返回线程对象"""
+    server_thread = FakeServicesThread(host, port, config)
+    server_thread.start()
+    fake_logger.info(f"外部服务替身已启动: {server_thread.base_url}")
+    return server_thread
+
+
+def add_latency_arguments(parser):
+    """添加各替身服务的延迟与错误注入参数（load_test.py 复用）"""
+    parser.add_argument('--ncbi-latency', default='lognormal:5.3,0.4', help='esearch/efetch 延迟分布（毫秒）')
+    parser.add_argument('--translate-latency', default='lognormal:4.6,0.3', help='翻译延迟分布')
+    parser.add_argument('--llm-latency', default='lognormal:6.5,0.5', help='大模型对话延迟分布')
+    parser.add_argument('--screenshot-latency', default='uniform:1000,4000', help='截图从提交到就绪的时间分布')
+    parser.add_argument('--image-latency', default='uniform:3000,8000', help='AI插图从提交到完成的时间分布')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='NCBI/翻译/大模型随机返回错误的比例 (0~1)')
+    parser.add_argument('--error-status', type=int, default=500, help='注入错误时返回的 HTTP 状态码')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+
+
+def config_from_args(args):
+    return FakeServicesConfig(args.ncbi_latency, args.translate_latency, args.llm_latency, args.screenshot_latency,
+                              args.image_latency, args.error_rate, args.error_status, args.seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NCBI/百度翻译/urlscan/DashScope/大模型的本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8002)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    base_url = f"http://{args.host}:{args.port}"
+    print("在启动 app.py 前设置以下环境变量：")
+    for name, value in service_env(base_url).items():
+        print(f"  export {name}={value}")
+    server = make_server(args.host, args.port, create_fake_services_app(config_from_args(args)), threaded=True)
+    fake_logger.info(f"外部服务替身已启动: {base_url}")
+    server.serve_forever()
@@ -1,32 +1,124 @@
 # 该模块主要封装了通过API进行问题回答的类
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, RateLimitError, InternalServerError
+import asyncio
 import json
+import os
+import threading
+import time
+from collections import deque
 import requests
 
+from prompt_builder import PromptBuilder
+from llm_stats import llm_stats
+from deadline import timeout_for, expired
+from log_config import get_logger
+
 API_KEY = 'your_key'
 
+# 与 prompt_builder 共用 llm_usage 日志文件
+llm_logger = get_logger('llm_usage', 'llm_usage.log')
+
+
 class AnswerAPI:
-    # 阿里云模型广场连接
-    BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+    # 阿里云模型广场连接（可通过环境变量 LLM_BASE_URL 指向本地替身服务 llm_stub_server.py）
+    BASE_URL = os.environ.get('LLM_BASE_URL', "https://dashscope.aliyuncs.com/compatible-mode/v1")
 
     # 模型选取
     ASK_MODEL_ONE = "qwen-max"
     ASK_MODEL_TWO = "deepseek-v3"
 
+    # 可重试的错误（连接失败/超时、限流、服务端错误）与重试参数
+    RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+    MAX_RETRIES = 2
+    RETRY_BACKOFF = 0.5
+    # 单次调用的超时上限（秒），请求设定了截止时间时取两者中较小的一个
+    REQUEST_TIMEOUT = 60
+
     def __init__(self, api_key):
 
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key, base_url=self.BASE_URL)
+        # 重试由 _create 自行完成，以便统计重试次数
+        self.client = OpenAI(api_key=self.api_key, base_url=self.BASE_URL, max_retries=0)
+
+    @staticmethod
+    def get_stats():
+        """返回进程内按模型汇总的调用统计（耗时、token、重试、错误类型）"""
+        return llm_stats.snapshot()
+
+    def _create(self, model, messages):
+        """
+        调用 chat.completions.create，对可重试错误做指数退避重试，并把本次调用记入统计。
+        每次尝试只使用请求剩余的时间，截止时间已到时抛出 DeadlineExceeded，不再重试。
+        """
+        retries = 0
+        start_time = time.perf_counter()
+        while True:
+            try:
+                completion = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=timeout_for(self.REQUEST_TIMEOUT, f'模型 {model} 调用')
+                )
+                break
+            except self.RETRYABLE_ERRORS as e:
+                backoff = self.RETRY_BACKOFF * (2 ** retries)
+                # 重试次数用完，或退避等待后已没有剩余时间时不再重试
+                if retries >= self.MAX_RETRIES or expired(backoff):
+                    self._record_failure(model, start_time, retries, e)
+                    raise
+                retries += 1
+                llm_logger.warning(f"模型: {model}, 调用失败({type(e).__name__})，第 {retries} 次重试")
+                time.sleep(backoff)
+            except Exception as e:
+                self._record_failure(model, start_time, retries, e)
+                raise
+
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        prompt_tokens, completion_tokens = self._log_usage(model, messages, completion, latency_ms)
+        llm_stats.record(model, latency_ms, prompt_tokens, completion_tokens, retries=retries)
+        return completion
+
+    @staticmethod
+    def _record_failure(model, start_time, retries, error):
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        llm_logger.error(f"模型: {model}, 调用失败: {type(error).__name__}: {error}, 耗时: {latency_ms:.2f}ms, 重试: {retries}")
+        llm_stats.record(model, latency_ms, retries=retries, error=error)
+
+    def chat(self, messages, model):
+        """
+        发送 messages 到指定模型并返回回答文本，同时记录本次调用的 prompt/completion token 数。
+        """
+        completion = self._create(model, messages)
+        return completion.choices[0].message.content
+
+    @staticmethod
+    def _log_usage(model, messages, completion, latency_ms=None):
+        """
+        记录 token 用量：优先使用服务端返回的 usage，缺失时使用本地估算值。
+        返回 (prompt_tokens, completion_tokens)，usage 缺失时为 (None, None)。
+        """
+        latency_str = f", 耗时: {latency_ms:.2f}ms" if latency_ms is not None else ""
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            details = getattr(usage, 'prompt_tokens_details', None)
+            cached_tokens = getattr(details, 'cached_tokens', None) if details is not None else None
+            llm_logger.info(
+                f"模型: {model}, prompt tokens: {usage.prompt_tokens}, "
+                f"completion tokens: {usage.completion_tokens}, 缓存命中 tokens: {cached_tokens or 0}{latency_str}"
+            )
+            return usage.prompt_tokens, usage.completion_tokens
+
+        llm_logger.info(
+            f"模型: {model}, 未返回 usage, 本地估算 prompt tokens: {PromptBuilder.count_messages_tokens(messages)}{latency_str}"
+        )
+        return None, None
 
     def for_answer_one(self, prompt):
         messages = [
             {"role": "user", "content": [{"type": "text", "text": prompt}]}
         ]
 
-        completion = self.client.chat.completions.create(
-            model=self.ASK_MODEL_ONE,
-            messages=messages
-        )
+        completion = self._create(self.ASK_MODEL_ONE, messages)
 
         response = completion.model_dump_json()
         response = json.loads(response)
@@ -35,12 +127,162 @@ class AnswerAPI:
         return answer
 
     def for_answer_two(self, prompt):
-        completion = self.client.chat.completions.create(
-            model=self.ASK_MODEL_TWO,
-            messages=[
-                {'role': 'user', 'content': prompt}
-            ]
-        )
+        return self.chat([{'role': 'user', 'content': prompt}], self.ASK_MODEL_TWO)
+
+
+class ModelConcurrencyLimiter:
+    """
+    进程内共享的异步并发上限。每次检索都在自己线程的事件循环中运行（asyncio.run），
+    asyncio.Semaphore 只能在单个事件循环内使用，这里用线程锁维护名额，释放时把名额直接交给
+    等待者，并通过 call_soon_threadsafe 唤醒它所在的事件循环。
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        return self._active
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # 名额已交给本等待者但任务被取消：结果已设置时由这里归还，未设置时由 _hand_over 归还
+            if not queued and waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if loop.is_closed():
+                    continue
+                loop.call_soon_threadsafe(self._hand_over, future)
+                return
+            self._active -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# 按 (模型, 并发上限) 共享的限流器：同一进程中所有 AsyncAnswerAPI 实例共用
+_model_limiters = {}
+_model_limiters_lock = threading.Lock()
+
+
+def get_model_limiter(model, limit):
+    with _model_limiters_lock:
+        limiter = _model_limiters.get((model, limit))
+        if limiter is None:
+            limiter = _model_limiters[(model, limit)] = ModelConcurrencyLimiter(limit)
+        return limiter
+
+
+class AsyncAnswerAPI:
+    """
+    基于异步 OpenAI 客户端的问答接口，可在同一个事件循环中并发发起大量请求。
+
+    每个模型的并发数由进程内共享的 ModelConcurrencyLimiter 限制，并发的多次检索合计不超过上限；
+    单次调用超过 timeout 秒会被取消并抛出 asyncio.TimeoutError。
+    注意：实例绑定到首次使用它的事件循环，请在同一个事件循环内使用，并在结束时调用 aclose()。
+    """
+    ASK_MODEL_ONE = AnswerAPI.ASK_MODEL_ONE
+    ASK_MODEL_TWO = AnswerAPI.ASK_MODEL_TWO
+
+    # 每个模型默认的最大并发数与单次调用超时（秒）
+    DEFAULT_MAX_CONCURRENCY = 8
+    DEFAULT_TIMEOUT = 60
+
+    def __init__(self, api_key, max_concurrency=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            api_key (str): API密钥
+            max_concurrency (int | dict): 每个模型在整个进程内的最大并发数，传入字典可按模型单独配置
+            timeout (float): 单次调用的超时时间（秒）
+        """
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency if max_concurrency is not None else self.DEFAULT_MAX_CONCURRENCY
+        # 创建时读取 AnswerAPI.BASE_URL，运行中改为替身服务地址时同步与异步客户端一起生效
+        self.client = AsyncOpenAI(api_key=self.api_key, base_url=AnswerAPI.BASE_URL, max_retries=0)
+
+    def _get_limiter(self, model):
+        if isinstance(self.max_concurrency, dict):
+            limit = self.max_concurrency.get(model, self.DEFAULT_MAX_CONCURRENCY)
+        else:
+            limit = self.max_concurrency
+        return get_model_limiter(model, limit)
+
+    async def chat(self, messages, model, timeout=None):
+        """
+        异步发送 messages 到指定模型并返回回答文本；超时或被取消时异常会向上传递。
+        每次尝试的超时不超过请求剩余的时间，截止时间已到时抛出 DeadlineExceeded。
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = 0
+        start_time = time.perf_counter()
+        async with self._get_limiter(model):
+            while True:
+                try:
+                    call_timeout = timeout_for(timeout, f'模型 {model} 调用')
+                    completion = await asyncio.wait_for(
+                        self.client.chat.completions.create(model=model, messages=messages),
+                        timeout=call_timeout
+                    )
+                    break
+                except AnswerAPI.RETRYABLE_ERRORS as e:
+                    backoff = AnswerAPI.RETRY_BACKOFF * (2 ** retries)
+                    if retries >= AnswerAPI.MAX_RETRIES or expired(backoff):
+                        AnswerAPI._record_failure(model, start_time, retries, e)
+                        raise
+                    retries += 1
+                    llm_logger.warning(f"模型: {model}, 异步调用失败({type(e).__name__})，第 {retries} 次重试")
+                    await asyncio.sleep(backoff)
+                except BaseException as e:  # 包括超时与取消
+                    AnswerAPI._record_failure(model, start_time, retries, e)
+                    raise
+
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        prompt_tokens, completion_tokens = AnswerAPI._log_usage(model, messages, completion, latency_ms)
+        llm_stats.record(model, latency_ms, prompt_tokens, completion_tokens, retries=retries)
+        return completion.choices[0].message.content
+
+    async def for_answer_one(self, prompt, timeout=None):
+        return await self.chat([{'role': 'user', 'content': prompt}], self.ASK_MODEL_ONE, timeout=timeout)
+
+    async def for_answer_two(self, prompt, timeout=None):
+        return await self.chat([{'role': 'user', 'content': prompt}], self.ASK_MODEL_TWO, timeout=timeout)
+
+    async def aclose(self):
+        await self.client.close()
+
+    async def __aenter__(self):
+        return self
 
-        answer = completion.choices[0].message.content
-        return answer
\ No newline at end of file
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -1,32 +1,10 @@
 # -*- coding: utf-8 -*-
-import logging
+import asyncio
 
-qa_logger = logging.getLogger('log/question_answerer')
-qa_logger.setLevel(logging.INFO)
+from prompt_builder import PromptBuilder, SUMMARY_ABSTRACT_TOKEN_BUDGET
+from log_config import get_logger
 
-# 避免重复添加 handler
-if not qa_logger.handlers:
-    # 创建文件 handler 并设置编码为 UTF-8
-    file_handler = logging.FileHandler('log/question_answerer.log', encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-
-    # 创建控制台 handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-
-    # 创建 formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    # 设置 formatter
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    # 添加 handlers 到 logger
-    qa_logger.addHandler(file_handler)
-    qa_logger.addHandler(console_handler)
+qa_logger = get_logger('question_answerer', 'question_answerer.log')
 
 
 class QuestionAnswerer:
@@ -34,10 +12,14 @@ class QuestionAnswerer:
     一个封装了通过API进行问题回答的类。
     """
 
-    def __init__(self, api_key, model_name="deepseek-v3"):
+    def __init__(self, api_key, model_name="deepseek-v3", abstract_token_budget=SUMMARY_ABSTRACT_TOKEN_BUDGET):
         """
         初始化 QuestionAnswerer 实例。
+
+        Args:
+            abstract_token_budget (int): 论文内容在提示词中允许占用的最大 token 数
         """
+        self.prompt_builder = PromptBuilder(abstract_token_budget=abstract_token_budget)
         qa_logger.info(f"初始化 QuestionAnswerer 实例, 使用模型: {model_name}")
         try:
             from for_answer import AnswerAPI
@@ -53,37 +35,41 @@ class QuestionAnswerer:
             qa_logger.error(error_msg)
             raise
 
-    def ask(self, prompt):
-
-        all_prompt = f'''
-        一篇论文的详细信息为{prompt}；
-        请帮我对改论文进行总结，具体格式要求如下：
-        以往的研究表明，人工智能（AI）在心理治疗中的应用引起了广泛关注。然而，关于AI生成的回应与人类治疗师的回应在质量和可辨识性方面的差异，尚缺乏深入研究。
-        一项最新的研究探讨了ChatGPT在夫妻治疗情境中的表现。研究人员设计了18个夫妻治疗场景，分别由人类治疗师和ChatGPT生成回应。然后，招募了800多名参与者，对这些回应进行评估，判断其来源并评分。
-        结果显示，参与者难以区分哪些回应来自ChatGPT，哪些来自人类治疗师。此外，ChatGPT生成的回应获得的评分普遍高于人类治疗师的回应。进一步分析发现，ChatGPT的回应通常更长，包含更多的名词和形容词，提供了更丰富的上下文信息，这可能是其获得更高评分的原因之一。
-        这项研究表明，ChatGPT在心理治疗中具有潜在的应用价值。然而，作者强调，尽管AI显示出积极的前景，但在将其整合到心理健康护理中时，需要谨慎考虑伦理和实践方面的问题。专业人士应积极参与AI的发展，以确保其在受监督和负责任的环境中应用，从而提高护理质量和可及性。不过尽管如此，人不是机器，会更倾向于面对面的交流和共情，这一点也许AI永远都无法取代。
-        根据论文具体内容进行回答，不要进行联想，论文种没有提到的，不要出现，不要出现“可能”！！可以根据具体的内容多添加一些小表情，针对研究方法部分可以再具体一些，主要发现的内容也多一些，多点娱乐性的话术，只输出上述提到的内容，不要输出别的内容！！！不要抄写上面的内容！！！
-        '''
-        qa_logger.info(f"收到 ask 请求, 模型: {self.model_name}, Prompt 长度: {len(all_prompt) if all_prompt else 0}")
-
-        if not isinstance(all_prompt, str) or not all_prompt.strip():
-            error_msg = "all_prompt 必须是非空字符串。"
+    def _resolve_model(self):
+        """把 model_name 映射为 AnswerAPI 中实际使用的模型"""
+        if self.model_name == "deepseek-v3":
+            return self.answer_api.ASK_MODEL_TWO
+        if self.model_name == "qwen3-30b-a3b":
+            return self.answer_api.ASK_MODEL_ONE
+        error_msg = f"不支持的模型名称: {self.model_name}。支持的模型: 'deepseek-v3', 'qwen3-30b-a3b'"
+        qa_logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    def _build_messages(self, prompt, summarize=True):
+        if not isinstance(prompt, str) or not prompt.strip():
+            error_msg = "prompt 必须是非空字符串。"
             qa_logger.warning(error_msg)
             raise ValueError(error_msg)
 
-        try:
-            method_name = "for_answer_two" if self.model_name == "deepseek-v3" else "for_answer_one"
-            qa_logger.debug(f"调用 AnswerAPI.{method_name} 方法")
-
-            if self.model_name == "deepseek-v3":
-                answer = self.answer_api.for_answer_two(all_prompt)
-            elif self.model_name == "qwen3-30b-a3b":
-                answer = self.answer_api.for_answer_one(all_prompt)
-            else:
-                error_msg = f"不支持的模型名称: {self.model_name}。支持的模型: 'deepseek-v3', 'qwen3-30b-a3b'"
-                qa_logger.error(error_msg)
-                raise ValueError(error_msg)
+        if summarize:
+            messages = self.prompt_builder.build_summary_messages(prompt)
+        else:
+            # 普通问题直接作为 user 消息发送，不附加论文总结的格式要求
+            messages = [{'role': 'user', 'content': prompt}]
+        qa_logger.info(f"收到 ask 请求, 模型: {self.model_name}, 预估 prompt tokens: {PromptBuilder.count_messages_tokens(messages)}")
+        return messages
 
+    def ask(self, prompt, summarize=True):
+        """
+        对论文内容进行总结。固定的格式要求放在 system 消息中，论文内容按 token 预算压缩后放在最后。
+        summarize 为 False 时把 prompt 作为普通问题直接发送。
+        """
+        messages = self._build_messages(prompt, summarize)
+
+        try:
+            model = self._resolve_model()
+            qa_logger.debug(f"调用 AnswerAPI.chat 方法, 实际模型: {model}")
+            answer = self.answer_api.chat(messages, model)
             qa_logger.info(f"成功获取回答, 回答长度: {len(answer) if answer else 0}")
 
             return answer
@@ -95,6 +81,27 @@ class QuestionAnswerer:
             # 重新抛出异常，让调用者处理
             raise Exception(error_msg) from e
 
+    async def ask_async(self, prompt, async_api, summarize=True):
+        """
+        ask 的异步版本，通过传入的 AsyncAnswerAPI 发起请求，可与其他请求在同一个事件循环中并发执行。
+        超时与取消异常会原样向上传递。
+        """
+        messages = self._build_messages(prompt, summarize)
+        model = self._resolve_model()
+
+        try:
+            answer = await async_api.chat(messages, model)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            qa_logger.warning(f"异步总结请求被取消或超时, 模型: {model}")
+            raise
+        except Exception as e:
+            error_msg = f"调用API生成回答时出错: {e}"
+            qa_logger.error(error_msg, exc_info=True)
+            raise Exception(error_msg) from e
+
+        qa_logger.info(f"成功获取回答, 回答长度: {len(answer) if answer else 0}")
+        return answer
+
 if __name__ == '__main__':
     YOUR_API_KEY = 'key'
 
@@ -104,7 +111,7 @@ if __name__ == '__main__':
 
     prompt1 = "请用一句话解释量子计算。"
     try:
-        answer1 = qa_agent_v3.ask(prompt1)
+        answer1 = qa_agent_v3.ask(prompt1, summarize=False)
         print(f"Prompt: {prompt1}")
         print(f"Answer: {answer1}\n")
     except Exception as e:
@@ -116,7 +123,7 @@ if __name__ == '__main__':
 
     prompt2 = "期刊‘Expert review of proteomics’的影响因子为多少？要求只输出影响因子，不要有任何额外的输出，只需要一个准确的数字"
     try:
-        answer2 = qa_agent_qwen.ask(prompt2)
+        answer2 = qa_agent_qwen.ask(prompt2, summarize=False)
         print(f"Prompt: {prompt2}")
         print(f"Answer: {answer2}\n")
     except Exception as e:
@@ -1,37 +1,127 @@
 import requests
 import time
 import os
-import logging
-import sys
 
-def setup_logging():
-    # 确保log目录存在
-    if not os.path.exists('log'):
-        os.makedirs('log')
-
-    logger = logging.getLogger('get_photo')
-    logger.setLevel(logging.INFO)
-
-    logger.handlers.clear()
-
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-    file_handler = logging.FileHandler('log/get_photo.log', encoding='utf-8')
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+from log_config import get_logger
+
+get_photo_logger = get_logger('get_photo', 'get_photo.log')
+
+
+# 截图后端：'urlscan' 使用 urlscan.io 远程扫描；'local' 使用本地无头浏览器池（browser_pool.py）
+SCREENSHOT_BACKEND = os.environ.get('SCREENSHOT_BACKEND', 'urlscan')
+
+# urlscan 地址，压测时可指向本地替身服务（fake_services.py）
+URLSCAN_BASE_URL = os.environ.get('URLSCAN_BASE_URL', 'https://urlscan.io').rstrip('/')
+URLSCAN_SCAN_URL = URLSCAN_BASE_URL + "/api/v1/scan/"
+URLSCAN_RESULT_URL = URLSCAN_BASE_URL + "/api/v1/result/{scan_id}/"
+URLSCAN_SCREENSHOT_URL = URLSCAN_BASE_URL + "/screenshots/{scan_id}.png"
+
+# 轮询参数：首次等待、指数退避倍数、单次等待上限（秒），以及默认的整体截止时间（秒）
+POLL_INITIAL_DELAY = 2.0
+POLL_BACKOFF_FACTOR = 1.5
+POLL_MAX_DELAY = 5.0
+DEFAULT_DEADLINE = 60.0
+# 旧版固定等待时间（wait_mode='sleep' 时使用）
+FIXED_WAIT_SECONDS = 15
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _wait_for_screenshot(scan_id, deadline_at):
+    """
+    轮询 urlscan 结果接口，扫描完成且截图可下载时返回截图响应（stream 模式，调用方负责关闭）；
+    超过截止时间返回 None。结果未就绪时接口返回 404。
+    """
+    result_url = URLSCAN_RESULT_URL.format(scan_id=scan_id)
+    screenshot_url = URLSCAN_SCREENSHOT_URL.format(scan_id=scan_id)
+    delay = POLL_INITIAL_DELAY
+    attempt = 0
+    result_ready = False
+
+    while True:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY)
+        attempt += 1
+        request_timeout = max(1.0, min(30.0, deadline_at - time.monotonic()))
+
+        try:
+            if not result_ready:
+                result_response = requests.get(result_url, timeout=request_timeout)
+                if result_response.status_code == 404:
+                    get_photo_logger.debug(f"扫描结果未就绪（第 {attempt} 次轮询）")
+                    continue
+                if result_response.status_code != 200:
+                    get_photo_logger.warning(f"查询扫描结果返回 HTTP {result_response.status_code}（第 {attempt} 次轮询）")
+                    continue
+                result_ready = True
+                get_photo_logger.info(f"扫描完成（第 {attempt} 次轮询）")
+
+            screenshot_response = requests.get(screenshot_url, timeout=request_timeout, stream=True)
+            if screenshot_response.status_code == 200:
+                return screenshot_response
+            screenshot_response.close()
+            get_photo_logger.debug(f"截图未就绪: HTTP {screenshot_response.status_code}（第 {attempt} 次轮询）")
+        except requests.exceptions.RequestException as e:
+            get_photo_logger.warning(f"轮询截图时网络异常（第 {attempt} 次轮询）: {e}")
 
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    return logger
+def _stream_to_file(response, output_file):
+    """把响应内容分块写入临时文件，完成后原子替换为目标文件"""
+    temp_file = f"{output_file}.part"
+    try:
+        with open(temp_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+        os.replace(temp_file, output_file)
+    finally:
+        response.close()
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def _screenshot_with_browser_pool(url, output_file, deadline, viewport, clip, full_page, start_time):
+    """使用本地无头浏览器池截图"""
+    try:
+        from browser_pool import get_browser_pool
+
+        get_browser_pool().screenshot(url.strip(), output_file, viewport=viewport, clip=clip,
+                                      full_page=full_page, timeout=deadline)
+        elapsed = time.monotonic() - start_time
+        get_photo_logger.info(f"本地截图已保存为: {output_file}，耗时 {elapsed:.1f} 秒")
+        return output_file
+    except ImportError as e:
+        error_msg = f"本地截图后端不可用（需要安装 playwright）: {e}"
+        get_photo_logger.error(error_msg)
+        return error_msg
+    except Exception as e:
+        error_msg = f"本地截图失败: {str(e)}"
+        get_photo_logger.error(error_msg)
+        return error_msg
 
 
-get_photo_logger = setup_logging()
+def get_screenshot_local(url, api_key, output_file="image/screenshot.ipg", wait_mode='poll', deadline=DEFAULT_DEADLINE,
+                         backend=None, viewport=None, clip=None, full_page=False):
+    """
+    获取网页截图并保存到 output_file。
 
+    Args:
+        wait_mode (str): urlscan 后端的等待方式：'poll' 轮询结果接口，截图就绪即下载；'sleep' 为旧版固定等待 15 秒
+        deadline (float): 从提交截图开始计算的整体截止时间（秒）
+        backend (str): 'urlscan' 或 'local'，默认使用 SCREENSHOT_BACKEND
+        viewport (dict): 本地后端的视口大小，如 {'width': 1280, 'height': 800}
+        clip (dict): 本地后端的截取区域 {'x', 'y', 'width', 'height'}
+        full_page (bool): 本地后端是否截取整个页面
 
-def get_screenshot_local(url, api_key, output_file="image/screenshot.ipg"):
+    Returns:
+        str: 成功时返回 output_file，失败时返回错误信息
+    """
     get_photo_logger.info(f"开始处理截图请求 - URL: {url}")
+    start_time = time.monotonic()
+    deadline_at = start_time + deadline
 
     # 确保输出目录存在
     output_dir = os.path.dirname(output_file)
@@ -39,7 +129,9 @@ def get_screenshot_local(url, api_key, output_file="image/screenshot.ipg"):
         os.makedirs(output_dir)
         get_photo_logger.info(f"创建输出目录: {output_dir}")
 
-    scan_url = "https://urlscan.io/api/v1/scan/"
+    if (backend or SCREENSHOT_BACKEND) == 'local':
+        return _screenshot_with_browser_pool(url, output_file, deadline, viewport, clip, full_page, start_time)
+
     headers = {
         'API-Key': api_key.strip(),
         'Content-Type': 'application/json'
@@ -53,33 +145,36 @@ def get_screenshot_local(url, api_key, output_file="image/screenshot.ipg"):
     try:
         get_photo_logger.info("提交扫描请求到 urlscan.io")
 
-        response = requests.post(scan_url, headers=headers, json=data, timeout=30)
+        response = requests.post(URLSCAN_SCAN_URL, headers=headers, json=data, timeout=30)
 
         if response.status_code == 200:
             result = response.json()
             scan_id = result.get('uuid')
             get_photo_logger.info(f"扫描已提交成功，ID: {scan_id}")
 
-            # 等待扫描完成
-            get_photo_logger.info("等待截图生成... (15秒)")
-            time.sleep(15)
-
-            # 构建截图URL
-            screenshot_url = f"https://urlscan.io/screenshots/{scan_id}.png"
-            get_photo_logger.info(f"构建截图URL: {screenshot_url}")
-
-            get_photo_logger.info("正在下载截图...")
-            screenshot_response = requests.get(screenshot_url, timeout=30)
-
-            if screenshot_response.status_code == 200:
-                with open(output_file, 'wb') as f:
-                    f.write(screenshot_response.content)
-                get_photo_logger.info(f"截图已成功保存为: {output_file}")
-                return output_file
+            if wait_mode == 'sleep':
+                get_photo_logger.info(f"等待截图生成... ({FIXED_WAIT_SECONDS}秒)")
+                time.sleep(FIXED_WAIT_SECONDS)
+                screenshot_url = URLSCAN_SCREENSHOT_URL.format(scan_id=scan_id)
+                get_photo_logger.info(f"正在下载截图: {screenshot_url}")
+                screenshot_response = requests.get(screenshot_url, timeout=30, stream=True)
+                if screenshot_response.status_code != 200:
+                    screenshot_response.close()
+                    error_msg = f"下载截图失败: HTTP {screenshot_response.status_code}"
+                    get_photo_logger.error(error_msg)
+                    return error_msg
             else:
-                error_msg = f"下载截图失败: HTTP {screenshot_response.status_code}"
-                get_photo_logger.error(error_msg)
-                return error_msg
+                get_photo_logger.info(f"轮询截图结果，截止时间 {deadline:g} 秒")
+                screenshot_response = _wait_for_screenshot(scan_id, deadline_at)
+                if screenshot_response is None:
+                    error_msg = f"截图超时: {deadline:g} 秒内未完成"
+                    get_photo_logger.error(error_msg)
+                    return error_msg
+
+            _stream_to_file(screenshot_response, output_file)
+            elapsed = time.monotonic() - start_time
+            get_photo_logger.info(f"截图已成功保存为: {output_file}，耗时 {elapsed:.1f} 秒")
+            return output_file
         else:
             error_msg = f"扫描请求失败: HTTP {response.status_code} - {response.text}"
             get_photo_logger.error(error_msg)
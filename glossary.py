@@ -0,0 +1,155 @@
+# glossary.py
+# 本地生物医学术语表：从用户提供的中英/MeSH 术语文件构建前缀树（trie），
+# 对中文检索词做最长匹配切分，常见术语无需调用翻译API即可得到稳定的英文词。
+# 检索式把译文放在 [Title]/[Title/Abstract] 条件中，标题里很少直接出现 MeSH 主题词的写法，
+# 因此默认输出英文术语，只有构建 [MeSH Terms] 条件时才用 segment(text, use_mesh=True) 取 MeSH 主题词。
+# 仓库自带示例术语表 data/medical_glossary.tsv。
+#
+# 术语文件格式（UTF-8，制表符分隔，# 开头为注释）：
+#   中文术语<TAB>英文术语[<TAB>MeSH主题词]
+# 例如：
+#   肺癌	lung cancer	Lung Neoplasms
+#   早期	early
+#   症状	symptoms
+
+import os
+import threading
+
+from log_config import get_logger
+
+logger = get_logger('baidu_translator', 'translation.log')
+
+GLOSSARY_PATH = os.path.join('data', 'medical_glossary.tsv')
+
+# 术语之间常见的连接字，单独出现时直接本地处理，不再调用翻译API
+CONNECTOR_WORDS = {
+    '的': '',
+    '与': 'and',
+    '和': 'and',
+    '及': 'and',
+    '或': 'or',
+}
+
+# 全角标点转换为半角
+_PUNCTUATION_MAP = str.maketrans({'，': ',', '、': ',', '；': ';', '：': ':', '（': '(', '）': ')'})
+
+_TERM_END = '\0'
+
+
+class MedicalGlossary:
+    """
+    基于前缀树的中文术语表，支持最长匹配切分。
+    """
+
+    def __init__(self):
+        self._root = {}
+        self.size = 0
+
+    def add(self, chinese, english, mesh=None):
+        """添加术语；english 为空时用 MeSH 主题词代替"""
+        chinese = chinese.strip()
+        english = (english or '').strip()
+        mesh = (mesh or '').strip() or None
+        if not chinese or not (english or mesh):
+            return
+        node = self._root
+        for char in chinese:
+            node = node.setdefault(char, {})
+        if _TERM_END not in node:
+            self.size += 1
+        node[_TERM_END] = (english or mesh, mesh)
+
+    def load(self, path):
+        """从术语文件加载，返回加载的条目数"""
+        loaded = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.rstrip('\r\n')
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                columns = line.split('\t')
+                if len(columns) < 2:
+                    logger.warning(f"术语文件第 {line_no} 行格式错误，已跳过: '{line}'")
+                    continue
+                mesh = columns[2] if len(columns) > 2 else None
+                self.add(columns[0], columns[1], mesh)
+                loaded += 1
+        logger.info(f"术语表加载完成: {path}, 共 {loaded} 条")
+        return loaded
+
+    def longest_match(self, text, start, use_mesh=False):
+        """
+        返回从 start 开始能匹配到的最长术语 (结束位置, 译文)，无匹配时返回 None。
+        use_mesh 为 True 时译文优先取 MeSH 主题词（没有时仍为英文术语）。
+        """
+        node = self._root
+        match = None
+        for idx in range(start, len(text)):
+            node = node.get(text[idx])
+            if node is None:
+                break
+            if _TERM_END in node:
+                english, mesh = node[_TERM_END]
+                match = (idx + 1, mesh if use_mesh and mesh else english)
+        return match
+
+    def segment(self, text, use_mesh=False):
+        """
+        最长匹配切分文本，返回 [(原文片段, 译文或None), ...]；
+        未收录的连续字符合并为一个译文为 None 的片段。
+        译文默认为英文术语，use_mesh 为 True 时取 MeSH 主题词（用于 [MeSH Terms] 条件）。
+        """
+        segments = []
+        unknown_start = None
+        idx = 0
+        while idx < len(text):
+            match = self.longest_match(text, idx, use_mesh)
+            if match is None:
+                if unknown_start is None:
+                    unknown_start = idx
+                idx += 1
+                continue
+            if unknown_start is not None:
+                segments.append((text[unknown_start:idx], None))
+                unknown_start = None
+            end, translation = match
+            segments.append((text[idx:end], translation))
+            idx = end
+        if unknown_start is not None:
+            segments.append((text[unknown_start:], None))
+        return segments
+
+    def __len__(self):
+        return self.size
+
+
+_glossary = None
+_glossary_lock = threading.Lock()
+
+
+def get_glossary(path=GLOSSARY_PATH):
+    """返回进程内共享的术语表，首次调用时从文件加载；文件不存在时返回空术语表"""
+    global _glossary
+    if _glossary is None:
+        with _glossary_lock:
+            if _glossary is None:
+                glossary = MedicalGlossary()
+                if path and os.path.exists(path):
+                    try:
+                        glossary.load(path)
+                    except (OSError, UnicodeDecodeError) as e:
+                        logger.error(f"加载术语表失败: {path}: {e}")
+                _glossary = glossary
+    return _glossary
+
+
+def reload_glossary(path=GLOSSARY_PATH):
+    """重新加载术语表（术语文件更新后调用）"""
+    global _glossary
+    with _glossary_lock:
+        _glossary = None
+    return get_glossary(path)
+
+
+def normalize_punctuation(text):
+    return text.translate(_PUNCTUATION_MAP)
@@ -0,0 +1,196 @@
+# http_cache.py
+# JSON 接口的条件缓存与压缩：
+#   - 按响应内容计算 ETag（视图可用 set_payload_etag() 指定只按稳定的结果数据计算），
+#     并以「请求路径 + 规范化请求体」为键记录最近一次响应的指纹；
+#   - 请求携带的 If-None-Match 与记录的指纹一致时直接返回 304，不再执行检索/总结流程；
+#   - 响应体较大时按 Accept-Encoding 使用 brotli（可选依赖）或 gzip 压缩。
+
+import functools
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request, make_response
+
+from log_config import get_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = get_logger('paper_search_app', 'paper_search_app.log')
+
+# 指纹缓存容量；小于该字节数的响应不压缩
+FINGERPRINT_CACHE_SIZE = 4096
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def compute_etag(body):
+    """根据响应内容计算强 ETag（带引号）"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def set_payload_etag(response, payload):
+    """
+    按稳定的结果数据（而不是整个响应体）设置 ETag。
+    响应中含有每次执行都会变化的字段（耗时、是否合并等）时使用，重新执行后结果不变仍能返回 304。
+    """
+    response.headers['ETag'] = compute_etag(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return response
+
+
+def choose_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择压缩方式：优先 br（已安装 brotli 时），其次 gzip，否则返回 None"""
+    accepted = {part.split(';')[0].strip().lower() for part in (accept_encoding or '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def _strip_encoding_suffix(etag):
+    """去掉压缩响应 ETag 上的编码后缀，如 "abc-gzip" -> "abc\""""
+    for suffix in ('-br"', '-gzip"'):
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any(_strip_encoding_suffix(tag.removeprefix('W/')) == etag for tag in candidates)
+
+
+def compress_response(response):
+    """按请求的 Accept-Encoding 压缩响应体（已压缩、过小或流式响应不处理）"""
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag = response.headers.get('ETag')
+    if etag:
+        response.headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+    return response
+
+
+class FingerprintCache:
+    """
+    请求键 -> (ETag, 过期时间) 的 LRU 缓存，线程安全。
+    """
+
+    def __init__(self, max_size=FINGERPRINT_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, etag, ttl):
+        with self._lock:
+            self._entries[key] = (etag, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+fingerprint_cache = FingerprintCache()
+
+
+def _request_key():
+    """请求路径 + 规范化的 JSON 请求体（键排序），非 JSON 时使用原始请求体"""
+    data = request.get_json(silent=True)
+    if data is not None:
+        body = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    else:
+        body = request.get_data(as_text=True)
+    return f"{request.method} {request.path} {body}"
+
+
+def no_store(response):
+    """把响应标记为不可缓存（Cache-Control: no-store），conditional_json 不会为它生成 ETag"""
+    response = make_response(response)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def conditional_json(ttl, cache_control=None):
+    """
+    视图装饰器：为 200 的 JSON 响应加 ETag（视图已用 set_payload_etag() 设置时沿用）/Cache-Control 并记录指纹，
+    If-None-Match 命中记录的指纹时直接返回 304；较大的响应体按 Accept-Encoding 压缩。
+    视图用 no_store() 标记的响应（失败、部分结果）不加 ETag 也不记录指纹，重试时总会重新执行。
+
+    Args:
+        ttl (float): 指纹的有效期（秒），过期后重新执行视图
+        cache_control (str): Cache-Control 头，默认 'private, max-age=0, must-revalidate'
+    """
+    cache_control = cache_control or 'private, max-age=0, must-revalidate'
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = _request_key()
+            cached_etag = fingerprint_cache.get(key)
+            if cached_etag and etag_matches(request.headers.get('If-None-Match'), cached_etag):
+                fingerprint_cache.record(hit=True)
+                logger.info(f"条件请求命中，返回 304 - 路径: {request.path}")
+                response = make_response('', 304)
+                response.headers['ETag'] = cached_etag
+                response.headers['Cache-Control'] = cache_control
+                response.vary.add('Accept-Encoding')
+                return response
+            fingerprint_cache.record(hit=False)
+
+            response = make_response(view(*args, **kwargs))
+            if (response.status_code == 200 and response.mimetype == 'application/json'
+                    and not response.cache_control.no_store):
+                etag = response.headers.get('ETag') or compute_etag(response.get_data())
+                fingerprint_cache.put(key, etag, ttl)
+                if etag_matches(request.headers.get('If-None-Match'), etag):
+                    # 重新执行后内容未变化，仍然不必重复传输响应体
+                    response = make_response('', 304)
+                response.headers['ETag'] = etag
+                response.headers['Cache-Control'] = cache_control
+            return compress_response(response)
+        return wrapper
+    return decorator
@@ -0,0 +1,273 @@
+# image_store.py
+# 论文图片存储：图片按内容哈希（SHA-256）保存，相同内容只存一份；
+# 截图、AI插图通过别名（如 'screenshot:40794953'）指向内容哈希。
+# 写入均为先写临时文件再原子替换；可选用 Pillow 生成 WebP/JPEG 缩略图；
+# 总占用超过磁盘配额时按最近访问时间（LRU）淘汰。
+# 多个 worker 进程共享同一份存储：去重/登记与淘汰都在 SQLite 的 BEGIN IMMEDIATE 事务中移动或删除文件，
+# 写事务在进程间互斥，登记时看到的文件不会在提交前被其他进程淘汰。
+#
+# 目录结构：
+#   dynamic_images/objects/<哈希前两位>/<哈希>.<png|jpg|webp|gif>   原图
+#   dynamic_images/thumbs/<哈希>_<宽度>.<webp|jpg>                   缩略图
+#   dynamic_images/tmp/                                             生成中的临时文件
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+from log_config import get_logger
+
+logger = get_logger('paper_search_app', 'paper_search_app.log')
+
+IMAGE_STORE_ROOT = 'dynamic_images'
+IMAGE_STORE_DB_PATH = os.path.join('cache', 'image_store.db')
+# 原图与缩略图的总磁盘配额（字节）
+IMAGE_STORE_MAX_BYTES = 1024 * 1024 * 1024
+# 缩略图宽度（像素）与压缩质量
+THUMBNAIL_WIDTH = 480
+THUMBNAIL_QUALITY = 80
+# 超过该时间（秒）仍留在 tmp/ 中的临时文件视为中断残留，启动时清理
+TEMP_FILE_MAX_AGE = 3600
+# 等待其他进程释放数据库写锁的最长时间（秒）
+WRITE_LOCK_TIMEOUT = 30
+
+# 文件头魔数 -> 扩展名，按真实内容决定扩展名（截图为 PNG，AI 插图多为 JPEG）
+_MAGIC_NUMBERS = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+
+def detect_image_type(path):
+    """根据文件头判断图片类型，返回扩展名；无法识别时返回 None"""
+    with open(path, 'rb') as f:
+        header = f.read(16)
+    for magic, ext in _MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return ext
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ImageStore:
+    """
+    内容寻址的图片存储，别名与访问时间记录在 SQLite 中，多个 worker 进程可共享。
+    """
+
+    def __init__(self, root=IMAGE_STORE_ROOT, db_path=IMAGE_STORE_DB_PATH, max_bytes=IMAGE_STORE_MAX_BYTES,
+                 thumbnail_width=THUMBNAIL_WIDTH):
+        """
+        Args:
+            root (str): 图片根目录，对外 URL 前缀与目录名相同
+            db_path (str): 别名索引数据库路径
+            max_bytes (int): 原图与缩略图的总磁盘配额（字节）
+            thumbnail_width (int): 缩略图宽度，0 表示不生成缩略图
+        """
+        self.root = root
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.thumbnail_width = thumbnail_width
+
+        for directory in (os.path.join(root, 'objects'), os.path.join(root, 'thumbs'), os.path.join(root, 'tmp'),
+                          os.path.dirname(db_path)):
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS objects ('
+                'digest TEXT PRIMARY KEY, ext TEXT NOT NULL, size INTEGER NOT NULL, thumb TEXT, '
+                'created_at REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, digest TEXT NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_objects_access ON objects (last_access)')
+        self._purge_temp_files()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    @contextmanager
+    def _write_transaction(self):
+        """BEGIN IMMEDIATE 写事务：立即获取数据库写锁，与其他进程的登记、淘汰互斥"""
+        conn = sqlite3.connect(self.db_path, timeout=WRITE_LOCK_TIMEOUT, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def _object_relpath(self, digest, ext):
+        return f"objects/{digest[:2]}/{digest}.{ext}"
+
+    def _url(self, relpath):
+        return f"{self.root}/{relpath}" if relpath else None
+
+    def _purge_temp_files(self):
+        cutoff = time.time() - TEMP_FILE_MAX_AGE
+        temp_dir = os.path.join(self.root, 'tmp')
+        for name in os.listdir(temp_dir):
+            path = os.path.join(temp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def temp_path(self, suffix=''):
+        """返回一个临时文件路径，生成图片时先写入这里，完成后交给 put_file()"""
+        return os.path.join(self.root, 'tmp', f"{uuid.uuid4().hex}{suffix}")
+
+    def lookup(self, alias):
+        """
+        查找别名对应的图片，返回 {'digest', 'url', 'thumb_url'}；不存在或文件已丢失时返回 None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT o.digest, o.ext, o.thumb FROM aliases a JOIN objects o ON a.digest = o.digest '
+                'WHERE a.alias = ?', (alias,)
+            ).fetchone()
+            if row is None:
+                return None
+            digest, ext, thumb = row
+            relpath = self._object_relpath(digest, ext)
+            if not os.path.exists(os.path.join(self.root, relpath)):
+                logger.warning(f"图片文件已丢失，移除索引: {alias} -> {digest}")
+                conn.execute('DELETE FROM aliases WHERE digest = ?', (digest,))
+                conn.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+                return None
+            conn.execute('UPDATE objects SET last_access = ? WHERE digest = ?', (time.time(), digest))
+        return {'digest': digest, 'url': self._url(relpath), 'thumb_url': self._url(thumb)}
+
+    def put_file(self, source_path, alias):
+        """
+        把生成好的图片文件移入存储并登记别名，返回与 lookup() 相同结构的字典。
+        内容已存在时直接删除源文件，只登记别名。
+        """
+        ext = detect_image_type(source_path)
+        if ext is None:
+            _remove_quietly(source_path)
+            raise ValueError(f"无法识别的图片格式: {source_path}")
+
+        digest = _file_digest(source_path)
+        relpath = self._object_relpath(digest, ext)
+        object_path = os.path.join(self.root, relpath)
+        # 缩略图较慢，在获取写锁之前按源文件生成（内容相同）
+        thumb = self._make_thumbnail(digest, source_path)
+
+        with self._write_transaction() as conn:
+            # 持有写锁后才判断是否已存在并删除源文件：其他进程的淘汰不会在登记前删掉这份内容
+            if os.path.exists(object_path):
+                _remove_quietly(source_path)
+                logger.info(f"图片内容已存在，去重: {alias} -> {digest}")
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                temp_file = f"{object_path}.{uuid.uuid4().hex}.part"
+                try:
+                    shutil.move(source_path, temp_file)
+                    os.replace(temp_file, object_path)
+                finally:
+                    _remove_quietly(temp_file)
+            if thumb and not os.path.exists(os.path.join(self.root, thumb)):
+                thumb = None
+            size = os.path.getsize(object_path)
+            if thumb:
+                size += os.path.getsize(os.path.join(self.root, thumb))
+
+            now = time.time()
+            conn.execute(
+                'INSERT INTO objects (digest, ext, size, thumb, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(digest) DO UPDATE SET last_access = excluded.last_access, '
+                'thumb = COALESCE(objects.thumb, excluded.thumb), size = excluded.size',
+                (digest, ext, size, thumb, now, now)
+            )
+            conn.execute('INSERT OR REPLACE INTO aliases (alias, digest) VALUES (?, ?)', (alias, digest))
+
+        logger.info(f"图片已存储: {alias} -> {relpath}")
+        self.enforce_quota()
+        return {'digest': digest, 'url': self._url(relpath), 'thumb_url': self._url(thumb)}
+
+    def _make_thumbnail(self, digest, image_path):
+        """生成缩略图（优先 WebP，不支持时使用 JPEG），返回相对路径；未安装 Pillow 时返回 None"""
+        if not self.thumbnail_width:
+            return None
+        try:
+            from PIL import Image, features
+        except ImportError:
+            return None
+
+        ext = 'webp' if features.check('webp') else 'jpg'
+        relpath = f"thumbs/{digest}_{self.thumbnail_width}.{ext}"
+        thumb_path = os.path.join(self.root, relpath)
+        if os.path.exists(thumb_path):
+            return relpath
+
+        temp_file = f"{thumb_path}.{uuid.uuid4().hex}.part"
+        try:
+            with Image.open(image_path) as image:
+                image = image.convert('RGB')
+                if image.width > self.thumbnail_width:
+                    height = max(1, round(image.height * self.thumbnail_width / image.width))
+                    image = image.resize((self.thumbnail_width, height), Image.LANCZOS)
+                image.save(temp_file, format='WEBP' if ext == 'webp' else 'JPEG',
+                           quality=THUMBNAIL_QUALITY, optimize=True)
+            os.replace(temp_file, thumb_path)
+            return relpath
+        except Exception as e:
+            logger.warning(f"生成缩略图失败 {image_path}: {e}")
+            return None
+        finally:
+            _remove_quietly(temp_file)
+
+    def total_bytes(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+
+    def enforce_quota(self):
+        """总占用超过配额时，按最近访问时间从旧到新淘汰图片，返回淘汰的数量"""
+        if not self.max_bytes:
+            return 0
+        evicted = 0
+        with self._write_transaction() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            rows = conn.execute('SELECT digest, ext, size, thumb FROM objects ORDER BY last_access').fetchall()
+            for digest, ext, size, thumb in rows:
+                if total <= self.max_bytes:
+                    break
+                _remove_quietly(os.path.join(self.root, self._object_relpath(digest, ext)))
+                if thumb:
+                    _remove_quietly(os.path.join(self.root, thumb))
+                conn.execute('DELETE FROM aliases WHERE digest = ?', (digest,))
+                conn.execute('DELETE FROM objects WHERE digest = ?', (digest,))
+                total -= size
+                evicted += 1
+        if evicted:
+            logger.info(f"图片存储超出配额，已淘汰 {evicted} 张图片，当前占用 {total / 1024 / 1024:.1f}MB")
+        return evicted
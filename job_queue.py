@@ -0,0 +1,185 @@
+# job_queue.py
+# 进程内后台任务队列：有界线程池执行耗时任务（截图、AI插图生成），任务状态持久化在 SQLite 任务表中，
+# 接口可以立即返回任务ID，前端再通过状态接口轮询结果。
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from log_config import get_logger
+
+logger = get_logger('paper_search_app', 'paper_search_app.log')
+
+JOB_DB_PATH = os.path.join('cache', 'jobs.db')
+# 同时执行的任务数、排队上限，以及已结束任务在任务表中的保留时间（秒）
+JOB_MAX_WORKERS = 4
+JOB_MAX_PENDING = 64
+JOB_RETENTION_SECONDS = 24 * 3600
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+
+def _process_alive(pid):
+    """判断进程是否仍在运行；非 POSIX 平台无法安全探测，视为存活"""
+    if not pid:
+        return False
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueueFull(Exception):
+    """排队任务数达到上限时抛出"""
+
+
+class JobManager:
+    """
+    有界线程池 + 持久化任务表。
+
+    submit() 立即返回任务ID；任务函数在后台线程中执行，返回值需可 JSON 序列化，作为任务结果保存。
+    任务内部可以通过 run_parallel() 把多个子步骤并行执行。
+    """
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS, max_pending=JOB_MAX_PENDING, db_path=JOB_DB_PATH,
+                 retention_seconds=JOB_RETENTION_SECONDS):
+        self.max_pending = max_pending
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job_worker')
+        # 子任务使用独立的线程池，避免任务在等待子任务时占满主线程池造成死锁
+        self._task_executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix='job_task')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT, '
+                'result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, '
+                'owner_pid INTEGER)'
+            )
+        self._fail_orphaned_jobs()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _fail_orphaned_jobs(self):
+        """把所属进程已退出、但仍处于排队/执行状态的任务标记为失败（多个 worker 进程共享任务表）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT job_id, owner_pid FROM jobs WHERE status IN (?, ?)', (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchall()
+            for job_id, owner_pid in rows:
+                if owner_pid == os.getpid() or _process_alive(owner_pid):
+                    continue
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?',
+                    (STATUS_FAILED, '服务重启，任务中断', time.time(), job_id)
+                )
+
+    def _update(self, job_id, **fields):
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {columns} WHERE job_id = ?', (*fields.values(), job_id))
+
+    def submit(self, kind, func, params=None):
+        """
+        提交任务并返回任务ID。func 以 **params 调用。
+        排队任务数达到上限时抛出 JobQueueFull。
+        """
+        params = params or {}
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"任务队列已满（{self.max_pending}）")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO jobs (job_id, kind, status, params, created_at, owner_pid) VALUES (?, ?, ?, ?, ?, ?)',
+                    (job_id, kind, STATUS_QUEUED, json.dumps(params, ensure_ascii=False), time.time(), os.getpid())
+                )
+            self._executor.submit(self._run, job_id, kind, func, params)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        logger.info(f"任务已提交 - ID: {job_id}, 类型: {kind}")
+        self._purge_expired()
+        return job_id
+
+    def _run(self, job_id, kind, func, params):
+        start_time = time.time()
+        self._update(job_id, status=STATUS_RUNNING, started_at=start_time)
+        try:
+            result = func(**params)
+            self._update(job_id, status=STATUS_COMPLETED, result=json.dumps(result, ensure_ascii=False),
+                         finished_at=time.time())
+            logger.info(f"任务完成 - ID: {job_id}, 类型: {kind}, 耗时: {(time.time() - start_time) * 1000:.2f}ms")
+        except Exception as e:
+            logger.error(f"任务失败 - ID: {job_id}, 类型: {kind}: {e}", exc_info=True)
+            self._update(job_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def pending(self):
+        """返回排队中与执行中的任务数"""
+        with self._lock:
+            return self._pending
+
+    def run_parallel(self, *callables):
+        """在子任务线程池中并行执行多个无参函数，按顺序返回结果；任一函数抛出的异常会原样抛出"""
+        futures = [self._task_executor.submit(func) for func in callables]
+        return [future.result() for future in futures]
+
+    def get(self, job_id):
+        """返回任务信息字典，任务不存在时返回 None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT job_id, kind, status, result, error, created_at, started_at, finished_at '
+                'FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, result, error, created_at, started_at, finished_at = row
+        return {
+            'job_id': job_id,
+            'kind': kind,
+            'status': status,
+            'result': json.loads(result) if result else None,
+            'error': error,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at
+        }
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention_seconds
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?', (cutoff,))
+        except sqlite3.Error as e:
+            logger.warning(f"清理过期任务失败: {e}")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._task_executor.shutdown(wait=wait)
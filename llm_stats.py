@@ -0,0 +1,130 @@
+# llm_stats.py
+# 该模块在进程内统计大模型调用情况：按模型记录调用次数、耗时、token 用量、重试次数与错误类型，
+# 耗时与 token 数使用固定分桶的直方图保存，供 /api/llm_stats 查询以及容量规划使用。
+
+import bisect
+import threading
+
+# 直方图分桶上界（耗时单位为毫秒），最后一个桶收集所有超出上界的值
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+class Histogram:
+    """固定分桶直方图，记录每个桶的计数以及总和、最大值"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """按分桶估算分位数，返回对应桶的上界（落在最后一个桶时返回最大值）"""
+        if self.count == 0:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for idx, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return self.buckets[idx] if idx < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        bucket_labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            'count': self.count,
+            'sum': round(self.total, 2),
+            'avg': round(self.total / self.count, 2) if self.count else None,
+            'max': round(self.max, 2),
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'buckets': dict(zip(bucket_labels, self.counts))
+        }
+
+
+class _ModelStats:
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.retries = 0
+        self.errors = {}
+        self.prompt_tokens_total = 0
+        self.completion_tokens_total = 0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'successes': self.successes,
+            'retries': self.retries,
+            'errors': dict(self.errors),
+            'prompt_tokens_total': self.prompt_tokens_total,
+            'completion_tokens_total': self.completion_tokens_total,
+            'latency_ms': self.latency_ms.snapshot(),
+            'prompt_tokens': self.prompt_tokens.snapshot(),
+            'completion_tokens': self.completion_tokens.snapshot()
+        }
+
+
+class LLMCallStats:
+    """
+    线程安全的大模型调用统计，按模型分别汇总。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def record(self, model, latency_ms, prompt_tokens=None, completion_tokens=None, retries=0, error=None):
+        """
+        记录一次调用（包含其内部的所有重试）。
+
+        Args:
+            model (str): 模型名称
+            latency_ms (float): 调用总耗时（毫秒）
+            prompt_tokens (int): usage 中的 prompt token 数，缺失时为 None
+            completion_tokens (int): usage 中的 completion token 数，缺失时为 None
+            retries (int): 本次调用发生的重试次数
+            error (BaseException | str): 最终失败时的异常或异常类名，成功时为 None
+        """
+        with self._lock:
+            stats = self._models.setdefault(model, _ModelStats())
+            stats.calls += 1
+            stats.retries += retries
+            stats.latency_ms.observe(latency_ms)
+            if error is None:
+                stats.successes += 1
+            else:
+                error_name = error if isinstance(error, str) else type(error).__name__
+                stats.errors[error_name] = stats.errors.get(error_name, 0) + 1
+            if prompt_tokens is not None:
+                stats.prompt_tokens_total += prompt_tokens
+                stats.prompt_tokens.observe(prompt_tokens)
+            if completion_tokens is not None:
+                stats.completion_tokens_total += completion_tokens
+                stats.completion_tokens.observe(completion_tokens)
+
+    def snapshot(self):
+        """返回 {模型: 统计信息} 的字典副本"""
+        with self._lock:
+            return {model: stats.snapshot() for model, stats in self._models.items()}
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+
+# 进程内全局统计实例
+llm_stats = LLMCallStats()
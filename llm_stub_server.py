@@ -0,0 +1,267 @@
+# llm_stub_server.py
+# 本地 OpenAI 兼容的大模型替身服务，用于在没有网络、不调用 DashScope 的情况下对
+# PaperRankerByIF、QuestionAnswerer 以及 /api/get_paper_summary 做压测。
+#
+# 用法：
+#   python llm_stub_server.py --port 8001 --latency lognormal:6.0,0.5 --error-rate 0.02
+#   LLM_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+#
+# 返回内容是确定性的：同一个期刊名永远得到同一个影响因子，同一段论文内容永远得到同一段总结。
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, request, jsonify, Response
+from werkzeug.serving import make_server
+
+from prompt_builder import count_tokens
+from log_config import get_logger
+
+stub_logger = get_logger('llm_stub')
+
+_JOURNAL_RE = re.compile(r"期刊[‘'\"](.+?)[’'\"]")
+
+
+class LatencyModel:
+    """
+    响应延迟分布（毫秒），由字符串描述：
+        fixed:200            固定 200ms
+        uniform:100,500      100~500ms 均匀分布
+        normal:300,50        均值 300ms、标准差 50ms 的正态分布（截断到 0 以上）
+        lognormal:6.0,0.5    对数正态分布，参数为 ln(ms) 的均值与标准差，适合模拟长尾
+    """
+
+    def __init__(self, spec='fixed:0', seed=None):
+        self.spec = spec
+        kind, _, params = spec.partition(':')
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(',') if p.strip()] if params else []
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"不支持的延迟分布: {spec}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_ms(self):
+        with self._lock:
+            if self.kind == 'fixed':
+                return self.params[0] if self.params else 0.0
+            if self.kind == 'uniform':
+                return self._rng.uniform(self.params[0], self.params[1])
+            if self.kind == 'normal':
+                return max(0.0, self._rng.gauss(self.params[0], self.params[1]))
+            return math.exp(self._rng.gauss(self.params[0], self.params[1]))
+
+
+class StubConfig:
+    """替身服务的运行参数"""
+
+    def __init__(self, latency='fixed:0', error_rate=0.0, error_status=500, seed=None,
+                 summary_sentences=6, stream_chunk_chars=16):
+        self.latency = latency if isinstance(latency, LatencyModel) else LatencyModel(latency, seed)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.summary_sentences = summary_sentences
+        self.stream_chunk_chars = stream_chunk_chars
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def should_fail(self):
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+def _digest(text):
+    return int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
+
+
+def deterministic_impact_factor(journal_name):
+    """根据期刊名生成确定性的影响因子（0.5 ~ 50.0）"""
+    return round(0.5 + (_digest(journal_name.strip().lower()) % 49500) / 1000, 3)
+
+
+def deterministic_summary(paper_text, sentences=6):
+    """根据论文内容生成确定性的总结文本"""
+    seed = _digest(paper_text)
+    templates = [
+        "这项研究聚焦于论文提出的核心问题 📚",
+        "研究人员设计了严谨的实验方案并收集了样本数据 🔬",
+        "结果显示，主要指标出现了显著差异 📈",
+        "进一步分析发现，多个因素共同影响了研究结论 🧩",
+        "作者强调，这些发现为后续临床实践提供了参考 🏥",
+        "不过，研究仍需要更大规模的验证 🙂",
+    ]
+    lines = [f"{templates[(seed >> (i * 3)) % len(templates)]}（#{(seed >> (i * 7)) % 1000}）"
+             for i in range(sentences)]
+    return "\n".join(lines)
+
+
+def _message_text(message):
+    content = message.get('content', '')
+    if isinstance(content, list):
+        return ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content or ''
+
+
+def build_answer(messages, config):
+    """根据请求内容决定返回影响因子还是总结"""
+    user_text = '\n'.join(_message_text(m) for m in messages if m.get('role') == 'user')
+    match = _JOURNAL_RE.search(user_text)
+    if match and '影响因子' in user_text:
+        return str(deterministic_impact_factor(match.group(1)))
+    return deterministic_summary(user_text, config.summary_sentences)
+
+
+def create_stub_app(config=None):
+    """创建替身服务的 Flask 应用"""
+    config = config or StubConfig()
+    stub_app = Flask(__name__)
+    stub_app.config['STUB_CONFIG'] = config
+    counters = {'requests': 0, 'errors': 0, 'streams': 0}
+    counters_lock = threading.Lock()
+
+    def _count(key):
+        with counters_lock:
+            counters[key] += 1
+
+    def _error_response(status):
+        error_type = 'rate_limit_error' if status == 429 else 'server_error'
+        return jsonify({'error': {'message': f'injected {status} error', 'type': error_type}}), status
+
+    @stub_app.route('/v1/chat/completions', methods=['POST'])
+    @stub_app.route('/compatible-mode/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        _count('requests')
+        body = request.get_json(silent=True) or {}
+        messages = body.get('messages') or []
+        model = body.get('model', 'stub-model')
+
+        # 延迟注入
+        time.sleep(config.latency.sample_ms() / 1000)
+
+        # 错误注入：请求头强制指定，或按错误率随机
+        forced_status = request.headers.get('X-Stub-Error')
+        if forced_status or config.should_fail():
+            _count('errors')
+            return _error_response(int(forced_status or config.error_status))
+
+        answer = build_answer(messages, config)
+        prompt_tokens = sum(count_tokens(_message_text(m)) + 4 for m in messages)
+        completion_tokens = count_tokens(answer)
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if body.get('stream'):
+            _count('streams')
+            include_usage = bool((body.get('stream_options') or {}).get('include_usage'))
+            return Response(_stream_chunks(completion_id, created, model, answer, usage, include_usage,
+                                           config.stream_chunk_chars),
+                            mimetype='text/event-stream')
+
+        return jsonify({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': answer},
+                'finish_reason': 'stop'
+            }],
+            'usage': usage
+        })
+
+    @stub_app.route('/v1/models', methods=['GET'])
+    @stub_app.route('/compatible-mode/v1/models', methods=['GET'])
+    def list_models():
+        return jsonify({'object': 'list', 'data': [
+            {'id': 'qwen-max', 'object': 'model', 'owned_by': 'stub'},
+            {'id': 'deepseek-v3', 'object': 'model', 'owned_by': 'stub'}
+        ]})
+
+    @stub_app.route('/stub/stats', methods=['GET'])
+    def stub_stats():
+        with counters_lock:
+            return jsonify(dict(counters, latency=config.latency.spec, error_rate=config.error_rate))
+
+    return stub_app
+
+
+def _stream_chunks(completion_id, created, model, answer, usage, include_usage, chunk_chars):
+    """按 OpenAI SSE 格式逐段返回回答"""
+    def chunk(delta, finish_reason=None, chunk_usage=None):
+        payload = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': created,
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}] if delta is not None else [],
+        }
+        if chunk_usage is not None:
+            payload['usage'] = chunk_usage
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    yield chunk({'role': 'assistant', 'content': ''})
+    for start in range(0, len(answer), chunk_chars):
+        yield chunk({'content': answer[start:start + chunk_chars]})
+    yield chunk({}, finish_reason='stop')
+    if include_usage:
+        yield chunk(None, chunk_usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+class StubServerThread(threading.Thread):
+    """在后台线程中运行替身服务，供压测脚本在同一进程内启动/停止"""
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        super().__init__(daemon=True)
+        self.server = make_server(host, port, create_stub_app(config), threaded=True)
+        self.host = host
+        self.port = self.server.server_port
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    def run(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def run_stub_in_thread(host='127.0.0.1', port=0, config=None):
+    """启动后台替身服务并返回线程对象，base_url 属性可直接赋给 AnswerAPI.BASE_URL"""
+    server_thread = StubServerThread(host, port, config)
+    server_thread.start()
+    stub_logger.info(f"LLM 替身服务已启动: {server_thread.base_url}")
+    return server_thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地 OpenAI 兼容的大模型替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', default='fixed:0', help='延迟分布，如 fixed:200 / uniform:100,500 / lognormal:6.0,0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回错误的比例 (0~1)')
+    parser.add_argument('--error-status', type=int, default=500, help='注入错误时返回的 HTTP 状态码')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子，用于复现延迟与错误序列')
+    args = parser.parse_args()
+
+    stub_config = StubConfig(latency=args.latency, error_rate=args.error_rate,
+                             error_status=args.error_status, seed=args.seed)
+    stub_logger.info(f"LLM 替身服务启动: http://{args.host}:{args.port}/v1, 延迟: {args.latency}, 错误率: {args.error_rate}")
+    create_stub_app(stub_config).run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,346 @@
+# load_test.py
+# 端到端压测：在本地启动全部外部服务替身（fake_services.py）与一个指向它们的 app.py 进程，
+# 按设定的并发数回放混合流量，统计各接口的吞吐量与 p50/p95/p99 延迟。
+# 每个虚拟用户循环执行以下动作之一（按 --mix 的权重抽取）：
+#   search   用随机的中文主题/关键词检索，偶尔用游标翻下一页；
+#   summary  点开自己检索到的一篇论文查看总结；
+#   images   为一篇论文提交图片生成任务并轮询到完成，额外统计任务从提交到完成的时间（image_job）。
+# 外部服务的延迟分布与错误率可调，便于复现慢上游或上游故障时的表现。
+#
+# 用法：
+#   python load_test.py --concurrency 16 --duration 60
+#   python load_test.py --concurrency 32 --requests 2000 --mix search=2,summary=5,images=1 --llm-latency lognormal:7,0.6
+#   python load_test.py --workers 4 --threads 8      # 使用 gunicorn 多进程启动 app（需要安装 gunicorn）
+#   python load_test.py --app-url http://127.0.0.1:5000 --concurrency 8   # 压测已启动的 app（需自行指向替身服务）
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from fake_services import TRANSLATIONS, add_latency_arguments, config_from_args, run_fake_services_in_thread, \
+    service_env
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = 'search=2,summary=5,images=1'
+# 检索时的年份范围（替身论文的年份在 2015~2024 之间）
+YEAR_CHOICES = ((2010, 2025), (2015, 2025), (2018, 2025), (2020, 2024))
+# 检索后继续翻页的概率
+NEXT_PAGE_PROBABILITY = 0.3
+# 图片任务的轮询间隔与超时（秒）
+JOB_POLL_INTERVAL = 0.5
+JOB_TIMEOUT = 120
+REQUEST_TIMEOUT = 180
+APP_START_TIMEOUT = 60
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadStats:
+    """按接口记录每次请求的延迟与状态码"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, endpoint, latency_ms, status):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency_ms)
+            self.statuses.setdefault(endpoint, Counter())[str(status)] += 1
+
+    def report(self, elapsed_s):
+        """返回 {接口: {count, rps, p50_ms, p95_ms, p99_ms, max_ms, statuses}}"""
+        with self._lock:
+            items = [(endpoint, sorted(values), dict(self.statuses[endpoint]))
+                     for endpoint, values in self.latencies.items()]
+        report = {}
+        for endpoint, values, statuses in sorted(items):
+            report[endpoint] = {
+                'count': len(values),
+                'rps': round(len(values) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+                'p50_ms': round(percentile(values, 50), 1),
+                'p95_ms': round(percentile(values, 95), 1),
+                'p99_ms': round(percentile(values, 99), 1),
+                'max_ms': round(values[-1], 1),
+                'statuses': statuses,
+            }
+        return report
+
+
+def parse_mix(spec):
+    """解析 'search=2,summary=5,images=1' 为 [(动作, 权重), ...]"""
+    mix = []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('search', 'summary', 'images'):
+            raise ValueError(f"未知的流量类型: {name}")
+        mix.append((name, float(weight or 1)))
+    if not any(weight > 0 for _, weight in mix):
+        raise ValueError(f"流量权重全为 0: {spec}")
+    return mix
+
+
+class VirtualUser:
+    """一个模拟用户：持有自己的会话，记住检索到的论文，供后续点开总结与生成图片"""
+
+    def __init__(self, user_id, app_url, stats, mix, rng, think_time_s=0.0):
+        self.user_id = user_id
+        self.app_url = app_url.rstrip('/')
+        self.stats = stats
+        self.actions = [name for name, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.rng = rng
+        self.think_time_s = think_time_s
+        self.session = requests.Session()
+        self.pmids = []
+
+    def _call(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.app_url + path, timeout=REQUEST_TIMEOUT, **kwargs)
+            status = response.status_code
+        except requests.exceptions.RequestException as e:
+            response, status = None, type(e).__name__
+        self.stats.record(endpoint, (time.perf_counter() - start) * 1000, status)
+        return response
+
+    @staticmethod
+    def _json(response):
+        if response is None or response.status_code >= 400:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def search(self):
+        terms = list(TRANSLATIONS)
+        year_start, year_end = self.rng.choice(YEAR_CHOICES)
+        payload = {
+            'theme': self.rng.choice(terms),
+            'key1': self.rng.choice(terms) if self.rng.random() < 0.7 else '',
+            'key2': '',
+            'start_year': year_start,
+            'end_year': year_end,
+        }
+        data = self._json(self._call('search', 'POST', '/api/search', json=payload))
+        if not data or 'papers' not in data:
+            return
+        self.pmids = [paper['pmid'] for paper in data['papers'] if paper.get('pmid')]
+        if data.get('next_cursor') and self.rng.random() < NEXT_PAGE_PROBABILITY:
+            next_data = self._json(self._call('search_next', 'POST', '/api/search/next',
+                                              json={'cursor': data['next_cursor']}))
+            if next_data:
+                self.pmids += [paper['pmid'] for paper in next_data.get('papers', []) if paper.get('pmid')]
+
+    def summary(self):
+        if not self.pmids:
+            return self.search()
+        self._call('summary', 'POST', '/api/get_paper_summary', json={'pmid': self.rng.choice(self.pmids)})
+
+    def images(self):
+        if not self.pmids:
+            return self.search()
+        start = time.perf_counter()
+        data = self._json(self._call('generate_images', 'POST', '/api/generate_images',
+                                     json={'pmid': self.rng.choice(self.pmids)}))
+        if not data or 'job_id' not in data:
+            return
+        status = 'timeout'
+        while time.perf_counter() - start < JOB_TIMEOUT:
+            time.sleep(JOB_POLL_INTERVAL)
+            job = self._json(self._call('job_status', 'GET', f"/api/jobs/{data['job_id']}"))
+            if job and job.get('status') in ('completed', 'failed'):
+                status = job['status']
+                break
+        self.stats.record('image_job', (time.perf_counter() - start) * 1000, status)
+
+    def run(self, stop_event, budget):
+        while not stop_event.is_set() and budget.take():
+            action = self.rng.choices(self.actions, self.weights)[0]
+            getattr(self, action)()
+            if self.think_time_s:
+                stop_event.wait(self.rng.expovariate(1 / self.think_time_s))
+        self.session.close()
+
+
+class RequestBudget:
+    """--requests 模式下所有用户共享的动作配额，None 表示不限"""
+
+    def __init__(self, total=None):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def prepare_workdir(workdir):
+    """app 的工作目录：首页与术语表用符号链接，static 复制一份（运行时会写入图片）"""
+    for name in ('index.html', 'images.html', 'data'):
+        source = os.path.join(APP_DIR, name)
+        if os.path.exists(source):
+            os.symlink(source, os.path.join(workdir, name))
+    static_dir = os.path.join(APP_DIR, 'static')
+    if os.path.isdir(static_dir):
+        shutil.copytree(static_dir, os.path.join(workdir, 'static'))
+
+
+def start_app(host, port, env, workdir, workers, threads):
+    """启动 app 进程：workers > 1 时使用 gunicorn，否则使用 Flask 多线程服务器。标准错误写入工作目录的 app.stderr"""
+    stderr = open(os.path.join(workdir, 'app.stderr'), 'wb')
+    if workers > 1:
+        if shutil.which('gunicorn') is None:
+            print("未安装 gunicorn，改用单进程 Flask 服务器")
+        else:
+            command = ['gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', str(threads),
+                       '-b', f"{host}:{port}", '--timeout', str(REQUEST_TIMEOUT), 'app:create_app()']
+            return subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+    script = f"import app; app.create_app().run(host={host!r}, port={port}, threaded=True)"
+    return subprocess.Popen([sys.executable, '-c', script], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=stderr)
+
+
+def wait_until_ready(app_url, process, workdir=None, timeout=APP_START_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            with open(os.path.join(workdir, 'app.stderr'), encoding='utf-8', errors='replace') as f:
+                raise RuntimeError(f"app 进程启动失败:\n{f.read()[-4000:]}")
+        try:
+            if requests.get(app_url + '/', timeout=2).status_code == 200:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"app 在 {timeout} 秒内未就绪: {app_url}")
+
+
+def run_load(app_url, args):
+    """按参数回放流量，返回 (统计对象, 实际耗时秒)"""
+    stats = LoadStats()
+    mix = parse_mix(args.mix)
+    seed_rng = random.Random(args.seed)
+    stop_event = threading.Event()
+    budget = RequestBudget(args.requests)
+    users = [VirtualUser(i, app_url, stats, mix, random.Random(seed_rng.random()), args.think_time)
+             for i in range(args.concurrency)]
+    threads = [threading.Thread(target=user.run, args=(stop_event, budget), name=f'vu-{user.user_id}', daemon=True)
+               for user in users]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        if args.ramp_up:
+            time.sleep(args.ramp_up / args.concurrency)
+    if args.requests is None:
+        stop_event.wait(max(0.0, args.duration - (time.perf_counter() - start)))
+        stop_event.set()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - start
+
+
+def print_report(report, elapsed_s, upstream):
+    print(f"\n压测耗时 {elapsed_s:.1f} 秒")
+    print(f"{'接口':<18}{'请求数':>8}{'吞吐(rps)':>11}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}  状态")
+    for endpoint, entry in report.items():
+        statuses = ' '.join(f"{status}:{count}" for status, count in sorted(entry['statuses'].items()))
+        print(f"{endpoint:<18}{entry['count']:>8}{entry['rps']:>11.2f}{entry['p50_ms']:>10.1f}"
+              f"{entry['p95_ms']:>10.1f}{entry['p99_ms']:>10.1f}{entry['max_ms']:>10.1f}  {statuses}")
+    if upstream:
+        print("外部服务替身收到的请求: " + ', '.join(f"{name}={value}" for name, value in upstream.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='使用本地外部服务替身对 app.py 做端到端压测')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发虚拟用户数')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--requests', type=int, default=None, help='总动作数，设置后忽略 --duration')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='流量配比，如 search=2,summary=5,images=1')
+    parser.add_argument('--think-time', type=float, default=0.0, help='用户两次动作之间的平均间隔（秒，指数分布）')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='在多少秒内逐个启动全部用户')
+    parser.add_argument('--workers', type=int, default=1, help='app 进程数（>1 时使用 gunicorn）')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn 每个进程的线程数')
+    parser.add_argument('--app-url', default=None, help='压测已启动的 app，不再启动替身服务与 app 进程')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    # 替身服务的逐条访问日志会淹没压测输出
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    fakes = process = workdir = None
+    upstream = {}
+    try:
+        if args.app_url:
+            app_url = args.app_url.rstrip('/')
+        else:
+            fakes = run_fake_services_in_thread(args.host, 0, config_from_args(args))
+            port = _free_port(args.host)
+            app_url = f"http://{args.host}:{port}"
+            env = dict(os.environ, **service_env(fakes.base_url))
+            env['PYTHONPATH'] = APP_DIR + os.pathsep + env.get('PYTHONPATH', '')
+            env['LOG_CONSOLE'] = '0'
+            env['NO_PROXY'] = env['no_proxy'] = '127.0.0.1,localhost'
+            workdir = tempfile.mkdtemp(prefix='load_test_')
+            prepare_workdir(workdir)
+            process = start_app(args.host, port, env, workdir, args.workers, args.threads)
+        wait_until_ready(app_url, process, workdir)
+
+        stats, elapsed_s = run_load(app_url, args)
+        report = stats.report(elapsed_s)
+        if fakes is not None:
+            upstream = requests.get(fakes.base_url + '/fake/stats', timeout=5).json()
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if fakes is not None:
+            fakes.stop()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps({'elapsed_s': round(elapsed_s, 2), 'concurrency': args.concurrency, 'mix': args.mix,
+                          'endpoints': report, 'upstream': upstream}, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, elapsed_s, upstream)
+
+
+if __name__ == '__main__':
+    main()
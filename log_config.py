@@ -0,0 +1,224 @@
+# log_config.py
+# 统一的日志配置：各模块通过 get_logger(名称, 文件名) 获取 logger，不再各自创建 FileHandler。
+#   - 请求线程只把日志记录放入内存队列（QueueHandler），写文件与控制台输出由后台 QueueListener 线程完成；
+#   - 日志文件为每行一个 JSON 对象（时间、级别、logger、消息、请求ID、线程、异常），便于检索与统计；
+#   - 后台线程在第一条日志记录到达时才启动，导入模块本身不创建目录、文件或线程；
+#   - logger 默认级别为 INFO，logger.debug() 在格式化之前就被跳过；设置 LOG_LEVEL=DEBUG 后，
+#     DEBUG 级别的逐条明细（完整请求参数、每个词条的翻译、每个期刊的IF等）按请求抽样记录，
+#     未抽中的请求在放入队列之前就被丢弃。
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_DIR = 'log'
+# 日志文件格式：'json' 每行一个 JSON 对象；'text' 为原来的纯文本格式
+LOG_FILE_FORMAT = os.environ.get('LOG_FILE_FORMAT', 'json')
+# logger 的默认级别；设为 DEBUG 时才会记录（抽样的）DEBUG 明细
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 是否同时输出到控制台
+LOG_CONSOLE = os.environ.get('LOG_CONSOLE', '1') != '0'
+# 记录 DEBUG 明细的请求比例（0~1）；请求之外（启动、后台线程）的 DEBUG 日志按同样比例逐条抽样
+DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
+# 队列容量，队列满时丢弃新记录（计入 dropped）而不是阻塞请求线程
+LOG_QUEUE_SIZE = 50000
+
+TEXT_FORMAT = '%(asctime)s.%(msecs)03d - %(levelname)s - %(message)s'
+TEXT_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+# 当前请求的ID与是否抽中记录 DEBUG 明细
+_request_id = contextvars.ContextVar('log_request_id', default=None)
+_debug_sampled = contextvars.ContextVar('log_debug_sampled', default=None)
+
+
+def begin_request(request_id=None, sample_debug=None):
+    """
+    标记一个请求开始：设置请求ID，并决定本次请求是否记录 DEBUG 明细。
+    sample_debug 为 None 时按 DEBUG_SAMPLE_RATE 随机抽样。返回请求ID。
+    """
+    request_id = request_id or uuid.uuid4().hex[:16]
+    if sample_debug is None:
+        sample_debug = random.random() < DEBUG_SAMPLE_RATE
+    _request_id.set(request_id)
+    _debug_sampled.set(sample_debug)
+    return request_id
+
+
+def end_request():
+    _request_id.set(None)
+    _debug_sampled.set(None)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为单行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'thread': record.threadName,
+            'module': record.module,
+            'line': record.lineno,
+        }
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _RequestQueueHandler(QueueHandler):
+    """
+    放入队列前：附加请求ID、丢弃未抽中的 DEBUG 记录，并在请求线程中完成消息格式化，
+    避免把不可序列化或之后会被修改的参数对象交给后台线程。
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG:
+            sampled = _debug_sampled.get()
+            if sampled is None:
+                sampled = random.random() < DEBUG_SAMPLE_RATE
+            if not sampled:
+                return False
+        record.request_id = _request_id.get()
+        return super().filter(record)
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if _listener is None:
+            _start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LazyFileHandler(logging.FileHandler):
+    """首次写入时才创建日志目录（路径在 get_logger 时已按当时的工作目录确定）"""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class _RoutingHandler(logging.Handler):
+    """后台线程中按 logger 名称把记录写到各自的日志文件"""
+
+    def __init__(self):
+        super().__init__()
+        self._files = {}
+        self._routes = {}
+
+    def add_route(self, logger_name, filename):
+        path = os.path.join(LOG_DIR, filename)
+        if path not in self._files:
+            handler = _LazyFileHandler(path, encoding='utf-8', delay=True)
+            if LOG_FILE_FORMAT == 'json':
+                handler.setFormatter(JsonFormatter())
+            else:
+                handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATEFMT))
+            self._files[path] = handler
+        self._routes[logger_name] = self._files[path]
+
+    def emit(self, record):
+        handler = self._routes.get(record.name)
+        if handler is not None:
+            handler.handle(record)
+
+    def flush(self):
+        for handler in self._files.values():
+            handler.flush()
+
+    def close(self):
+        for handler in self._files.values():
+            handler.close()
+        super().close()
+
+
+_lock = threading.Lock()
+_queue = queue.Queue(LOG_QUEUE_SIZE)
+_queue_handler = _RequestQueueHandler(_queue)
+_routing_handler = _RoutingHandler()
+_listener = None
+_closed = False
+
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is not None or _closed:
+            return
+        _listener = _create_listener()
+        _listener.start()
+    atexit.register(shutdown)
+
+
+def _create_listener():
+    handlers = [_routing_handler]
+    if LOG_CONSOLE:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATEFMT))
+        handlers.append(console_handler)
+    return QueueListener(_queue, *handlers)
+
+
+def shutdown():
+    """停止后台线程并写出队列中剩余的日志（进程退出时自动调用）"""
+    global _listener, _closed
+    with _lock:
+        listener, _listener = _listener, None
+        _closed = True
+    if listener is not None:
+        listener.stop()
+        _routing_handler.close()
+        if _queue_handler.dropped:
+            sys.stderr.write(f"日志队列已满，共丢弃 {_queue_handler.dropped} 条记录\n")
+
+
+def dropped_records():
+    """返回因队列已满而丢弃的日志记录数"""
+    return _queue_handler.dropped
+
+
+def get_logger(name, filename=None, level=None):
+    """
+    返回配置好的 logger：记录经队列由后台线程写入 log/<filename>（filename 为 None 时只输出到控制台）。
+    level 默认取 LOG_LEVEL。
+    同一名称重复调用是安全的；多个模块共用一个 logger 名称时，日志写到同一个文件。
+    """
+    logger = logging.getLogger(name)
+    with _lock:
+        if filename:
+            _routing_handler.add_route(name, filename)
+        if _queue_handler not in logger.handlers:
+            logger.handlers.clear()
+            logger.addHandler(_queue_handler)
+            logger.setLevel(level or LOG_LEVEL)
+            logger.propagate = False
+    return logger
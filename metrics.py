@@ -0,0 +1,158 @@
+# metrics.py
+# 进程内指标，供 /metrics 以 Prometheus 文本格式导出：
+#   - 每个接口的请求计数（按状态码）、耗时直方图与进行中的请求数；
+#   - 检索流水线各阶段（翻译、esearch、efetch、XML解析、IF查询、排序）以及总结、截图、AI插图的耗时直方图；
+#   - 各缓存的命中率、进行中的合并任务数等在抓取时由注册的回调函数现场读取。
+# 记录一次观测只需一次加锁和一次二分查找，可以在生产环境常开。
+
+import threading
+import time
+from contextlib import contextmanager
+
+from llm_stats import Histogram
+
+# 耗时直方图分桶上界（秒）
+DURATION_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUESTS_TOTAL = 'http_requests_total'
+HTTP_REQUEST_DURATION = 'http_request_duration_seconds'
+HTTP_REQUESTS_IN_FLIGHT = 'http_requests_in_flight'
+STAGE_DURATION = 'pipeline_stage_duration_seconds'
+
+_HELP = {
+    HTTP_REQUESTS_TOTAL: ('counter', '按接口、方法与状态码统计的请求数'),
+    HTTP_REQUEST_DURATION: ('histogram', '按接口统计的请求处理耗时（秒）'),
+    HTTP_REQUESTS_IN_FLIGHT: ('gauge', '按接口统计的正在处理的请求数'),
+    STAGE_DURATION: ('histogram', '检索流水线各阶段及总结、截图、AI插图的耗时（秒）'),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    线程安全的计数器、仪表与直方图集合。标签以 dict 传入，内部按排序后的元组保存。
+    """
+
+    def __init__(self, duration_buckets=DURATION_BUCKETS_S):
+        self.duration_buckets = tuple(duration_buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+        self._help = dict(_HELP)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def describe(self, name, metric_type, help_text):
+        self._help[name] = (metric_type, help_text)
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge_add(self, name, labels=None, delta=1):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name, labels, value):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.duration_buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def time_stage(self, stage):
+        """记录代码块耗时到 pipeline_stage_duration_seconds{stage=...}（异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_DURATION, {'stage': stage}, time.perf_counter() - start)
+
+    def observe_timings(self, timings):
+        """记录 StageTimer.report() 返回的各阶段耗时"""
+        for stage, entry in (timings or {}).items():
+            if isinstance(entry, dict) and 'duration_ms' in entry:
+                self.observe(STAGE_DURATION, {'stage': stage}, entry['duration_ms'] / 1000)
+
+    def register_collector(self, collector):
+        """
+        注册抓取时调用的回调，回调返回 [(指标名, 类型, 说明, 标签 dict, 数值), ...]。
+        用于缓存命中数、队列长度等已在其他对象中维护的数据，平时不产生额外开销。重复注册同一回调只保留一个。
+        """
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self):
+        """返回 Prometheus 文本格式（version 0.0.4）"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(h.counts), h.count, h.total) for key, h in self._histograms.items()}
+
+        samples = {}
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), value in gauges.items():
+            samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), (counts, count, total) in histograms.items():
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, bucket_count in zip(self.duration_buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", _format_value(bound)))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(float(total))}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        help_texts = dict(self._help)
+        for collector in list(self._collectors):
+            for name, metric_type, help_text, labels, value in collector():
+                help_texts.setdefault(name, (metric_type, help_text))
+                key_labels = tuple(sorted((labels or {}).items()))
+                samples.setdefault(name, []).append(f'{name}{_format_labels(key_labels)} {_format_value(value)}')
+
+        output = []
+        for name in sorted(samples):
+            metric_type, help_text = help_texts.get(name, ('untyped', ''))
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(sorted(samples[name]) if metric_type != 'histogram' else samples[name])
+        return '\n'.join(output) + '\n'
+
+
+def cache_samples(cache_name, hits, misses):
+    """把缓存的命中/未命中数转换为 cache_hits_total、cache_misses_total 与 cache_hit_ratio 三个样本"""
+    labels = {'cache': cache_name}
+    total = hits + misses
+    return [
+        ('cache_hits_total', 'counter', '缓存命中次数', labels, hits),
+        ('cache_misses_total', 'counter', '缓存未命中次数', labels, misses),
+        ('cache_hit_ratio', 'gauge', '缓存命中率（自进程启动以来）', labels, round(hits / total, 4) if total else 0),
+    ]
+
+
+# 进程内全局指标
+metrics = MetricsRegistry()
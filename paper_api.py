@@ -1,42 +1,15 @@
+import os
 import requests
 import xml.etree.ElementTree as ET
-import openpyxl
-import logging
-import os
-
-log_dir = 'log'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-def setup_logger():
-    logger = logging.getLogger('pubmed_search')
-    logger.setLevel(logging.INFO)
-
-    logger.handlers.clear()
-
-    file_handler = logging.FileHandler(
-        filename='log/paper_search.log',
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.INFO)
-
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+from log_config import get_logger
+from deadline import timeout_for
 
-    return logger
+logger = get_logger('pubmed_search', 'paper_search.log')
 
-logger = setup_logger()
+# NCBI E-utilities 地址，压测时可指向本地替身服务（fake_services.py）
+NCBI_EUTILS_URL = os.environ.get('NCBI_EUTILS_URL', 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils')
+# 单次 esearch/efetch 请求的超时上限（秒），请求设定了截止时间时取两者中较小的一个
+PUBMED_TIMEOUT = 15
 
 
 class PubMedSearcher:
@@ -48,7 +21,7 @@ class PubMedSearcher:
         self.year_end = year_end
 
     def search_pubmed(self):
-        url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+        url = f"{NCBI_EUTILS_URL}/esearch.fcgi"
         params = {
             "db": "pubmed",
             "term": self.query,
@@ -58,7 +31,7 @@ class PubMedSearcher:
         }
         try:
             logger.info(f"开始 PubMed 搜索: {self.query}")
-            r = requests.get(url, params=params)
+            r = requests.get(url, params=params, timeout=timeout_for(PUBMED_TIMEOUT, 'PubMed 搜索'))
             r.raise_for_status()
             data = r.json()
             pmid_list = data['esearchresult']['idlist']
@@ -69,7 +42,7 @@ class PubMedSearcher:
             return []
 
     def fetch_details(self, pmids):
-        url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+        url = f"{NCBI_EUTILS_URL}/efetch.fcgi"
         params = {
             "db": "pubmed",
             "id": ",".join(pmids),
@@ -78,7 +51,7 @@ class PubMedSearcher:
         }
         try:
             logger.info(f"开始获取 {len(pmids)} 篇文章的详细信息")
-            r = requests.get(url, params=params)
+            r = requests.get(url, params=params, timeout=timeout_for(PUBMED_TIMEOUT, '获取文章详情'))
             r.raise_for_status()
             logger.info(f"成功获取文章详情")
             return r.text
@@ -136,6 +109,7 @@ class PubMedSearcher:
                     authors.append(lastname)
 
             paper_info = {
+                'pmid': pmid,
                 'title': title,
                 'url': url,
                 'abstract': abstract,
@@ -168,6 +142,8 @@ class PubMedSearcher:
     def save_to_excel(self, papers, filename="pubmed_results.xlsx"):
         try:
             logger.info(f"开始保存 {len(papers)} 篇文章到 Excel 文件: {filename}")
+            # openpyxl 只在导出 Excel 时导入
+            import openpyxl
             wb = openpyxl.Workbook()
             ws = wb.active
             ws.title = "PubMed Results"
@@ -0,0 +1,207 @@
+# paper_store.py
+# 服务端论文缓存：检索得到的论文记录按 PMID 保存在 SQLite（cache/papers.db）中，容量有上限并按 TTL 过期，
+# gunicorn 的多个 worker 进程共享同一份数据，总结、图片请求落到任意进程都能查到论文。
+# 总结、图片等后续接口只需要前端传 PMID，由服务端查出标题与摘要，
+# 既减少请求体积，也避免客户端把任意文本注入大模型提示词。
+# SearchSessionStore 保存每次检索排序后的完整结果，供 /api/search/next 按游标分页，同样保存在该数据库中。
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+PAPER_DB_PATH = os.path.join('cache', 'papers.db')
+# 最多保存的论文条数与每条记录的存活时间（秒）
+PAPER_STORE_MAX_SIZE = 5000
+PAPER_STORE_TTL = 2 * 3600
+
+
+class PaperStore:
+    """
+    按 PMID 保存论文记录的 LRU 缓存，带过期时间，保存在 SQLite 中，多个 worker 进程可共享。
+    命中/未命中计数只统计本进程。
+    """
+
+    def __init__(self, db_path=PAPER_DB_PATH, max_size=PAPER_STORE_MAX_SIZE, ttl=PAPER_STORE_TTL):
+        """
+        Args:
+            db_path (str): 数据库路径
+            max_size (int): 最多保存的论文条数，超出时淘汰最久未使用的记录
+            ttl (float): 记录的存活时间（秒），从最近一次写入开始计算
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS papers ('
+                'pmid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_papers_access ON papers (last_access)')
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def put(self, pmid, paper):
+        """保存一篇论文记录（dict），PMID 为空时忽略"""
+        self.put_many([dict(paper, pmid=pmid)])
+
+    def put_many(self, papers):
+        """批量保存论文记录（在一个事务中写入），记录中需包含 'pmid' 字段，PMID 为空的记录忽略"""
+        now = time.time()
+        rows = []
+        for paper in papers:
+            pmid = str(paper.get('pmid') or '').strip()
+            if pmid:
+                rows.append((pmid, json.dumps(paper, ensure_ascii=False), now + self.ttl, now))
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO papers (pmid, data, expires_at, last_access) VALUES (?, ?, ?, ?)', rows
+            )
+            conn.execute('DELETE FROM papers WHERE expires_at < ?', (now,))
+            # 超出容量时淘汰最久未使用的记录
+            conn.execute(
+                'DELETE FROM papers WHERE pmid IN '
+                '(SELECT pmid FROM papers ORDER BY last_access DESC LIMIT -1 OFFSET ?)', (self.max_size,)
+            )
+
+    def get(self, pmid):
+        """返回论文记录，不存在或已过期时返回 None"""
+        pmid = str(pmid or '').strip()
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute('SELECT data, expires_at FROM papers WHERE pmid = ?', (pmid,)).fetchone()
+            if row is not None and row[1] < now:
+                conn.execute('DELETE FROM papers WHERE pmid = ?', (pmid,))
+                row = None
+            if row is not None:
+                conn.execute('UPDATE papers SET last_access = ? WHERE pmid = ?', (now, pmid))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def purge_expired(self):
+        """删除所有过期记录，返回删除的条数"""
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM papers WHERE expires_at < ?', (time.time(),)).rowcount
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM papers WHERE expires_at >= ?', (time.time(),)).fetchone()[0]
+
+
+# 检索会话（排序后的完整结果列表）的存活时间（秒）与最多保存的会话数
+SEARCH_SESSION_TTL = 15 * 60
+SEARCH_SESSION_MAX_SIZE = 500
+
+
+class SearchSessionStore:
+    """
+    保存每次检索排序后的完整结果，供游标分页读取，不必重新访问 NCBI 或大模型。
+    结果行保存在 SQLite 中，多个 worker 进程可共享，游标可以落到任意进程。
+    游标格式为 '<会话ID>.<偏移量>'。
+    """
+
+    def __init__(self, db_path=PAPER_DB_PATH, max_size=SEARCH_SESSION_MAX_SIZE, ttl=SEARCH_SESSION_TTL):
+        """
+        Args:
+            db_path (str): 数据库路径
+            max_size (int): 最多保存的会话数，超出时淘汰最早创建的会话
+            ttl (float): 会话的存活时间（秒）
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.ttl = ttl
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS search_sessions ('
+                'session_id TEXT PRIMARY KEY, total INTEGER NOT NULL, created_at REAL NOT NULL, '
+                'expires_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS search_session_rows ('
+                'session_id TEXT NOT NULL, position INTEGER NOT NULL, data TEXT NOT NULL, '
+                'PRIMARY KEY (session_id, position))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_search_sessions_created ON search_sessions (created_at)')
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def create(self, rows):
+        """
+        保存一次检索的结果行列表，返回会话ID。
+        会话ID由结果内容决定：相同结果得到相同的游标，重新检索后客户端按 ETag 复用的旧游标仍然有效。
+        """
+        encoded = [json.dumps(row, ensure_ascii=False, sort_keys=True) for row in rows]
+        session_id = hashlib.sha256('\n'.join(encoded).encode('utf-8')).hexdigest()[:32]
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM search_session_rows WHERE session_id = ?', (session_id,))
+            conn.execute(
+                'INSERT OR REPLACE INTO search_sessions (session_id, total, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                (session_id, len(encoded), now, now + self.ttl)
+            )
+            conn.executemany('INSERT INTO search_session_rows (session_id, position, data) VALUES (?, ?, ?)',
+                             [(session_id, i, data) for i, data in enumerate(encoded)])
+            # 删除过期会话以及超出容量的最早会话
+            stale = conn.execute(
+                'SELECT session_id FROM search_sessions WHERE expires_at < ? UNION '
+                'SELECT session_id FROM (SELECT session_id FROM search_sessions '
+                'ORDER BY created_at DESC LIMIT -1 OFFSET ?)', (now, self.max_size)
+            ).fetchall()
+            if stale:
+                conn.executemany('DELETE FROM search_session_rows WHERE session_id = ?', stale)
+                conn.executemany('DELETE FROM search_sessions WHERE session_id = ?', stale)
+        return session_id
+
+    def page(self, session_id, offset, page_size):
+        """
+        返回 (本页结果, 下一页游标, 结果总数)；会话不存在或已过期时返回 None。
+        没有更多结果时下一页游标为 None。
+        """
+        offset = max(0, offset)
+        with self._connect() as conn:
+            entry = conn.execute('SELECT total, expires_at FROM search_sessions WHERE session_id = ?',
+                                 (session_id,)).fetchone()
+            if entry is None or entry[1] < time.time():
+                return None
+            total = entry[0]
+            rows = conn.execute(
+                'SELECT data FROM search_session_rows WHERE session_id = ? AND position >= ? '
+                'ORDER BY position LIMIT ?', (session_id, offset, page_size)
+            ).fetchall()
+        end = offset + page_size
+        next_cursor = f"{session_id}.{end}" if end < total else None
+        return [json.loads(data) for data, in rows], next_cursor, total
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """把游标解析为 (会话ID, 偏移量)，格式错误时返回 None"""
+        session_id, _, offset = str(cursor or '').partition('.')
+        # 只接受 ASCII 数字：str.isdigit() 对 '²' 等字符也返回 True，int() 随后会抛出 ValueError
+        if not session_id or not re.fullmatch(r'[0-9]{1,9}', offset):
+            return None
+        return session_id, int(offset)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM search_sessions WHERE expires_at >= ?',
+                                (time.time(),)).fetchone()[0]
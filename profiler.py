@@ -0,0 +1,136 @@
+# profiler.py
+# 按需的单请求采样分析：被选中的请求在处理期间由一个后台线程定时采集调用栈（sys._current_frames），
+# 请求结束后写成 flamegraph 可直接使用的折叠栈格式（每行 "帧;帧;帧 次数"），保存到 log/profiles/。
+#   - 授权调用方通过请求头 X-Profile 或查询参数 profile 携带 PROFILE_TOKEN 开启；
+#   - 也可以设置 PROFILE_SAMPLE_EVERY 每 N 个请求自动抽样一个；
+#   - 目录中只保留最新的 PROFILE_MAX_FILES 个文件。
+# 采样不修改被分析的代码，也不需要 cProfile 的逐函数钩子，开销只落在被选中的请求上。
+# 生成火焰图：flamegraph.pl log/profiles/xxx.folded > out.svg，或直接导入 speedscope。
+
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR = os.path.join('log', 'profiles')
+# 开启分析的口令，为空时不接受请求头/查询参数开启
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+# 每 N 个请求抽样分析一个，0 表示不抽样
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', 0))
+# 采样间隔（秒）与保留的分析文件数
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+PROFILE_MAX_FILES = 200
+# 'request' 只采集处理请求的线程；'all' 采集进程内所有线程（线程池中的 efetch、IF查询等），栈底带线程名
+PROFILE_THREADS = os.environ.get('PROFILE_THREADS', 'request')
+
+_request_counter = itertools.count(1)
+_rotate_lock = threading.Lock()
+_SAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def should_profile(token=None):
+    """根据口令或抽样计数决定本次请求是否开启分析"""
+    if PROFILE_TOKEN and token == PROFILE_TOKEN:
+        return True
+    return PROFILE_SAMPLE_EVERY > 0 and next(_request_counter) % PROFILE_SAMPLE_EVERY == 0
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return ';'.join(stack)
+
+
+class RequestProfiler:
+    """
+    采样分析一个请求。start() 后由后台线程按 interval 采集调用栈，stop() 停止采样并写出折叠栈文件。
+    """
+
+    def __init__(self, name, interval=PROFILE_INTERVAL, threads=PROFILE_THREADS, output_dir=PROFILE_DIR,
+                 max_files=PROFILE_MAX_FILES):
+        """
+        Args:
+            name (str): 文件名的一部分，如 "api_search_<请求ID>"
+            interval (float): 采样间隔（秒）
+            threads (str): 'request' 只采集调用 start() 的线程，'all' 采集所有线程
+            output_dir (str): 分析文件目录
+            max_files (int): 目录中保留的最多文件数
+        """
+        self.interval = interval
+        self.threads = threads
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.filename = f"{time.strftime('%Y%m%d-%H%M%S')}_{_SAFE_NAME_RE.sub('_', name)[:80]}.folded"
+        self.samples = Counter()
+        self.sample_count = 0
+        self._target_ident = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_at = None
+
+    def start(self):
+        self._target_ident = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample_loop, name='request_profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.threads == 'all':
+                if len(names) != len(frames):
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident != own_ident:
+                        self.samples[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+            else:
+                frame = frames.get(self._target_ident)
+                if frame is not None:
+                    self.samples[_collapse(frame)] += 1
+            self.sample_count += 1
+
+    def stop(self):
+        """停止采样并写出文件，返回文件路径（没有采到样本时返回 None）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.samples:
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, self.filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self._rotate()
+        return path
+
+    @property
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._started_at) * 1000 if self._started_at else 0.0
+
+    def _rotate(self):
+        """只保留最新的 max_files 个分析文件"""
+        with _rotate_lock:
+            try:
+                files = [os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir)
+                         if name.endswith('.folded')]
+                files.sort(key=os.path.getmtime)
+                for old in files[:-self.max_files]:
+                    os.remove(old)
+            except OSError:
+                pass
@@ -0,0 +1,171 @@
+# prompt_builder.py
+# 该模块负责构建发送给大模型的提示词：本地估算 token 数、把过长的摘要压缩到预算内，
+# 并把固定的指令文本放在提示词最前面，便于服务端的前缀缓存（prefix caching）命中。
+
+import re
+
+from log_config import get_logger
+
+# tiktoken 编码表在首次估算 token 时加载；_ENCODING 为 False 表示尚未加载
+_ENCODING = False
+
+
+def _get_encoding():
+    global _ENCODING
+    if _ENCODING is False:
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # tiktoken 为可选依赖，缺失时使用启发式估算
+            _ENCODING = None
+    return _ENCODING
+
+# 提示词构建与大模型 token 用量（for_answer.py）共用同一个日志文件
+prompt_logger = get_logger('llm_usage', 'llm_usage.log')
+
+# 默认预算（token），可在构造 PromptBuilder 时覆盖
+SUMMARY_ABSTRACT_TOKEN_BUDGET = 900
+IMAGE_PROMPT_TOKEN_BUDGET = 300
+# 通义万相的提示词长度上限（字符）
+IMAGE_PROMPT_MAX_CHARS = 800
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+_WORD_RE = re.compile(r'[A-Za-z0-9]+|[^\sA-Za-z0-9\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+# 英文句末标点后须有空白才算句子结束，避免拆开小数（1.25）、网址（pubmed.ncbi.nlm.nih.gov）和缩写
+_SENTENCE_RE = re.compile(r'(?<=[.!?;])\s+|(?<=[。！？；])\s*')
+
+# 固定指令文本：保持逐字不变，作为 system 消息放在最前面，才能命中前缀缓存
+SUMMARY_INSTRUCTION = (
+    "请帮我对用户给出的论文进行总结，具体格式要求如下：\n"
+    "以往的研究表明，人工智能（AI）在心理治疗中的应用引起了广泛关注。然而，关于AI生成的回应与人类治疗师的回应在质量和可辨识性方面的差异，尚缺乏深入研究。\n"
+    "一项最新的研究探讨了ChatGPT在夫妻治疗情境中的表现。研究人员设计了18个夫妻治疗场景，分别由人类治疗师和ChatGPT生成回应。然后，招募了800多名参与者，对这些回应进行评估，判断其来源并评分。\n"
+    "结果显示，参与者难以区分哪些回应来自ChatGPT，哪些来自人类治疗师。此外，ChatGPT生成的回应获得的评分普遍高于人类治疗师的回应。进一步分析发现，ChatGPT的回应通常更长，包含更多的名词和形容词，提供了更丰富的上下文信息，这可能是其获得更高评分的原因之一。\n"
+    "这项研究表明，ChatGPT在心理治疗中具有潜在的应用价值。然而，作者强调，尽管AI显示出积极的前景，但在将其整合到心理健康护理中时，需要谨慎考虑伦理和实践方面的问题。专业人士应积极参与AI的发展，以确保其在受监督和负责任的环境中应用，从而提高护理质量和可及性。不过尽管如此，人不是机器，会更倾向于面对面的交流和共情，这一点也许AI永远都无法取代。\n"
+    "根据论文具体内容进行回答，不要进行联想，论文种没有提到的，不要出现，不要出现“可能”！！"
+    "可以根据具体的内容多添加一些小表情，针对研究方法部分可以再具体一些，主要发现的内容也多一些，多点娱乐性的话术，"
+    "只输出上述提到的内容，不要输出别的内容！！！不要抄写上面的内容！！！"
+)
+
+IMAGE_INSTRUCTION = (
+    "以下是一个文章的相关信息，包括题目以及摘要，请帮我生成一张相关插画；"
+    "要求符合伦理，不能出现让人反胃的画面，要符合论文主题，论文具体内容为："
+)
+
+
+def count_tokens(text):
+    """本地估算文本的 token 数（优先使用 tiktoken，否则按中日韩字符/英文单词启发式计算）"""
+    if not text:
+        return 0
+    text = str(text)
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+
+    cjk_count = len(_CJK_RE.findall(text))
+    other_count = 0
+    for word in _WORD_RE.findall(text):
+        # 英文单词大约每 4 个字符 1 个 token
+        other_count += max(1, (len(word) + 3) // 4)
+    return cjk_count + other_count
+
+
+def split_sentences(text):
+    """按中英文句末标点切分句子，保留标点"""
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+
+
+def compact_text(text, max_tokens, ellipsis=' ... '):
+    """
+    把文本压缩到 max_tokens 以内。
+
+    优先保留第一句（研究背景）和最后一句（结论），剩余预算按原文顺序填充中间句子，
+    被删去的部分用省略号标记。单句仍超出预算时按字符截断。
+    """
+    if not text:
+        return ''
+    text = re.sub(r'[ \t]+', ' ', str(text)).strip()
+    if max_tokens is None or count_tokens(text) <= max_tokens:
+        return text
+
+    sentences = split_sentences(text)
+    costs = [count_tokens(s) for s in sentences]
+    ellipsis_cost = count_tokens(ellipsis)
+
+    keep = set()
+    used = 0
+    # 第一句与最后一句优先，其余按顺序
+    order = [0] + ([len(sentences) - 1] if len(sentences) > 1 else []) + list(range(1, len(sentences) - 1))
+    for idx in order:
+        if used + costs[idx] + ellipsis_cost <= max_tokens:
+            keep.add(idx)
+            used += costs[idx] + ellipsis_cost
+
+    if not keep:
+        return _truncate_to_tokens(sentences[0], max_tokens)
+
+    pieces = []
+    previous = -1
+    for idx in sorted(keep):
+        if pieces and idx != previous + 1:
+            pieces.append(ellipsis.strip())
+        pieces.append(sentences[idx])
+        previous = idx
+    if previous != len(sentences) - 1:
+        pieces.append(ellipsis.strip())
+    return ' '.join(pieces)
+
+
+def _truncate_to_tokens(text, max_tokens):
+    """按 token 预算截断单段文本（二分查找字符位置）"""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+class PromptBuilder:
+    """
+    构建总结提示词与插画提示词的类。
+    """
+
+    def __init__(self, abstract_token_budget=SUMMARY_ABSTRACT_TOKEN_BUDGET,
+                 image_token_budget=IMAGE_PROMPT_TOKEN_BUDGET,
+                 image_max_chars=IMAGE_PROMPT_MAX_CHARS):
+        self.abstract_token_budget = abstract_token_budget
+        self.image_token_budget = image_token_budget
+        self.image_max_chars = image_max_chars
+
+    def build_summary_messages(self, paper_text):
+        """
+        返回总结任务的 messages 列表：固定指令在 system 消息中（可被前缀缓存），
+        论文内容压缩到预算后放在最后的 user 消息中。
+        """
+        paper_text = compact_text(paper_text, self.abstract_token_budget)
+        messages = [
+            {'role': 'system', 'content': SUMMARY_INSTRUCTION},
+            {'role': 'user', 'content': f"一篇论文的详细信息为：\n{paper_text}"}
+        ]
+        prompt_logger.info(
+            f"构建总结提示词完成, 预估 prompt tokens: {self.count_messages_tokens(messages)}, "
+            f"其中论文内容 tokens: {count_tokens(paper_text)}"
+        )
+        return messages
+
+    def build_image_prompt(self, paper_text):
+        """返回插画提示词：固定指令在前，论文内容压缩到预算并受字符上限约束"""
+        budget = self.image_token_budget - count_tokens(IMAGE_INSTRUCTION)
+        paper_text = compact_text(paper_text, max(budget, 0))
+        prompt = f"{IMAGE_INSTRUCTION}{paper_text}"
+        if self.image_max_chars and len(prompt) > self.image_max_chars:
+            prompt = prompt[:self.image_max_chars]
+        prompt_logger.info(f"构建插画提示词完成, 预估 tokens: {count_tokens(prompt)}, 字符数: {len(prompt)}")
+        return prompt
+
+    @staticmethod
+    def count_messages_tokens(messages):
+        """估算 messages 的 token 总数（每条消息额外计 4 个格式 token）"""
+        return sum(count_tokens(m.get('content', '')) + 4 for m in messages)
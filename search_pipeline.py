@@ -0,0 +1,242 @@
+# search_pipeline.py
+# 流水线检索：把 翻译 → esearch → efetch → 解析 → 期刊IF查询 → 排序 组织成依赖图，在一个事件循环中执行。
+#   - efetch 按 PMID 分块并发请求，先返回的块先解析；
+#   - 每解析出一个新的期刊名就立即发起该期刊的IF查询，不必等全部论文解析完；
+#   - 各阶段的开始/结束时间记录在 timings 中，端到端耗时接近关键路径而不是各阶段之和；
+#   - 请求设定了截止时间（deadline.py）时，到期后不再等待未完成的 efetch 与IF查询，
+#     用已解析的论文和已知的IF排序返回部分结果，timings['partial'] 记录被截断的阶段。
+# 阻塞的 HTTP 调用（翻译、PubMed）放在线程池中执行。
+
+import asyncio
+import contextvars
+import functools
+import time
+
+import pandas as pd
+
+from paper_api import PubMedSearcher
+from compare_IF import PaperRankerByIF
+from for_answer import AsyncAnswerAPI
+from deadline import remaining, expired
+from log_config import get_logger
+
+logger = get_logger('paper_search_app', 'paper_search_app.log')
+
+# efetch 每块的 PMID 数量与同时进行的 efetch 请求数（NCBI 带 API Key 时限制为每秒 10 次）
+EFETCH_CHUNK_SIZE = 5
+EFETCH_MAX_CONCURRENCY = 3
+# 期刊IF查询的最大并发数
+IF_MAX_CONCURRENCY = AsyncAnswerAPI.DEFAULT_MAX_CONCURRENCY
+# 截止时间前为排序与返回响应预留的时间（秒）
+RANK_RESERVE = 0.3
+
+
+def build_pubmed_query(theme, key1, key2):
+    """根据（已翻译的）主题、关键词与期刊构建 PubMed 检索式"""
+    query_parts = []
+    if theme and theme.strip():
+        query_parts.append(f'("{theme.strip()}"[Title]')
+    if key1 and key1.strip():
+        query_parts.append(f'AND "{key1.strip()}"[Title/Abstract])')
+    if key2 and key2.strip():
+        query_parts.append(f'AND "{key2.strip()}"[Journal]')
+    return " ".join(query_parts)
+
+
+class StageTimer:
+    """记录各阶段相对流水线开始时间的起止时刻（毫秒）"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.partial = []
+
+    def _now_ms(self):
+        return (time.perf_counter() - self.origin) * 1000
+
+    def start(self, stage):
+        entry = self.stages.setdefault(stage, {'start_ms': self._now_ms(), 'end_ms': None, 'calls': 0})
+        entry['calls'] += 1
+
+    def end(self, stage):
+        self.stages[stage]['end_ms'] = self._now_ms()
+
+    def mark_partial(self, stage):
+        """记录因截止时间而提前结束的阶段"""
+        if stage not in self.partial:
+            self.partial.append(stage)
+
+    def report(self):
+        """返回 {阶段: {start_ms, end_ms, duration_ms, calls}}，另含 total_ms，有阶段被截断时含 partial"""
+        report = {}
+        for stage, entry in self.stages.items():
+            end_ms = entry['end_ms'] if entry['end_ms'] is not None else self._now_ms()
+            report[stage] = {
+                'start_ms': round(entry['start_ms'], 2),
+                'end_ms': round(end_ms, 2),
+                'duration_ms': round(end_ms - entry['start_ms'], 2),
+                'calls': entry['calls']
+            }
+        report['total_ms'] = round(self._now_ms(), 2)
+        if self.partial:
+            report['partial'] = list(self.partial)
+        return report
+
+
+def _run_blocking(loop, func, *args):
+    """在默认线程池中执行阻塞调用，并带上当前的 contextvars（请求截止时间、请求ID）"""
+    return loop.run_in_executor(None, functools.partial(contextvars.copy_context().run, func, *args))
+
+
+class SearchPipeline:
+    """
+    依赖图方式执行的论文检索与IF排序。
+    """
+
+    def __init__(self, paper_key, api_key, translate_terms=None, retmax=20, efetch_chunk_size=EFETCH_CHUNK_SIZE,
+                 efetch_max_concurrency=EFETCH_MAX_CONCURRENCY, if_max_concurrency=IF_MAX_CONCURRENCY):
+        """
+        Args:
+            paper_key (str): NCBI API Key
+            api_key (str): 大模型 API Key（期刊IF查询）
+            translate_terms (callable): 接收 {字段: 文本} 并返回翻译后字典的函数，None 表示不翻译
+            retmax (int): esearch 返回的最大 PMID 数
+            efetch_chunk_size (int): efetch 每块的 PMID 数量
+            efetch_max_concurrency (int): 同时进行的 efetch 请求数
+            if_max_concurrency (int): 期刊IF查询的最大并发数
+        """
+        self.paper_key = paper_key
+        self.api_key = api_key
+        self.translate_terms = translate_terms
+        self.retmax = retmax
+        self.efetch_chunk_size = efetch_chunk_size
+        self.efetch_max_concurrency = efetch_max_concurrency
+        self.if_max_concurrency = if_max_concurrency
+
+    def run(self, fields, year_start, year_end, top_n=10):
+        """
+        同步入口。
+
+        Args:
+            fields (dict): {'theme': ..., 'key1': ..., 'key2': ...} 原始检索词
+            year_start (int): 起始年份
+            year_end (int): 结束年份
+            top_n (int): 返回IF最高的论文数
+
+        Returns:
+            tuple: (按IF排序的前 top_n 篇论文 DataFrame, 各阶段耗时 dict)
+        """
+        return asyncio.run(self.run_async(fields, year_start, year_end, top_n))
+
+    async def run_async(self, fields, year_start, year_end, top_n=10):
+        loop = asyncio.get_running_loop()
+        timer = StageTimer()
+
+        # 翻译：三个检索词在一次请求中完成
+        timer.start('translate')
+        if self.translate_terms is not None:
+            fields = await _run_blocking(loop, self.translate_terms, fields)
+        timer.end('translate')
+
+        query = build_pubmed_query(fields.get('theme', ''), fields.get('key1', ''), fields.get('key2', ''))
+        logger.info(f'检索内容为:{query}')
+        searcher = PubMedSearcher(query, self.paper_key, retmax=self.retmax, year_start=year_start, year_end=year_end)
+
+        timer.start('esearch')
+        pmids = await _run_blocking(loop, searcher.search_pubmed)
+        timer.end('esearch')
+        if not pmids:
+            if expired():
+                timer.mark_partial('esearch')
+            return pd.DataFrame(), timer.report()
+
+        async_api = AsyncAnswerAPI(self.api_key, max_concurrency=self.if_max_concurrency)
+        try:
+            papers, journal_if_map = await self._fetch_and_lookup(loop, searcher, pmids, async_api, timer)
+        finally:
+            await async_api.aclose()
+
+        if not papers:
+            return pd.DataFrame(), timer.report()
+
+        timer.start('rank')
+        # 按 esearch 返回的 PMID 顺序排列，保证同IF论文的顺序与顺序执行模式一致
+        order = {pmid: idx for idx, pmid in enumerate(pmids)}
+        papers.sort(key=lambda paper: order.get(paper.get('pmid'), len(order)))
+        ranker = PaperRankerByIF(pd.DataFrame(papers), journal_column_name='journal', api_key=self.api_key)
+        ranker.apply_if_map(journal_if_map)
+        top_papers_df = ranker.get_top_papers(top_n=top_n)
+        timer.end('rank')
+
+        timings = timer.report()
+        logger.info(f"流水线检索完成: {len(papers)} 篇论文, {len(journal_if_map)} 个期刊, 各阶段耗时: {timings}")
+        return top_papers_df, timings
+
+    async def _fetch_and_lookup(self, loop, searcher, pmids, async_api, timer):
+        """
+        分块 efetch 并解析；每发现一个新期刊立即发起IF查询。返回 (论文列表, {期刊名: IF})。
+        截止时间到达时放弃未完成的块与IF查询，未查到的期刊IF为 None。
+        """
+        semaphore = asyncio.Semaphore(self.efetch_max_concurrency)
+
+        async def fetch_chunk(chunk):
+            async with semaphore:
+                timer.start('efetch')
+                xml_data = await _run_blocking(loop, searcher.fetch_details, chunk)
+                timer.end('efetch')
+                return xml_data
+
+        chunks = [pmids[i:i + self.efetch_chunk_size] for i in range(0, len(pmids), self.efetch_chunk_size)]
+        fetch_tasks = [asyncio.create_task(fetch_chunk(chunk)) for chunk in chunks]
+
+        papers = []
+        if_tasks = {}
+        try:
+            try:
+                for next_done in asyncio.as_completed(fetch_tasks, timeout=remaining(RANK_RESERVE)):
+                    xml_data = await next_done
+                    if not xml_data:
+                        continue
+
+                    timer.start('parse')
+                    chunk_papers = searcher.parse_details(xml_data)
+                    timer.end('parse')
+                    papers.extend(chunk_papers)
+
+                    for paper in chunk_papers:
+                        journal_name = (paper.get('journal') or '').strip()
+                        if journal_name and journal_name not in if_tasks:
+                            if not if_tasks:
+                                timer.start('if_lookup')
+                            if_tasks[journal_name] = asyncio.create_task(
+                                PaperRankerByIF.get_impact_factor_async(journal_name, async_api)
+                            )
+            except asyncio.TimeoutError:
+                unfinished = sum(not task.done() for task in fetch_tasks)
+                logger.warning(f"已到截止时间，{unfinished} 块 efetch 未完成，使用已解析的 {len(papers)} 篇论文")
+                timer.mark_partial('efetch')
+                for task in fetch_tasks:
+                    task.cancel()
+
+            journal_if_map = await self._collect_impact_factors(if_tasks, timer)
+        except BaseException:
+            for task in [*fetch_tasks, *if_tasks.values()]:
+                task.cancel()
+            raise
+
+        return papers, journal_if_map
+
+    @staticmethod
+    async def _collect_impact_factors(if_tasks, timer):
+        """等待IF查询完成；截止时间到达时取消其余查询，未完成的期刊IF记为 None"""
+        if not if_tasks:
+            return {}
+        done, pending = await asyncio.wait(if_tasks.values(), timeout=remaining(RANK_RESERVE))
+        if pending:
+            logger.warning(f"已到截止时间，{len(pending)} 个期刊的IF查询未完成，按已知的IF排序")
+            timer.mark_partial('if_lookup')
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        timer.end('if_lookup')
+        return {name: task.result() if task in done else None for name, task in if_tasks.items()}
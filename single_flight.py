@@ -0,0 +1,189 @@
+# single_flight.py
+# 同一 key 的并发调用合并（single-flight）：同一时刻只有一个调用者真正执行，其余调用者等待并复用它的结果。
+# 进程内通过事件通知合并；跨 worker 进程时使用文件锁（POSIX 使用 fcntl，Windows 使用 msvcrt），
+# 拿到锁后先调用 recheck 检查其他进程是否已经产出结果，避免重复调用付费接口。
+# 锁文件在持有者释放前删除，cache/locks 中只留下正在执行的任务的锁文件（Windows 无法删除已打开的文件，会保留）。
+
+import hashlib
+import os
+import threading
+import time
+
+from log_config import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+logger = get_logger('paper_search_app', 'paper_search_app.log')
+
+LOCK_DIR = os.path.join('cache', 'locks')
+# 等待其他进程释放文件锁的最长时间（秒）
+LOCK_TIMEOUT = 300
+_LOCK_POLL_INTERVAL = 0.1
+
+
+class FileLock:
+    """
+    基于锁文件的跨进程互斥锁（非可重入）。
+    POSIX 上释放时删除锁文件；等待者拿到锁后确认它仍是路径上的文件，否则说明锁文件已被删除，重新打开再抢。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def _try_lock(self, fd):
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _is_current(self, fd):
+        """已锁定的 fd 是否仍对应路径上的锁文件"""
+        if fcntl is None:
+            return True
+        try:
+            return os.path.samestat(os.fstat(fd), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    def acquire(self, timeout=LOCK_TIMEOUT):
+        """获取锁，超时抛出 TimeoutError"""
+        deadline_at = time.monotonic() + timeout
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            if self._try_lock(fd):
+                if self._is_current(fd):
+                    self._fd = fd
+                    return
+                # 上一个持有者已删除该文件，锁住的是一个孤立的文件
+                os.close(fd)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                continue
+            if time.monotonic() >= deadline_at:
+                os.close(fd)
+                raise TimeoutError(f"等待文件锁超时: {self.path}")
+            time.sleep(_LOCK_POLL_INTERVAL)
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                # 仍持有锁时删除文件，等待者通过 _is_current 发现并重新打开
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    按 key 合并并发调用。
+
+    lock_dir 为 None 时只在进程内合并；否则同时用文件锁在多个 worker 进程之间互斥。
+    """
+
+    def __init__(self, lock_dir=LOCK_DIR, lock_timeout=LOCK_TIMEOUT):
+        """
+        Args:
+            lock_dir (str): 锁文件目录，None 表示只在进程内合并
+            lock_timeout (float): 等待其他进程释放文件锁的最长时间（秒）
+        """
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def _lock_path(self, key):
+        return os.path.join(self.lock_dir, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.lock")
+
+    def do(self, key, func, recheck=None):
+        """
+        执行 func() 并返回结果；同一 key 已有调用在执行时，等待并返回那次调用的结果（或抛出它的异常）。
+
+        Args:
+            key (str): 合并的键
+            func (callable): 无参函数，真正执行的工作
+            recheck (callable): 拿到跨进程文件锁后调用，返回非 None 时直接作为结果（其他进程已完成同样的工作）
+
+        Returns:
+            tuple: (结果, 是否与其他调用合并)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            logger.info(f"等待进行中的相同任务: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        shared = False
+        try:
+            if self.lock_dir:
+                file_lock = FileLock(self._lock_path(key))
+                file_lock.acquire(self.lock_timeout)
+                try:
+                    result = recheck() if recheck is not None else None
+                    if result is None:
+                        result = func()
+                    else:
+                        shared = True
+                        logger.info(f"其他进程已完成相同任务: {key}")
+                finally:
+                    file_lock.release()
+            else:
+                result = func()
+            call.result = result
+            return result, shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self):
+        """返回当前正在执行的 key 数量"""
+        with self._lock:
+            return len(self._calls)
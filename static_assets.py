@@ -0,0 +1,127 @@
+# static_assets.py
+# 首页与静态文件的内存缓存层：文本类资源（HTML/CSS/JS/SVG 等）首次访问或文件修改后读入内存，
+# 同时预先生成 gzip/brotli 压缩版本并计算强 ETag，之后的请求直接从内存返回；
+# 图片等二进制文件不进内存，交给 send_file（WSGI file_wrapper，服务器支持时走 sendfile 零拷贝）。
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from flask import Response, request, send_file
+
+from http_cache import brotli, choose_encoding, etag_matches, GZIP_LEVEL
+from log_config import get_logger
+
+logger = get_logger('paper_search_app', 'paper_search_app.log')
+
+# 读入内存并预压缩的文件类型与单文件大小上限（字节）
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.css', '.js', '.mjs', '.json', '.svg', '.txt', '.xml', '.map'}
+ASSET_MAX_CACHE_BYTES = 2 * 1024 * 1024
+# 两次检查文件修改时间的最小间隔（秒）
+STAT_CHECK_INTERVAL = 2.0
+# 文件名中带内容哈希（如 app.3f2a9c1d.js）的资源内容不会变化，可长期缓存
+HASHED_ASSET_RE = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+
+def cache_control_for(filename, default=DEFAULT_CACHE_CONTROL):
+    return IMMUTABLE_CACHE_CONTROL if HASHED_ASSET_RE.search(filename) else default
+
+
+class _Asset:
+    def __init__(self, path, mtime, size, body):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.checked_at = time.monotonic()
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.bodies = {None: body, 'gzip': gzip.compress(body, compresslevel=GZIP_LEVEL)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+
+
+class AssetCache:
+    """
+    文本类静态资源的内存缓存，按文件修改时间自动重新加载，线程安全。
+    """
+
+    def __init__(self, max_file_bytes=ASSET_MAX_CACHE_BYTES, stat_interval=STAT_CHECK_INTERVAL):
+        self.max_file_bytes = max_file_bytes
+        self.stat_interval = stat_interval
+        self._lock = threading.Lock()
+        self._assets = {}
+
+    @staticmethod
+    def is_cacheable(path):
+        return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+    def get(self, path):
+        """返回内存中的资源；文件不存在时抛出 FileNotFoundError，文件过大时返回 None"""
+        asset = self._assets.get(path)
+        now = time.monotonic()
+        if asset is not None and now - asset.checked_at < self.stat_interval:
+            return asset
+
+        stat = os.stat(path)
+        if asset is not None and asset.mtime == stat.st_mtime_ns and asset.size == stat.st_size:
+            asset.checked_at = now
+            return asset
+        if stat.st_size > self.max_file_bytes:
+            return None
+
+        with self._lock:
+            with open(path, 'rb') as f:
+                body = f.read()
+            asset = _Asset(path, stat.st_mtime_ns, stat.st_size, body)
+            self._assets[path] = asset
+        logger.info(f"静态资源已加载到内存: {path} ({len(body)} 字节, gzip {len(asset.bodies['gzip'])} 字节)")
+        return asset
+
+    def preload(self, paths):
+        """启动时预先加载资源，不存在的文件跳过"""
+        for path in paths:
+            try:
+                self.get(path)
+            except FileNotFoundError:
+                logger.warning(f"预加载静态资源失败，文件不存在: {path}")
+
+    def serve(self, path, cache_control=DEFAULT_CACHE_CONTROL):
+        """
+        返回资源响应：If-None-Match 命中时返回 304，否则按 Accept-Encoding 返回预压缩的内容。
+        文件过大时退回 send_file。文件不存在时抛出 FileNotFoundError。
+        """
+        asset = self.get(path)
+        if asset is None:
+            return send_binary_file(path, cache_control)
+
+        headers = {'ETag': asset.etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+        if etag_matches(request.headers.get('If-None-Match'), asset.etag):
+            return Response(status=304, headers=headers)
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding not in asset.bodies:
+            encoding = None
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+            headers['ETag'] = f'{asset.etag[:-1]}-{encoding}"'
+        return Response(asset.bodies[encoding], mimetype=asset.mimetype, headers=headers)
+
+
+def send_binary_file(path, cache_control=DEFAULT_CACHE_CONTROL):
+    """
+    发送图片等二进制文件：不读入内存，支持 If-None-Match/If-Modified-Since 与 Range。
+    文件不存在时抛出 FileNotFoundError。
+    """
+    response = send_file(os.path.abspath(path), conditional=True, etag=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+# 进程内共享的资源缓存
+asset_cache = AssetCache()
@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 日志文件路径在模块导入时按当前目录确定，导入被测模块前先切换到临时目录，避免写入项目的 log/
+os.chdir(tempfile.mkdtemp(prefix='paper_tests_'))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_workdir(tmp_path, monkeypatch):
+    """应用会在当前目录下创建 cache/、static/ 等目录，每个测试在各自的临时目录中运行"""
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """在当前测试的临时目录中重新初始化服务，返回 Flask 测试客户端"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'paper_store', None)
+    return app_module.create_app().test_client()
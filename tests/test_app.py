@@ -0,0 +1,124 @@
+import pandas as pd
+
+import app as app_module
+import get_data_xhs
+import paper_api
+from deadline import deadline_scope
+from search_pipeline import StageTimer
+
+
+class _FailingAnswerer:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def ask(self, prompt):
+        raise RuntimeError('模型服务不可用')
+
+
+def test_failed_summary_is_not_revalidated(client, monkeypatch):
+    monkeypatch.setattr(get_data_xhs, 'QuestionAnswerer', _FailingAnswerer)
+    app_module.paper_store.put('123', {'title': 't', 'url': 'u', 'abstract': 'a'})
+
+    first = client.post('/api/get_paper_summary', json={'pmid': '123'})
+    assert first.get_json()['summary'] == '总结生成失败'
+    assert 'ETag' not in first.headers
+    assert first.headers['Cache-Control'] == 'no-store'
+
+    retry = client.post('/api/get_paper_summary', json={'pmid': '123'}, headers={'If-None-Match': '*'})
+    assert retry.status_code == 200
+    assert 'ETag' not in retry.headers
+
+
+SEARCH_PAYLOAD = {'theme': 'cancer', 'key1': 'immunotherapy', 'key2': '', 'start_year': '2020', 'end_year': '2024'}
+
+
+def _partial_search(fields, year_start, year_end, paper_key, api_key):
+    timer = StageTimer()
+    timer.start('rank')
+    timer.end('rank')
+    timer.mark_partial('rank')
+    papers = pd.DataFrame([{'pmid': '1', 'title': 't', 'journal': 'j', 'year': '2024', 'url': 'u',
+                            'abstract': 'a', '影响因子': None}])
+    return papers, timer.report()
+
+
+def test_partial_search_is_never_answered_with_304(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_search', _partial_search)
+
+    first = client.post('/api/search', json=SEARCH_PAYLOAD)
+    assert first.get_json()['partial'] is True
+    assert 'ETag' not in first.headers
+    assert first.headers['Cache-Control'] == 'no-store'
+
+    retry = client.post('/api/search', json=SEARCH_PAYLOAD, headers={'If-None-Match': '*'})
+    assert retry.status_code == 200
+    assert retry.get_json()['partial'] is True
+
+
+def _empty_partial_search(fields, year_start, year_end, paper_key, api_key):
+    timer = StageTimer()
+    timer.start('esearch')
+    timer.end('esearch')
+    timer.mark_partial('esearch')
+    return pd.DataFrame(), timer.report()
+
+
+def test_empty_partial_search_is_never_answered_with_304(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_search', _empty_partial_search)
+
+    first = client.post('/api/search', json=SEARCH_PAYLOAD)
+    assert 'ETag' not in first.headers
+    assert first.headers['Cache-Control'] == 'no-store'
+
+    retry = client.post('/api/search', json=SEARCH_PAYLOAD, headers={'If-None-Match': '*'})
+    assert retry.status_code == 200
+
+
+def test_sequential_search_marks_pubmed_partial_when_deadline_runs_out(monkeypatch):
+    monkeypatch.setattr(app_module, 'translate_search_terms', lambda fields: dict(fields))
+    monkeypatch.setattr(paper_api.PubMedSearcher, 'run', lambda self: [])
+
+    with deadline_scope(0):
+        papers, timings = app_module.search_sequential(SEARCH_PAYLOAD, 2020, 2024, 'key', 'key')
+    assert papers.empty
+    assert timings['partial'] == ['pubmed']
+
+
+def _complete_search(fields, year_start, year_end, paper_key, api_key):
+    papers, timings = _partial_search(fields, year_start, year_end, paper_key, api_key)
+    timings.pop('partial')
+    return papers, timings
+
+
+def test_empty_search_is_not_fingerprinted(client, monkeypatch):
+    # NCBI 临时故障时 search_pubmed 返回空列表，"未找到" 不能被 304 复用
+    monkeypatch.setattr(app_module, 'run_search', lambda *args: (pd.DataFrame(), StageTimer().report()))
+    first = client.post('/api/search', json=SEARCH_PAYLOAD)
+    assert 'ETag' not in first.headers
+    assert first.headers['Cache-Control'] == 'no-store'
+
+
+def test_reexecuted_search_with_same_papers_keeps_its_etag(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_search', _complete_search)
+    first = client.post('/api/search', json=SEARCH_PAYLOAD)
+    assert first.headers['ETag']
+
+    # 指纹过期后重新检索，timings 不同但论文相同，仍返回 304，旧游标继续有效
+    app_module.fingerprint_cache._entries.clear()
+    second = client.post('/api/search', json=SEARCH_PAYLOAD, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_crafted_cursor_returns_400(client):
+    response = client.post('/api/search/next', json={'cursor': 'abc.²'})
+    assert response.status_code == 400
+
+
+def test_search_rejects_invalid_years(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_search', _complete_search)
+    for start_year, end_year in [('', '2024'), ('abc', '2024'), ('2020', None), ('２０２０', '2024'), ('2024', '2020')]:
+        response = client.post('/api/search', json=dict(SEARCH_PAYLOAD, start_year=start_year, end_year=end_year))
+        assert response.status_code == 400
+        assert '年份' in response.get_json()['result']
+
+    assert client.post('/api/search', json=dict(SEARCH_PAYLOAD, start_year=2020, end_year=2024)).status_code == 200
@@ -0,0 +1,110 @@
+import functools
+import http.server
+import threading
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class _FakeBrowser:
+    def __init__(self, fail_context=False):
+        self.fail_context = fail_context
+        self.handlers = {}
+        self.closed = False
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, viewport=None):
+        if self.fail_context:
+            raise RuntimeError('new_context failed')
+        return _FakeContext()
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeContext:
+    async def close(self):
+        pass
+
+
+def _fake_launch(browsers):
+    async def launch(self):
+        return browsers.pop(0)
+    return launch
+
+
+def test_failed_start_leaves_pool_restartable(monkeypatch):
+    broken, healthy = _FakeBrowser(fail_context=True), _FakeBrowser()
+    monkeypatch.setattr(BrowserPool, '_launch', _fake_launch([broken, healthy]))
+    pool = BrowserPool(pool_size=2)
+
+    with pytest.raises(RuntimeError, match='new_context failed'):
+        pool.start()
+    assert not pool.started
+    assert pool._loop is None and pool._thread is None and pool._contexts is None
+    assert broken.closed
+
+    # 再次调用会完整重新启动，而不是在已停止的事件循环上继续
+    pool.start()
+    try:
+        assert pool.started and len(pool._contexts) == 2
+    finally:
+        pool.close()
+    assert healthy.closed and not pool.started
+
+
+def test_disconnected_browser_is_relaunched(monkeypatch):
+    first, second = _FakeBrowser(), _FakeBrowser()
+    monkeypatch.setattr(BrowserPool, '_launch', _fake_launch([first, second]))
+    pool = BrowserPool(pool_size=1)
+    pool.start()
+    try:
+        first.closed = True
+        pool._loop.call_soon_threadsafe(first.handlers['disconnected'], first)
+        for _ in range(100):
+            if not pool.started:
+                break
+            threading.Event().wait(0.01)
+        assert not pool.started
+
+        pool.start()
+        assert pool._browser is second
+    finally:
+        pool.close()
+
+
+@pytest.fixture
+def local_page(tmp_path):
+    (tmp_path / 'page.html').write_text('<html><body style="background:#36c"><h1>截图测试</h1></body></html>',
+                                         encoding='utf-8')
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/page.html"
+    server.shutdown()
+
+
+def test_screenshot_of_local_page(local_page, tmp_path):
+    pytest.importorskip('playwright')
+    pool = BrowserPool(pool_size=1, max_pages=2)
+    try:
+        try:
+            pool.start()
+        except Exception as e:
+            pytest.skip(f'无法启动 Chromium: {e}')
+        outputs = [str(tmp_path / f'shot_{i}.png') for i in range(3)]
+        for output in outputs:
+            assert pool.screenshot(local_page, output, clip={'x': 0, 'y': 0, 'width': 400, 'height': 300}) == output
+        for output in outputs:
+            with open(output, 'rb') as f:
+                assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+    finally:
+        pool.close()
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import for_answer
+from compare_IF import PaperRankerByIF
+
+
+class _FakeAsyncOpenAI:
+    """记录同时进行的调用数的 AsyncOpenAI 替身"""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=1, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='3.5'))], usage=usage)
+
+    async def close(self):
+        pass
+
+
+def test_model_limit_is_shared_across_concurrent_pipelines(monkeypatch):
+    monkeypatch.setattr(for_answer, 'AsyncOpenAI', _FakeAsyncOpenAI)
+    limit = 3
+    journals = [f'Journal {i}' for i in range(12)]
+    results = []
+
+    def run_pipeline():
+        # 每次检索各自创建 AsyncAnswerAPI，并在自己线程的事件循环中运行
+        ranker = PaperRankerByIF.__new__(PaperRankerByIF)
+        ranker.api_key = 'key'
+        ranker.max_concurrency = limit
+        results.append(asyncio.run(ranker.fetch_if_map_async(journals)))
+
+    threads = [threading.Thread(target=run_pipeline) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 2
+    assert all(result == {name: 3.5 for name in journals} for result in results)
+    assert _FakeAsyncOpenAI.peak == limit
+    assert for_answer.get_model_limiter(for_answer.AsyncAnswerAPI.ASK_MODEL_TWO, limit).in_flight() == 0
+
+
+def test_async_client_follows_base_url_reassignment(monkeypatch):
+    monkeypatch.setattr(for_answer.AnswerAPI, 'BASE_URL', 'http://127.0.0.1:9/v1')
+    api = for_answer.AsyncAnswerAPI('key')
+    try:
+        assert str(api.client.base_url).rstrip('/') == 'http://127.0.0.1:9/v1'
+    finally:
+        asyncio.run(api.aclose())
@@ -0,0 +1,40 @@
+import os
+
+from glossary import MedicalGlossary
+
+SAMPLE_GLOSSARY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data',
+                               'medical_glossary.tsv')
+
+
+def _glossary():
+    glossary = MedicalGlossary()
+    glossary.add('肺癌', 'lung cancer', 'Lung Neoplasms')
+    glossary.add('非小细胞肺癌', 'non-small cell lung cancer', 'Carcinoma, Non-Small-Cell Lung')
+    glossary.add('早期', 'early')
+    glossary.add('症状', 'symptoms')
+    return glossary
+
+
+def test_segment_prefers_longest_match():
+    assert _glossary().segment('非小细胞肺癌早期') == [
+        ('非小细胞肺癌', 'non-small cell lung cancer'),
+        ('早期', 'early'),
+    ]
+
+
+def test_segment_groups_unknown_characters():
+    assert _glossary().segment('肺癌的早期表现') == [
+        ('肺癌', 'lung cancer'), ('的', None), ('早期', 'early'), ('表现', None),
+    ]
+
+
+def test_mesh_headings_only_on_request():
+    glossary = _glossary()
+    assert glossary.segment('肺癌症状') == [('肺癌', 'lung cancer'), ('症状', 'symptoms')]
+    assert glossary.segment('肺癌症状', use_mesh=True) == [('肺癌', 'Lung Neoplasms'), ('症状', 'symptoms')]
+
+
+def test_sample_glossary_loads():
+    glossary = MedicalGlossary()
+    assert glossary.load(SAMPLE_GLOSSARY) == len(glossary) > 0
+    assert glossary.segment('肺癌')[0][1] == 'lung cancer'
@@ -0,0 +1,92 @@
+import gzip
+import itertools
+
+import pytest
+from flask import Flask, jsonify, request
+
+import http_cache
+from http_cache import (FingerprintCache, choose_encoding, compute_etag, conditional_json, etag_matches, no_store,
+                        set_payload_etag)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http_cache, 'fingerprint_cache', FingerprintCache())
+    counter = itertools.count()
+    app = Flask(__name__)
+
+    @app.route('/plain', methods=['POST'])
+    @conditional_json(ttl=60)
+    def plain():
+        return jsonify(request.get_json())
+
+    @app.route('/payload', methods=['POST'])
+    @conditional_json(ttl=60)
+    def payload():
+        # 每次执行都会变化的字段不影响 ETag
+        return set_payload_etag(jsonify({'value': 1, 'run': next(counter)}), {'value': 1})
+
+    @app.route('/failed', methods=['POST'])
+    @conditional_json(ttl=60)
+    def failed():
+        return no_store(jsonify({'value': None}))
+
+    @app.route('/large', methods=['POST'])
+    @conditional_json(ttl=60)
+    def large():
+        return jsonify({'text': 'x' * 4096})
+
+    return app.test_client()
+
+
+def test_etag_matching_ignores_weak_prefix_and_encoding_suffix():
+    etag = compute_etag(b'body')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'W/{etag}', etag)
+    assert etag_matches(f'"other", {etag[:-1]}-gzip"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_choose_encoding_prefers_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(http_cache, 'brotli', None)
+    assert choose_encoding('br, gzip;q=0.8') == 'gzip'
+    assert choose_encoding('identity') is None
+
+
+def test_matching_fingerprint_returns_304(client):
+    first = client.post('/plain', json={'a': 1})
+    assert first.status_code == 200 and first.headers['ETag']
+
+    second = client.post('/plain', json={'a': 1}, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+    # 请求体不同则是另一个指纹
+    assert client.post('/plain', json={'a': 2}, headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_payload_etag_survives_reexecution(client):
+    first = client.post('/payload', json={})
+    # 清空指纹后重新执行视图，结果数据不变时仍返回 304
+    http_cache.fingerprint_cache._entries.clear()
+    second = client.post('/payload', json={}, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+
+def test_no_store_response_has_no_etag_and_no_fingerprint(client):
+    first = client.post('/failed', json={})
+    assert 'ETag' not in first.headers
+    assert first.headers['Cache-Control'] == 'no-store'
+    assert client.post('/failed', json={}, headers={'If-None-Match': '*'}).status_code == 200
+    assert len(http_cache.fingerprint_cache._entries) == 0
+
+
+def test_large_response_is_gzipped_with_suffixed_etag(client):
+    response = client.post('/large', json={}, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert b'xxxx' in gzip.decompress(response.get_data())
+
+    revalidated = client.post('/large', json={}, headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from image_store import ImageStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(root=str(tmp_path / 'images'), db_path=str(tmp_path / 'images.db'), thumbnail_width=0)
+
+
+def _png(store, payload):
+    path = store.temp_path('.png')
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + payload)
+    return path
+
+
+def _object_path(store, entry):
+    return os.path.join(store.root, entry['url'][len(store.root) + 1:])
+
+
+def test_same_content_is_stored_once(store):
+    first_source, second_source = _png(store, b'same'), _png(store, b'same')
+    first = store.put_file(first_source, 'screenshot:1')
+    second = store.put_file(second_source, 'image:1')
+
+    assert first['digest'] == second['digest'] and first['url'] == second['url']
+    assert not os.path.exists(first_source) and not os.path.exists(second_source)
+    assert os.path.exists(_object_path(store, first))
+    assert store.total_bytes() == os.path.getsize(_object_path(store, first))
+
+
+def test_alias_follows_latest_content(store):
+    old = store.put_file(_png(store, b'old'), 'image:1')
+    new = store.put_file(_png(store, b'new'), 'image:1')
+    assert store.lookup('image:1')['digest'] == new['digest'] != old['digest']
+    assert store.lookup('image:2') is None
+
+
+def test_lookup_drops_alias_when_file_is_missing(store):
+    entry = store.put_file(_png(store, b'gone'), 'image:1')
+    os.remove(_object_path(store, entry))
+    assert store.lookup('image:1') is None
+
+
+def test_least_recently_used_image_is_evicted(store):
+    size = len(b'\x89PNG\r\n\x1a\n') + 1
+    store.max_bytes = size * 2
+    store.put_file(_png(store, b'a'), 'a')
+    store.put_file(_png(store, b'b'), 'b')
+    # 访问 a 后，b 成为最久未使用的图片
+    assert store.lookup('a') is not None
+    store.put_file(_png(store, b'c'), 'c')
+
+    assert store.lookup('b') is None
+    assert store.lookup('a') is not None and store.lookup('c') is not None
+    assert store.total_bytes() <= store.max_bytes
+
+
+def test_eviction_by_another_process_during_put_does_not_lose_the_image(store, tmp_path, monkeypatch):
+    existing = store.put_file(_png(store, b'shared'), 'screenshot:1')
+    # 另一个进程（同一目录与数据库）配额更小，会淘汰全部图片
+    other = ImageStore(root=store.root, db_path=store.db_path, max_bytes=1, thumbnail_width=0)
+
+    def evict_meanwhile(digest, image_path):
+        other.enforce_quota()
+        return None
+
+    monkeypatch.setattr(store, '_make_thumbnail', evict_meanwhile)
+    entry = store.put_file(_png(store, b'shared'), 'image:1')
+
+    assert entry['digest'] == existing['digest']
+    assert os.path.exists(_object_path(store, entry))
+    assert store.lookup('image:1') is not None
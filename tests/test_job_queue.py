@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from job_queue import JobManager, JobQueueFull, STATUS_COMPLETED, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    manager = JobManager(max_workers=1, max_pending=2, db_path=str(tmp_path / 'jobs.db'))
+    yield manager
+    manager.shutdown()
+
+
+def _wait_finished(manager, job_id, timeout=5):
+    deadline_at = time.time() + timeout
+    while time.time() < deadline_at:
+        job = manager.get(job_id)
+        if job['status'] in (STATUS_COMPLETED, STATUS_FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'任务 {job_id} 未在 {timeout}s 内结束')
+
+
+def test_job_result_and_error_are_stored(jobs):
+    done = _wait_finished(jobs, jobs.submit('add', lambda a, b: {'sum': a + b}, {'a': 1, 'b': 2}))
+    assert done['status'] == STATUS_COMPLETED and done['result'] == {'sum': 3}
+
+    def broken():
+        raise ValueError('boom')
+
+    failed = _wait_finished(jobs, jobs.submit('broken', broken))
+    assert failed['status'] == STATUS_FAILED and failed['error'] == 'boom'
+    assert jobs.get('missing') is None
+
+
+def test_submit_rejects_when_queue_is_full(jobs):
+    release = threading.Event()
+    job_ids = [jobs.submit('wait', release.wait) for _ in range(2)]
+    with pytest.raises(JobQueueFull):
+        jobs.submit('wait', release.wait)
+
+    release.set()
+    for job_id in job_ids:
+        _wait_finished(jobs, job_id)
+    assert jobs.pending() == 0
+
+
+def test_run_parallel_keeps_order(jobs):
+    assert jobs.run_parallel(lambda: (time.sleep(0.02), 'slow')[1], lambda: 'fast') == ['slow', 'fast']
+
+
+def _insert_job(db_path, job_id, status, owner_pid):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('INSERT INTO jobs (job_id, kind, status, created_at, owner_pid) VALUES (?, ?, ?, ?, ?)',
+                     (job_id, 'screenshot', status, time.time(), owner_pid))
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='仅 POSIX 平台能探测进程是否存活')
+def test_jobs_of_dead_process_are_marked_failed(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    JobManager(db_path=db_path).shutdown()
+
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    _insert_job(db_path, 'orphan_running', STATUS_RUNNING, dead.pid)
+    _insert_job(db_path, 'orphan_queued', STATUS_QUEUED, dead.pid)
+    _insert_job(db_path, 'sibling', STATUS_RUNNING, os.getppid())
+    _insert_job(db_path, 'own', STATUS_QUEUED, os.getpid())
+
+    manager = JobManager(db_path=db_path)
+    try:
+        for job_id in ('orphan_running', 'orphan_queued'):
+            job = manager.get(job_id)
+            assert job['status'] == STATUS_FAILED and job['error'] and job['finished_at']
+        # 其他存活 worker 进程的任务与本进程的任务保持原状
+        assert manager.get('sibling')['status'] == STATUS_RUNNING
+        assert manager.get('own')['status'] == STATUS_QUEUED
+    finally:
+        manager.shutdown()
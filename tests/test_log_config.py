@@ -0,0 +1,27 @@
+import logging
+
+import log_config
+from log_config import begin_request, end_request, get_logger
+
+
+def test_loggers_default_to_info():
+    logger = get_logger('test_default_level')
+    assert logger.level == logging.INFO
+    assert not logger.isEnabledFor(logging.DEBUG)
+    assert get_logger('test_debug_level', level=logging.DEBUG).isEnabledFor(logging.DEBUG)
+
+
+def test_debug_records_follow_request_sampling():
+    record = logging.LogRecord('x', logging.DEBUG, __file__, 1, 'detail', None, None)
+    try:
+        begin_request(sample_debug=False)
+        assert not log_config._queue_handler.filter(record)
+        begin_request(sample_debug=True)
+        assert log_config._queue_handler.filter(record)
+    finally:
+        end_request()
+
+
+def test_llm_usage_logger_is_configured_without_prompt_builder():
+    import for_answer
+    assert log_config._queue_handler in for_answer.llm_logger.handlers
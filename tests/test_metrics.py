@@ -0,0 +1,51 @@
+import re
+
+import app as app_module
+from metrics import MetricsRegistry, cache_samples, HTTP_REQUESTS_TOTAL, STAGE_DURATION
+from tests.test_app import SEARCH_PAYLOAD, _complete_search
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(duration_buckets=(0.1, 1))
+    registry.inc(HTTP_REQUESTS_TOTAL, {'endpoint': 'search', 'method': 'POST', 'status': '200'})
+    registry.inc(HTTP_REQUESTS_TOTAL, {'endpoint': 'search', 'method': 'POST', 'status': '200'})
+    registry.observe(STAGE_DURATION, {'stage': 'rank'}, 0.5)
+    collector = lambda: cache_samples('demo', 3, 1)  # noqa: E731
+    registry.register_collector(collector)
+    registry.register_collector(collector)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE http_requests_total counter' in lines
+    assert 'http_requests_total{endpoint="search",method="POST",status="200"} 2' in lines
+    assert [line for line in lines if line.startswith('pipeline_stage_duration_seconds')] == [
+        'pipeline_stage_duration_seconds_bucket{stage="rank",le="0.1"} 0',
+        'pipeline_stage_duration_seconds_bucket{stage="rank",le="1"} 1',
+        'pipeline_stage_duration_seconds_bucket{stage="rank",le="+Inf"} 1',
+        'pipeline_stage_duration_seconds_sum{stage="rank"} 0.5',
+        'pipeline_stage_duration_seconds_count{stage="rank"} 1',
+    ]
+    # 重复注册的回调只导出一次
+    assert lines.count('cache_hit_ratio{cache="demo"} 0.75') == 1
+
+
+def test_metrics_endpoint_exposes_request_pipeline_and_runtime_metrics(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_search', _complete_search)
+    assert client.post('/api/search', json=SEARCH_PAYLOAD).status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    lines = text.splitlines()
+
+    assert re.search(r'^http_requests_total\{endpoint="paper_search\.api_search",method="POST",status="200"\} [1-9]',
+                     text, re.M)
+    assert re.search(r'^http_request_duration_seconds_count\{endpoint="paper_search\.api_search"\} [1-9]', text, re.M)
+    assert re.search(r'^pipeline_stage_duration_seconds_count\{stage="rank"\} [1-9]', text, re.M)
+    for name, metric_type in [('cache_hits_total', 'counter'), ('cache_misses_total', 'counter'),
+                              ('cache_hit_ratio', 'gauge'), ('single_flight_in_flight', 'gauge'),
+                              ('image_jobs_pending', 'gauge'), ('search_sessions', 'gauge'),
+                              ('log_records_dropped_total', 'counter'), ('http_requests_in_flight', 'gauge')]:
+        assert f'# TYPE {name} {metric_type}' in lines
+    for cache in ('translation', 'paper_store', 'http_fingerprint'):
+        assert sum(line.startswith(f'cache_hits_total{{cache="{cache}"}}') for line in lines) == 1
+    assert re.search(r'^search_sessions [1-9]', text, re.M)
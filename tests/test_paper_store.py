@@ -0,0 +1,64 @@
+import time
+
+from paper_store import PaperStore, SearchSessionStore
+
+
+def test_papers_are_shared_between_store_instances(tmp_path):
+    # 两个实例打开同一个数据库，相当于两个 worker 进程
+    db_path = str(tmp_path / 'papers.db')
+    writer = PaperStore(db_path=db_path)
+    reader = PaperStore(db_path=db_path)
+    writer.put_many([{'pmid': '1', 'title': 'a'}, {'pmid': '2', 'title': 'b'}, {'pmid': '', 'title': 'c'}])
+
+    assert reader.get('1') == {'pmid': '1', 'title': 'a'}
+    assert reader.get('3') is None
+    assert (reader.hits, reader.misses) == (1, 1)
+    assert len(reader) == 2
+
+
+def test_expired_and_least_recently_used_papers_are_evicted(tmp_path):
+    db_path = str(tmp_path / 'papers.db')
+    store = PaperStore(db_path=db_path, max_size=2)
+    for pmid in ('1', '2'):
+        store.put(pmid, {'title': pmid})
+        time.sleep(0.01)
+    store.get('1')
+    time.sleep(0.01)
+    store.put('3', {'title': 'c'})
+    assert store.get('2') is None
+    assert store.get('1') is not None
+
+    expired = PaperStore(db_path=db_path, ttl=-1)
+    expired.put('4', {'title': 'd'})
+    assert store.get('4') is None
+
+
+def test_search_cursor_works_on_another_store_instance(tmp_path):
+    db_path = str(tmp_path / 'papers.db')
+    session_id = SearchSessionStore(db_path=db_path).create([{'id': i} for i in range(5)])
+    other = SearchSessionStore(db_path=db_path)
+
+    papers, cursor, total = other.page(session_id, 0, 2)
+    assert papers == [{'id': 0}, {'id': 1}] and total == 5
+    papers, cursor, total = other.page(*SearchSessionStore.parse_cursor(cursor), 2)
+    assert papers == [{'id': 2}, {'id': 3}]
+    papers, cursor, total = other.page(*SearchSessionStore.parse_cursor(cursor), 2)
+    assert papers == [{'id': 4}] and cursor is None
+    assert other.page('missing', 0, 2) is None
+
+
+def test_oldest_search_sessions_are_evicted(tmp_path):
+    store = SearchSessionStore(db_path=str(tmp_path / 'papers.db'), max_size=2)
+    first = store.create([{'id': 0}])
+    time.sleep(0.01)
+    store.create([{'id': 1}])
+    time.sleep(0.01)
+    store.create([{'id': 2}])
+    assert store.page(first, 0, 10) is None
+    assert len(store) == 2
+
+
+def test_parse_cursor_rejects_non_ascii_and_oversized_offsets():
+    assert SearchSessionStore.parse_cursor('abc.20') == ('abc', 20)
+    for cursor in ('abc.²', 'abc.١٢', 'abc.-1', 'abc.', '.5', 'abc.1234567890', None):
+        assert SearchSessionStore.parse_cursor(cursor) is None
@@ -0,0 +1,63 @@
+import functools
+import os
+import time
+
+import pandas as pd
+
+import app as app_module
+import profiler
+from profiler import RequestProfiler, should_profile
+from search_pipeline import StageTimer
+
+SEARCH_PAYLOAD = {'theme': 'cancer', 'key1': 'immunotherapy', 'key2': '', 'start_year': '2020', 'end_year': '2024'}
+
+
+def test_profiler_writes_folded_stacks_and_rotates(tmp_path):
+    output_dir = str(tmp_path / 'profiles')
+    paths = []
+    for i in range(3):
+        request_profiler = RequestProfiler(f'busy_{i}', interval=0.001, output_dir=output_dir, max_files=2).start()
+        deadline_at = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline_at:
+            pass
+        paths.append(request_profiler.stop())
+        time.sleep(0.01)
+
+    assert request_profiler.sample_count > 0
+    with open(paths[-1], encoding='utf-8') as f:
+        stack, count = f.readline().rsplit(' ', 1)
+    assert 'test_profiler_writes_folded_stacks_and_rotates' in stack and int(count) > 0
+    assert sorted(os.listdir(output_dir)) == sorted(os.path.basename(p) for p in paths[1:])
+
+
+def test_profiler_without_samples_writes_nothing(tmp_path):
+    request_profiler = RequestProfiler('idle', interval=10, output_dir=str(tmp_path)).start()
+    assert request_profiler.stop() is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_should_profile_requires_token(monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(profiler, 'PROFILE_SAMPLE_EVERY', 0)
+    assert should_profile('secret')
+    assert not should_profile('wrong') and not should_profile(None)
+
+
+def _slow_search(*args):
+    time.sleep(0.05)
+    papers = pd.DataFrame([{'pmid': '1', 'title': 't', 'journal': 'j', 'year': '2024', 'url': 'u', 'abstract': 'a'}])
+    return papers, StageTimer().report()
+
+
+def test_profile_header_only_when_file_was_written(client, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(app_module, 'run_search', _slow_search)
+
+    monkeypatch.setattr(app_module, 'RequestProfiler', functools.partial(RequestProfiler, interval=10))
+    response = client.post('/api/search', json=SEARCH_PAYLOAD, headers={'X-Profile': 'secret'})
+    assert response.status_code == 200
+    assert 'X-Profile-File' not in response.headers
+
+    monkeypatch.setattr(app_module, 'RequestProfiler', functools.partial(RequestProfiler, interval=0.001))
+    response = client.post('/api/search', json=dict(SEARCH_PAYLOAD, key2='x'), headers={'X-Profile': 'secret'})
+    assert os.path.exists(os.path.join(profiler.PROFILE_DIR, response.headers['X-Profile-File']))
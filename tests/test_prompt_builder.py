@@ -0,0 +1,60 @@
+import pytest
+
+import prompt_builder
+from prompt_builder import compact_text, count_tokens, split_sentences
+
+ABSTRACT = (
+    "Background: atrial fibrillation raises stroke risk. "
+    "See https://pubmed.ncbi.nlm.nih.gov/123/ for the protocol. "
+    "Sentence two adds detail about the cohort and follow-up. "
+    "Sentence three adds more detail about the subgroups. "
+    "The treatment lowered risk with HR 1.25 (95% CI 1.02-1.53)."
+)
+
+
+@pytest.fixture(params=['tiktoken', 'heuristic'])
+def encoding(request, monkeypatch):
+    if request.param == 'heuristic':
+        monkeypatch.setattr(prompt_builder, '_ENCODING', None)
+    elif prompt_builder._get_encoding() is None:
+        pytest.skip('未安装 tiktoken')
+    return request.param
+
+
+def test_sentences_are_not_split_inside_urls_or_decimals():
+    sentences = split_sentences(ABSTRACT)
+    assert len(sentences) == 5
+    assert sentences[1] == "See https://pubmed.ncbi.nlm.nih.gov/123/ for the protocol."
+    assert sentences[-1] == "The treatment lowered risk with HR 1.25 (95% CI 1.02-1.53)."
+
+
+def test_cjk_sentences_split_without_whitespace():
+    assert split_sentences("房颤增加卒中风险。治疗降低了风险！结论如何？") == ["房颤增加卒中风险。", "治疗降低了风险！", "结论如何？"]
+
+
+def test_compact_text_keeps_first_and_last_sentence_intact(encoding):
+    budget = count_tokens(split_sentences(ABSTRACT)[0]) + count_tokens(split_sentences(ABSTRACT)[-1]) + 8
+    compacted = compact_text(ABSTRACT, budget)
+    assert compacted.startswith("Background: atrial fibrillation raises stroke risk.")
+    assert compacted.endswith("HR 1.25 (95% CI 1.02-1.53).")
+    assert '...' in compacted
+    assert count_tokens(compacted) <= budget
+
+
+def test_compact_text_returns_short_text_unchanged(encoding):
+    assert compact_text("See https://pubmed.ncbi.nlm.nih.gov/123/ now", 100) == "See https://pubmed.ncbi.nlm.nih.gov/123/ now"
+    assert compact_text('', 10) == ''
+
+
+def test_count_tokens_heuristic(monkeypatch):
+    monkeypatch.setattr(prompt_builder, '_ENCODING', None)
+    assert count_tokens('') == 0
+    assert count_tokens('心房颤动') == 4
+    # 英文单词约每 4 个字符 1 个 token，标点各计 1 个
+    assert count_tokens('hello world.') == 5
+    assert count_tokens('房颤 stroke') == 2 + 2
+
+
+def test_count_tokens_grows_with_text(encoding):
+    assert 0 < count_tokens('房颤') < count_tokens('房颤增加卒中风险')
+    assert count_tokens('HR 1.25') < count_tokens('HR 1.25 (95% CI 1.02-1.53)')
@@ -0,0 +1,24 @@
+import os
+import re
+
+import bench_startup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 包名与导入名不同的依赖
+IMPORT_NAMES = {'Pillow': 'PIL'}
+
+
+def _requirements(filename):
+    with open(os.path.join(ROOT, filename), encoding='utf-8') as f:
+        lines = [line.split('#', 1)[0].strip() for line in f]
+    return {re.split(r'[<>=!~\[ ]', line, 1)[0] for line in lines if line and not line.startswith('-')}
+
+
+def test_optional_requirements_cover_optional_imports():
+    assert {'tiktoken', 'playwright', 'Pillow', 'brotli'} <= _requirements('requirements-optional.txt')
+    assert 'dashscope' in _requirements('requirements.txt')
+
+
+def test_heavy_modules_are_declared_dependencies():
+    declared = _requirements('requirements.txt') | _requirements('requirements-optional.txt')
+    assert set(bench_startup.HEAVY_MODULES) <= {IMPORT_NAMES.get(name, name) for name in declared}
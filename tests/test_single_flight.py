@@ -0,0 +1,38 @@
+import os
+import threading
+import time
+
+from single_flight import FileLock, SingleFlight
+
+
+def test_lock_files_are_removed_after_release(tmp_path):
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    for i in range(5):
+        assert flight.do(f'key-{i}', lambda i=i: i) == (i, False)
+    assert os.listdir(tmp_path) == []
+
+
+def test_lock_stays_exclusive_while_files_are_deleted(tmp_path):
+    # 每个线程使用独立的 fd，flock 的行为与多进程相同
+    path = str(tmp_path / 'shared.lock')
+    holders = []
+    peak = []
+    guard = threading.Lock()
+
+    def worker():
+        for _ in range(20):
+            with FileLock(path):
+                with guard:
+                    holders.append(1)
+                    peak.append(len(holders))
+                time.sleep(0.001)
+                with guard:
+                    holders.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 1
+    assert not os.path.exists(path)
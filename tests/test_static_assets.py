@@ -0,0 +1,84 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask
+
+from static_assets import AssetCache, IMMUTABLE_CACHE_CONTROL, DEFAULT_CACHE_CONTROL, cache_control_for
+
+
+@pytest.fixture
+def asset_file(tmp_path):
+    path = tmp_path / 'app.js'
+    path.write_text('console.log("v1");' * 20, encoding='utf-8')
+    return path
+
+
+def _serve(cache, path, **headers):
+    app = Flask(__name__)
+    with app.test_request_context(headers=headers):
+        return cache.serve(str(path))
+
+
+def _rewrite(path, text, mtime_offset):
+    path.write_text(text, encoding='utf-8')
+    stat = os.stat(path)
+    # 保证修改时间确实变化，不依赖文件系统的时间精度
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset))
+
+
+def test_asset_reloaded_after_mtime_change(asset_file):
+    cache = AssetCache(stat_interval=0)
+    first = cache.get(str(asset_file))
+    assert cache.get(str(asset_file)) is first
+
+    _rewrite(asset_file, 'console.log("v2");' * 20, 10 ** 9)
+    second = cache.get(str(asset_file))
+    assert second is not first and second.etag != first.etag
+    assert second.bodies[None] == asset_file.read_bytes()
+
+
+def test_mtime_is_not_rechecked_within_interval(asset_file):
+    cache = AssetCache(stat_interval=60)
+    first = cache.get(str(asset_file))
+    _rewrite(asset_file, 'console.log("v2");' * 20, 10 ** 9)
+    assert cache.get(str(asset_file)) is first
+
+
+def test_matching_etag_gets_304(asset_file):
+    cache = AssetCache()
+    response = _serve(cache, asset_file)
+    assert response.status_code == 200 and response.headers['Cache-Control'] == DEFAULT_CACHE_CONTROL
+    etag = response.headers['ETag']
+
+    assert _serve(cache, asset_file, **{'If-None-Match': etag}).status_code == 304
+    assert _serve(cache, asset_file, **{'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_compressed_variant_and_its_etag(asset_file):
+    cache = AssetCache()
+    response = _serve(cache, asset_file, **{'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == asset_file.read_bytes()
+
+    # 压缩版本的 ETag 带编码后缀，回传时同样命中
+    revalidated = _serve(cache, asset_file, **{'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_large_file_is_not_cached(asset_file):
+    cache = AssetCache(max_file_bytes=10)
+    assert cache.get(str(asset_file)) is None
+    response = _serve(cache, asset_file)
+    response.direct_passthrough = False
+    assert response.status_code == 200 and response.get_data() == asset_file.read_bytes()
+
+
+def test_missing_asset_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        AssetCache().get(str(tmp_path / 'missing.css'))
+
+
+def test_hashed_assets_are_immutable():
+    assert cache_control_for('app.3f2a9c1d.js') == IMMUTABLE_CACHE_CONTROL
+    assert cache_control_for('app.js') == DEFAULT_CACHE_CONTROL
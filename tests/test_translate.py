@@ -0,0 +1,137 @@
+import pytest
+
+import glossary
+import translate
+from glossary import MedicalGlossary
+from translate import TranslationCache
+
+
+@pytest.fixture
+def remote(monkeypatch, tmp_path):
+    """替换百度翻译API：按行返回 '<原文>-en'，记录每次请求的 query"""
+    calls = []
+
+    def fake_request(query, target_lang):
+        calls.append(query)
+        return {'trans_result': [{'src': line, 'dst': f'{line}-en'} for line in query.split('\n')]}
+
+    monkeypatch.setattr(translate, '_request_translation', fake_request)
+    monkeypatch.setattr(translate, 'translation_cache', TranslationCache(db_path=str(tmp_path / 'translations.db')))
+    return calls
+
+
+@pytest.fixture
+def terms(monkeypatch):
+    terms = MedicalGlossary()
+    terms.add('肺癌', 'lung cancer', 'Lung Neoplasms')
+    terms.add('早期', 'early')
+    terms.add('症状', 'symptoms')
+    terms.add('肺', 'lung')
+    monkeypatch.setattr(glossary, '_glossary', terms)
+    return terms
+
+
+def test_glossary_terms_need_no_remote_call(remote, terms):
+    assert translate.baidu_translate_batch({'theme': '肺癌的早期症状'}) == {'theme': 'lung cancer early symptoms'}
+    assert remote == []
+
+
+def test_unknown_chinese_is_sent_to_remote(remote, terms):
+    result = translate.baidu_translate_batch({'theme': '肺癌免疫'})
+    assert result == {'theme': 'lung cancer 免疫-en'}
+    assert remote == ['免疫']
+
+
+def test_single_char_term_next_to_unknown_falls_back_to_whole_text(remote, terms):
+    # “肺部”若切成“肺”+“部”会译错，整体交给翻译API
+    assert translate._plan_translation('肺部结节', 'en') == [('remote', '肺部结节')]
+    assert translate.baidu_translate_batch({'theme': '肺部结节'}) == {'theme': '肺部结节-en'}
+
+
+def test_empty_glossary_sends_whole_text(remote, monkeypatch):
+    monkeypatch.setattr(glossary, '_glossary', MedicalGlossary())
+    assert translate._plan_translation('肺癌早期', 'en') == [('remote', '肺癌早期')]
+    assert translate._plan_translation('肺癌早期', 'jp') == [('remote', '肺癌早期')]
+
+
+def test_cache_persists_across_instances(tmp_path):
+    db_path = str(tmp_path / 'translations.db')
+    TranslationCache(db_path=db_path).set('免疫', 'en', 'immunity')
+
+    cache = TranslationCache(db_path=db_path)
+    assert cache.get('免疫', 'en') == 'immunity'
+    assert cache.get('免疫', 'jp') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_memory_is_lru():
+    cache = TranslationCache(max_size=2, db_path=None)
+    cache.set('一', 'en', 'one')
+    cache.set('二', 'en', 'two')
+    cache.get('一', 'en')
+    cache.set('三', 'en', 'three')
+    assert list(cache._memory) == [('一', 'en'), ('三', 'en')]
+
+
+def test_cache_ignores_failure_markers(tmp_path):
+    cache = TranslationCache(db_path=str(tmp_path / 'translations.db'))
+    cache.set('免疫', 'en', f'{translate.TRANSLATION_FAILED_PREFIX} 免疫')
+    cache.set('治疗', 'en', f'{translate.TRANSLATION_ERROR_PREFIX} 治疗')
+    assert cache.get('免疫', 'en') is None and cache.get('治疗', 'en') is None
+
+
+def test_cache_hit_skips_remote(remote, monkeypatch):
+    monkeypatch.setattr(glossary, '_glossary', MedicalGlossary())
+    assert translate.baidu_translate_batch({'theme': '免疫'}) == {'theme': '免疫-en'}
+    assert translate.baidu_translate_batch({'theme': '免疫'}) == {'theme': '免疫-en'}
+    assert remote == ['免疫']
+
+
+@pytest.mark.parametrize('failure', [RuntimeError('timeout'), {'error_code': '54003', 'error_msg': 'Invalid Access Limit'}])
+def test_failed_translation_is_not_cached(remote, monkeypatch, failure):
+    monkeypatch.setattr(glossary, '_glossary', MedicalGlossary())
+    calls = []
+
+    def failing_request(query, target_lang):
+        calls.append(query)
+        if isinstance(failure, Exception):
+            raise failure
+        return failure
+
+    monkeypatch.setattr(translate, '_request_translation', failing_request)
+    result = translate.baidu_translate_batch({'theme': '免疫'})
+    assert translate.is_translation_failure(result['theme'])
+    assert translate.translation_cache.get('免疫', 'en') is None
+
+    # 失败没有写入缓存，恢复后会重新请求并得到译文
+    monkeypatch.setattr(translate, '_request_translation', lambda query, target_lang: {
+        'trans_result': [{'src': query, 'dst': 'immunity'}]})
+    assert translate.baidu_translate_batch({'theme': '免疫'}) == {'theme': 'immunity'}
+    assert calls == ['免疫']
+
+
+def test_batch_joins_uncached_texts_into_one_request(remote, monkeypatch):
+    monkeypatch.setattr(glossary, '_glossary', MedicalGlossary())
+    translate.translation_cache.set('免疫', 'en', 'immunity')
+
+    result = translate.baidu_translate_batch({'theme': '免疫', 'key1': '靶向\n治疗', 'key2': '预后', 'extra': 'PD-1'})
+    assert result == {'theme': 'immunity', 'key1': '靶向 治疗-en', 'key2': '预后-en', 'extra': 'PD-1'}
+    assert remote == ['靶向 治疗\n预后']
+
+
+def test_batch_count_mismatch_matches_by_source_then_per_item(remote, monkeypatch):
+    monkeypatch.setattr(glossary, '_glossary', MedicalGlossary())
+    calls = []
+
+    def short_batch(query, target_lang):
+        calls.append(query)
+        if '\n' in query:
+            # 批量请求只返回了第一行的结果
+            return {'trans_result': [{'src': '靶向', 'dst': 'targeted'}]}
+        return {'trans_result': [{'src': query, 'dst': f'{query}-single'}]}
+
+    monkeypatch.setattr(translate, '_request_translation', short_batch)
+    result = translate.baidu_translate_batch({'key1': '靶向', 'key2': '预后'})
+    assert result == {'key1': 'targeted', 'key2': '预后-single'}
+    assert calls == ['靶向\n预后', '预后']
+    assert translate.translation_cache.get('预后', 'en') == '预后-single'
@@ -2,47 +2,121 @@ import requests
 import hashlib
 import re
 import os
-import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from glossary import get_glossary, normalize_punctuation, CONNECTOR_WORDS
+from log_config import get_logger
+from deadline import DeadlineExceeded, timeout_for
 
 
 APPID = "appid"
 KEY = "key"
-API_URL = "url"  # 翻译API
+API_URL = os.environ.get('BAIDU_TRANSLATE_URL', "url")  # 翻译API
+# 单次翻译请求的超时上限（秒），请求设定了截止时间时取两者中较小的一个
+TRANSLATE_TIMEOUT = 10
 
+# 翻译失败时返回的标记前缀，这类结果不会写入缓存
+TRANSLATION_FAILED_PREFIX = "[翻译失败]"
+TRANSLATION_ERROR_PREFIX = "[错误]"
 
-log_dir = 'log'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+# 翻译缓存：内存 LRU 容量与持久化文件路径
+CACHE_MAX_SIZE = 2048
+CACHE_DB_PATH = os.path.join('cache', 'translation_cache.db')
 
-def setup_logger():
-    logger = logging.getLogger('baidu_translator')
-    logger.setLevel(logging.INFO)
 
-    if logger.handlers:
-        logger.handlers.clear()
+logger = get_logger('baidu_translator', 'translation.log')
 
-    file_handler = logging.FileHandler(
-        filename=os.path.join(log_dir, 'translation.log'),
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.INFO)
 
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+class TranslationCache:
+    """
+    翻译结果缓存：内存中为 LRU，同时写入 SQLite 持久化，进程重启后可以继续命中。
+    键为 (原文, 目标语言)。只应缓存成功的翻译结果。
+    """
 
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+    def __init__(self, max_size=CACHE_MAX_SIZE, db_path=CACHE_DB_PATH):
+        self.max_size = max_size
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 数据库文件与表在首次读写时创建，导入模块时不访问磁盘
+        self._db_ready = False
+
+    def _connect(self):
+        if not self._db_ready:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS translations ('
+                    'source_text TEXT NOT NULL, target_lang TEXT NOT NULL, translated TEXT NOT NULL, '
+                    'PRIMARY KEY (source_text, target_lang))'
+                )
+            self._db_ready = True
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def get(self, text, target_lang):
+        key = (text, target_lang)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+        translated = None
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        'SELECT translated FROM translations WHERE source_text = ? AND target_lang = ?', key
+                    ).fetchone()
+                translated = row[0] if row else None
+            except sqlite3.Error as e:
+                logger.warning(f"读取翻译缓存失败: {e}")
 
-    return logger
+        with self._lock:
+            if translated is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_memory(key, translated)
+        return translated
 
-logger = setup_logger()
+    def set(self, text, target_lang, translated):
+        if is_translation_failure(translated):
+            return
+        key = (text, target_lang)
+        with self._lock:
+            self._put_memory(key, translated)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO translations (source_text, target_lang, translated) VALUES (?, ?, ?)',
+                        (text, target_lang, translated)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"写入翻译缓存失败: {e}")
+
+    def _put_memory(self, key, translated):
+        self._memory[key] = translated
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM translations')
+
+
+translation_cache = TranslationCache()
 
 def contains_chinese(text):
     """判断文本是否包含中文字符"""
@@ -51,9 +125,17 @@ def contains_chinese(text):
     return bool(re.search(r'[\u4e00-\u9fff]', text))
 
 
+def is_translation_failure(result):
+    """判断 baidu_translate_if_chinese 的返回值是否为失败标记"""
+    return isinstance(result, str) and (
+        result.startswith(TRANSLATION_FAILED_PREFIX) or result.startswith(TRANSLATION_ERROR_PREFIX)
+    )
+
+
 def baidu_translate_if_chinese(text, target_lang="en"):
     """
     如果文本包含中文，则翻译成目标语言（如英文）；否则返回原文。
+    优先使用本地术语表（glossary.py）做最长匹配，只有术语表未收录的部分才会调用翻译API。
     :param text: 要翻译的文本
     :param target_lang: 目标语言，如 'en'
     :return: 翻译后的文本 或 原文
@@ -63,20 +145,17 @@ def baidu_translate_if_chinese(text, target_lang="en"):
         logger.info(f"输入为空，返回: '{clean_text}'")
         return clean_text
 
-    text = str(text).strip()
-
-    if not contains_chinese(text):
-        logger.info(f"跳过翻译（非中文）: '{text}'")
-        return text
+    return baidu_translate_batch({'text': text}, target_lang)['text']
 
-    logger.info(f"正在翻译中文: '{text}'")
 
+def _request_translation(query, target_lang):
+    """向百度翻译API发送一次请求并返回解析后的 JSON；query 中每一行会得到一条 trans_result"""
     salt = "123456"
-    sign_str = APPID + text + salt + KEY
+    sign_str = APPID + query + salt + KEY
     sign = hashlib.md5(sign_str.encode('utf-8')).hexdigest()
 
     params = {
-        'q': text,
+        'q': query,
         'from': 'auto',
         'to': target_lang,
         'appid': APPID,
@@ -84,22 +163,176 @@ def baidu_translate_if_chinese(text, target_lang="en"):
         'sign': sign
     }
 
+    response = requests.get(API_URL, params=params, timeout=timeout_for(TRANSLATE_TIMEOUT, '翻译'))
+    return response.json()
+
+
+def _translate_one_remote(text, target_lang):
+    """单独翻译一条文本，返回译文或失败标记"""
     try:
-        response = requests.get(API_URL, params=params, timeout=10)
-        result = response.json()
+        result = _request_translation(text, target_lang)
+    except DeadlineExceeded as e:
+        logger.warning(f"{e}，跳过翻译 | 原文: '{text}'")
+        return f"{TRANSLATION_ERROR_PREFIX} {text}"
+    except Exception as e:
+        logger.exception(f"请求异常: {e} | 原文: '{text}'")  # 使用 exception 输出完整 traceback
+        return f"{TRANSLATION_ERROR_PREFIX} {text}"
+
+    if 'trans_result' in result and len(result['trans_result']) > 0:
+        return result['trans_result'][0]['dst']
+    error_msg = result.get('error_msg', 'Unknown error')
+    logger.error(f"翻译失败: {error_msg} | 原文: '{text}'")
+    return f"{TRANSLATION_FAILED_PREFIX} {text}"
 
-        if 'trans_result' in result and len(result['trans_result']) > 0:
-            translated = result['trans_result'][0]['dst']
-            logger.info(f"翻译成功: '{translated}'")
-            return translated
+
+def _translate_remote(texts, target_lang):
+    """
+    通过翻译API翻译多条文本（先查缓存，未命中的合并为一次请求），返回 {原文: 译文或失败标记}。
+    成功的译文会写入缓存。
+    """
+    results = {}
+    to_request = []
+    for text in texts:
+        cached = translation_cache.get(text, target_lang)
+        if cached is not None:
+            logger.debug(f"翻译缓存命中: '{text}' → '{cached}'")
+            results[text] = cached
         else:
-            error_msg = result.get('error_msg', 'Unknown error')
-            logger.error(f"翻译失败: {error_msg} | 原文: '{text}'")
-            return f"[翻译失败] {text}"
+            to_request.append(text)
 
+    if not to_request:
+        return results
+
+    logger.info(f"正在翻译 {len(to_request)} 条中文: {to_request}")
+
+    try:
+        result = _request_translation('\n'.join(to_request), target_lang)
+    except DeadlineExceeded as e:
+        logger.warning(f"{e}，跳过翻译 | 原文: {to_request}")
+        for text in to_request:
+            results[text] = f"{TRANSLATION_ERROR_PREFIX} {text}"
+        return results
     except Exception as e:
-        logger.exception(f"请求异常: {e} | 原文: '{text}'")  # 使用 exception 输出完整 traceback
-        return f"[错误] {text}"
+        logger.exception(f"请求异常: {e} | 原文: {to_request}")
+        for text in to_request:
+            results[text] = f"{TRANSLATION_ERROR_PREFIX} {text}"
+        return results
+
+    trans_result = result.get('trans_result') or []
+    if not trans_result:
+        logger.error(f"翻译失败: {result.get('error_msg', 'Unknown error')} | 原文: {to_request}")
+        translations = [f"{TRANSLATION_FAILED_PREFIX} {text}" for text in to_request]
+    elif len(trans_result) == len(to_request):
+        translations = [item['dst'] for item in trans_result]
+    else:
+        # 条数不一致时按原文匹配，匹配不上的再逐条翻译
+        logger.warning(f"批量翻译返回 {len(trans_result)} 条结果，期望 {len(to_request)} 条，按原文匹配")
+        by_src = {item.get('src'): item.get('dst') for item in trans_result}
+        translations = [by_src.get(text) or _translate_one_remote(text, target_lang) for text in to_request]
+
+    for text, translated in zip(to_request, translations):
+        if not is_translation_failure(translated):
+            logger.debug(f"翻译成功: '{text}' → '{translated}'")
+            translation_cache.set(text, target_lang, translated)
+        results[text] = translated
+    return results
+
+
+def _plan_translation(text, target_lang):
+    """
+    用术语表切分文本，返回片段列表 [(类型, 内容), ...]：
+    'known' 为术语表给出的译文，'remote' 为需要调用翻译API的中文片段，'literal' 为原样保留的非中文片段。
+    """
+    glossary = get_glossary()
+    if target_lang != 'en' or len(glossary) == 0:
+        return [('remote', text)]
+
+    segments = glossary.segment(normalize_punctuation(text))
+    if not any(translation is not None for _, translation in segments):
+        return [('remote', text)]
+
+    pieces = []
+    single_char_match = False
+    for segment, translation in segments:
+        if translation is not None:
+            single_char_match = single_char_match or len(segment) == 1
+            pieces.append(('known', translation))
+        elif segment.strip() in CONNECTOR_WORDS:
+            pieces.append(('known', CONNECTOR_WORDS[segment.strip()]))
+        elif contains_chinese(segment):
+            pieces.append(('remote', segment.strip()))
+        elif segment.strip():
+            pieces.append(('literal', segment.strip()))
+
+    # 单字术语紧挨未收录的中文时容易切错（如“肺部”被切成“肺”+“部”），此时整体交给翻译API
+    if single_char_match and any(kind == 'remote' for kind, _ in pieces):
+        return [('remote', text)]
+    return pieces
+
+
+def _join_pieces(parts):
+    joined = ' '.join(part for part in parts if part)
+    return re.sub(r'\s+([,;:)])', r'\1', joined).replace('( ', '(')
+
+
+def baidu_translate_batch(fields, target_lang="en"):
+    """
+    批量翻译多个字段：先用本地术语表做最长匹配，剩余未收录的中文片段合并为一次请求
+    （按行拼接，API 每行返回一条 trans_result）。
+    :param fields: {字段名: 文本} 字典
+    :param target_lang: 目标语言，如 'en'
+    :return: {字段名: 翻译后的文本 或 原文 或 失败标记}，与 baidu_translate_if_chinese 的返回约定一致
+    """
+    results = {}
+    plans = {}
+    remote_texts = []
+
+    for name, text in fields.items():
+        if not text or not str(text).strip():
+            results[name] = str(text) if text is not None else ""
+            continue
+
+        # 合并请求按行分隔，字段内部的换行需要替换掉
+        text = ' '.join(str(text).split())
+        if not contains_chinese(text):
+            logger.debug(f"跳过翻译（非中文）: '{text}'")
+            results[name] = text
+            continue
+
+        pieces = _plan_translation(text, target_lang)
+        remote_pieces = [value for kind, value in pieces if kind == 'remote']
+        if not remote_pieces:
+            results[name] = _join_pieces(value for _, value in pieces)
+            logger.debug(f"术语表翻译: '{text}' → '{results[name]}'")
+            continue
+
+        plans[name] = (text, pieces)
+        for value in remote_pieces:
+            if value not in remote_texts:
+                remote_texts.append(value)
+
+    remote_results = _translate_remote(remote_texts, target_lang) if remote_texts else {}
+
+    for name, (text, pieces) in plans.items():
+        parts = []
+        failure = None
+        for kind, value in pieces:
+            if kind == 'remote':
+                translated = remote_results[value]
+                if is_translation_failure(translated):
+                    failure = translated
+                    break
+                parts.append(translated)
+            else:
+                parts.append(value)
+        if failure is not None:
+            prefix = TRANSLATION_ERROR_PREFIX if failure.startswith(TRANSLATION_ERROR_PREFIX) else TRANSLATION_FAILED_PREFIX
+            results[name] = f"{prefix} {text}"
+        else:
+            results[name] = _join_pieces(parts)
+
+    return {name: results[name] for name in fields}
+
 
 if __name__ == "__main__":
     test_texts = [